@@ -1,56 +1,120 @@
 import datetime
+import functools
 import logging
 import os
+import threading
+from typing import Iterator
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
-from config import DB_PATH, DB_SQL_EXPORT_PATH, SQL_INIT_SCRIPT_PATH
+from sqlalchemy.dialects import registry
+from config import (
+    DB_PATH, REGEXP_CACHE_SIZE, SQL_INIT_SCRIPT_PATH,
+    SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_JOURNAL_MODE, SQLITE_MMAP_SIZE,
+    SQLITE_READ_POOL_SIZE, SQLITE_SYNCHRONOUS, SQLITE_TEMP_STORE
+)
 from database.Models import *
+from database.Migrations import migrate
+from metrics.MetricsRegistry import METRICS
+from metrics.QueryMetrics import CountingConnection, instrument
 import re
 
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=REGEXP_CACHE_SIZE)
+def compile_regexp(expr: str) -> re.Pattern:
+    return re.compile(expr, re.IGNORECASE)
+
+METRICS.collected(
+    "regexp_cache_lookups_total", "counter", "Lookups of the compiled patterns of the SQLite REGEXP function",
+    lambda: {("hit",): compile_regexp.cache_info().hits, ("miss",): compile_regexp.cache_info().misses}, ("result",)
+)
+
 def regexp(expr, item):
-    reg = re.compile(expr, re.IGNORECASE)
-    return reg.search(item) is not None
+    """SQLite REGEXP function, `item REGEXP expr` calls regexp(expr, item). NULL when either side is NULL."""
+    if expr is None or item is None:
+        return None
+    return compile_regexp(expr).search(str(item)) is not None
 
 
-ENGINE = create_engine(f"sqlite:///{DB_PATH}", echo=False)
+# Writer engine, used by every request that writes and by the imports. Its dialect bumps the data generation after every commit.
+registry.register("sqlite.generation", "database.GenerationDialect", "GenerationDialect")
+ENGINE = create_engine(f"sqlite+generation:///{DB_PATH}", echo=False, connect_args={"factory": CountingConnection})
 SESSION_MAKER: sessionmaker = sessionmaker(bind=ENGINE)
+# Read-only engine used by the GET endpoints. With WAL its connections read a consistent snapshot
+# without waiting for, or blocking, the writer.
+READ_ENGINE = create_engine(
+    f"sqlite:///{DB_PATH}", echo=False, pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0,
+    connect_args={"factory": CountingConnection}
+)
+READ_SESSION_MAKER: sessionmaker = sessionmaker(bind=READ_ENGINE)
+# Statement counts and times of each engine, see /metrics
+instrument(ENGINE, "write")
+instrument(READ_ENGINE, "read")
+# SQLite allows a single writer: concurrent imports take turns writing their batches. Reentrant, a restore of
+# an expenses file holds it from the copy of the live database through the swap.
+WRITE_LOCK = threading.RLock()
+
+def get_session() -> Iterator[Session]:
+    """FastAPI dependency yielding a session scoped to the request."""
+    with SESSION_MAKER() as session:
+        yield session
+
+def get_read_session() -> Iterator[Session]:
+    """FastAPI dependency yielding a read-only session scoped to the request."""
+    with READ_SESSION_MAKER() as session:
+        yield session
+
+def configure_connection(dbapi_connection, read_only: bool):
+    """Applies the storage pragmas of config.py to a new SQLite connection."""
+    dbapi_connection.create_function("REGEXP", 2, regexp, deterministic=True)
+    cursor = dbapi_connection.cursor()
+    # busy_timeout first so that switching the journal mode waits for other connections
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    if not read_only:
+        # The journal mode is stored in the database file, the writer sets it for every connection
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA temp_store = {SQLITE_TEMP_STORE}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
 
 @event.listens_for(ENGINE, "connect")
-def setup_regexp(dbapi_connection, connection_record):
-    dbapi_connection.create_function("REGEXP", 2, regexp)
-
-def export_database() -> str:
-    with ENGINE.connect() as connection:
-        dbapi_conn = connection.connection
-        # Use another context manager to open the output file in write mode
-        with open(DB_SQL_EXPORT_PATH, 'w') as f:
-            # Iterate over the dump lines and write to the file
-            for line in dbapi_conn.iterdump():
-                f.write(f'{line}\n')
-    return DB_SQL_EXPORT_PATH
+def setup_write_connection(dbapi_connection, connection_record):
+    configure_connection(dbapi_connection, read_only=False)
+
+@event.listens_for(READ_ENGINE, "connect")
+def setup_read_connection(dbapi_connection, connection_record):
+    configure_connection(dbapi_connection, read_only=True)
 
 logger.info("Database engine and session maker initialized.")
 
-if os.path.exists(SQL_INIT_SCRIPT_PATH):
-    logger.info(f"Database init file found at {SQL_INIT_SCRIPT_PATH}.")
-    with ENGINE.connect() as connection:
-        with open(SQL_INIT_SCRIPT_PATH, 'r') as f:
-            init_sql = f.read()
-            dbapi_conn = connection.connection
-            try:
-                dbapi_conn.executescript(init_sql)
-            except AttributeError:
-                logger.warning("executescript not available, executing statements individually.")
-                for statement in init_sql.split(';'):
-                    stmt = statement.strip()
-                    if stmt:
-                        connection.execute(text(stmt))
-    logger.info("Database initialized using init script.")
-
-    logger.info("Renaming init script to avoid re-initialization on next startup.")
-    os.rename(SQL_INIT_SCRIPT_PATH, f"{SQL_INIT_SCRIPT_PATH}.processed_at_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.sql")
-else:
-    logger.info("No database init file found; skipping initialization.")
+def init_database() -> int:
+    """
+    Runs the init script once if there is one, then applies the pending migrations. Called by the app
+    startup and the command line tools, never on import. Returns the schema version of the database.
+    """
+    if os.path.exists(SQL_INIT_SCRIPT_PATH):
+        logger.info(f"Database init file found at {SQL_INIT_SCRIPT_PATH}.")
+        with ENGINE.connect() as connection:
+            with open(SQL_INIT_SCRIPT_PATH, 'r') as f:
+                init_sql = f.read()
+                dbapi_conn = connection.connection
+                try:
+                    dbapi_conn.executescript(init_sql)
+                except AttributeError:
+                    logger.warning("executescript not available, executing statements individually.")
+                    for statement in init_sql.split(';'):
+                        stmt = statement.strip()
+                        if stmt:
+                            connection.execute(text(stmt))
+        logger.info("Database initialized using init script.")
+
+        logger.info("Renaming init script to avoid re-initialization on next startup.")
+        os.rename(SQL_INIT_SCRIPT_PATH, f"{SQL_INIT_SCRIPT_PATH}.processed_at_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.sql")
+    else:
+        logger.info("No database init file found; skipping initialization.")
 
+    return migrate(ENGINE)
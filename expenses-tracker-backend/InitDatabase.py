@@ -2,12 +2,13 @@ import logging
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from DatabaseSetup import ENGINE
+from DatabaseSetup import ENGINE, init_database
 from config import SQL_INIT_DATA_PATH
 from database.Models import *
 
 
-Base.metadata.create_all(ENGINE)
+# Creates the tables and indexes with the migrations
+init_database()
 SessionLocal: sessionmaker = sessionmaker(bind=ENGINE)
 
 logger = logging.getLogger(__name__)
@@ -0,0 +1,160 @@
+import logging
+from datetime import datetime
+from sqlalchemy import Connection, delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from database.Expense import Expense
+from database.ExpenseMonthlyRollup import ExpenseMonthlyRollup
+
+LOGGER = logging.getLogger(__name__)
+
+# An expense counts in the analytics when it is a debit or forced with INCLUDE, and is not SKIP
+INCLUDED_SQL = "(({row}.amount >= 0 OR {row}.calculation_status = 'INCLUDE') AND COALESCE({row}.calculation_status, '') != 'SKIP')"
+ROLLUP_KEY_SQL = (
+    "CAST(strftime('%Y', {row}.date) AS INTEGER), CAST(strftime('%m', {row}.date) AS INTEGER), "
+    "{row}.category_family_id, {row}.source_id, IFNULL({row}.user_id, 0)"
+)
+ROLLUP_MATCH_SQL = (
+    "year = CAST(strftime('%Y', {row}.date) AS INTEGER) AND month = CAST(strftime('%m', {row}.date) AS INTEGER) "
+    "AND category_family_id = {row}.category_family_id AND source_id = {row}.source_id "
+    "AND user_id = IFNULL({row}.user_id, 0)"
+)
+
+
+def _add_sql(row: str) -> str:
+    return f"""
+        INSERT INTO expense_monthly_rollup (year, month, category_family_id, source_id, user_id, total, expense_count)
+        VALUES ({ROLLUP_KEY_SQL.format(row=row)}, {row}.amount, 1)
+        ON CONFLICT (year, month, category_family_id, source_id, user_id)
+        DO UPDATE SET total = total + excluded.total, expense_count = expense_count + 1;"""
+
+
+def _remove_sql(row: str) -> str:
+    return f"""
+        UPDATE expense_monthly_rollup SET total = total - {row}.amount, expense_count = expense_count - 1
+        WHERE {ROLLUP_MATCH_SQL.format(row=row)};
+        DELETE FROM expense_monthly_rollup WHERE {ROLLUP_MATCH_SQL.format(row=row)} AND expense_count <= 0;"""
+
+
+ROLLUP_COLUMNS = "amount, date, calculation_status, category_family_id, source_id, user_id"
+
+# Every write to expense goes through SQL (uploads, PATCH, /combine, recalculation, restores),
+# so triggers keep the rollup in sync whatever the code path
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS expense_monthly_rollup_insert AFTER INSERT ON expense
+    WHEN {INCLUDED_SQL.format(row="NEW")}
+    BEGIN {_add_sql("NEW")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_monthly_rollup_delete AFTER DELETE ON expense
+    WHEN {INCLUDED_SQL.format(row="OLD")}
+    BEGIN {_remove_sql("OLD")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_monthly_rollup_update_remove AFTER UPDATE OF {ROLLUP_COLUMNS} ON expense
+    WHEN {INCLUDED_SQL.format(row="OLD")}
+    BEGIN {_remove_sql("OLD")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_monthly_rollup_update_add AFTER UPDATE OF {ROLLUP_COLUMNS} ON expense
+    WHEN {INCLUDED_SQL.format(row="NEW")}
+    BEGIN {_add_sql("NEW")}
+    END""",
+]
+
+
+def create_triggers(connection: Connection):
+    for trigger in TRIGGERS:
+        connection.exec_driver_sql(trigger)
+
+
+def rebuild(connection: Connection) -> int:
+    """Recomputes the whole rollup from the expense table, returns the number of rollup rows."""
+    connection.execute(delete(ExpenseMonthlyRollup))
+    connection.exec_driver_sql(f"""
+        INSERT INTO expense_monthly_rollup (year, month, category_family_id, source_id, user_id, total, expense_count)
+        SELECT {ROLLUP_KEY_SQL.format(row="expense")}, SUM(expense.amount), COUNT(*)
+        FROM expense
+        WHERE {INCLUDED_SQL.format(row="expense")}
+        GROUP BY 1, 2, 3, 4, 5""")
+    return connection.execute(select(func.count()).select_from(ExpenseMonthlyRollup)).scalar_one()
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_start(index: int) -> datetime:
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+class MonthlyRollup:
+    """
+    Sums of the included expenses between two dates. The months entirely inside the interval are read from
+    expense_monthly_rollup, only the partial months at its edges are summed from the expense table.
+    """
+
+    GROUP_COLUMNS = {
+        "category_family_id": (ExpenseMonthlyRollup.category_family_id, Expense.category_family_id),
+        "source_id": (ExpenseMonthlyRollup.source_id, Expense.source_id),
+    }
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def included_totals(self, group_by: str, start_date: datetime | None = None, end_date: datetime | None = None) -> dict[int, float]:
+        """Sum of the included expenses with start_date <= date <= end_date per group_by column value."""
+        rollup_column, expense_column = self.GROUP_COLUMNS[group_by]
+        rollup_month = ExpenseMonthlyRollup.year * 12 + ExpenseMonthlyRollup.month - 1
+
+        # [first_full, end_full) are the indexes of the months with every possible date inside the interval
+        first_full = None
+        end_full = None
+        if start_date is not None:
+            first_full = month_index(start_date.year, start_date.month)
+            if start_date != month_start(first_full):
+                first_full += 1
+        if end_date is not None:
+            # Dates of a month are before the next month's start, a month is covered when end_date reaches it
+            end_full = month_index(end_date.year, end_date.month)
+        if first_full is not None and end_full is not None and first_full >= end_full:
+            return self._expense_totals(expense_column, start_date, end_date)
+
+        query = select(rollup_column, func.sum(ExpenseMonthlyRollup.total)).group_by(rollup_column)
+        if first_full is not None:
+            query = query.where(rollup_month >= first_full)
+        if end_full is not None:
+            query = query.where(rollup_month < end_full)
+        totals: dict[int, float] = dict(self.session.execute(query).all()) # type: ignore
+
+        edges = []
+        if start_date is not None and first_full is not None and start_date < month_start(first_full):
+            edges.append((start_date, month_start(first_full), False))
+        if end_date is not None and end_full is not None:
+            edges.append((month_start(end_full), end_date, True))
+        for edge_start, edge_end, end_inclusive in edges:
+            for key, total in self._expense_totals(expense_column, edge_start, edge_end, end_inclusive).items():
+                totals[key] = totals.get(key, 0.0) + total
+        return totals
+
+    def _expense_totals(self, expense_column, start_date: datetime | None, end_date: datetime | None, end_inclusive: bool = True) -> dict[int, float]:
+        query = (
+            select(expense_column, func.sum(Expense.amount))
+            .where(
+                or_(Expense.amount >= 0, Expense.calculation_status == "INCLUDE"),
+                func.coalesce(Expense.calculation_status, '') != 'SKIP'
+            )
+            .group_by(expense_column)
+        )
+        if start_date is not None:
+            query = query.where(Expense.date >= start_date)
+        if end_date is not None:
+            query = query.where(Expense.date <= end_date if end_inclusive else Expense.date < end_date)
+        return dict(self.session.execute(query).all()) # type: ignore
+
+
+if __name__ == "__main__":
+    # python -m analytics.MonthlyRollup: recomputes the rollup, e.g. after editing the database by hand
+    from DatabaseSetup import ENGINE, init_database
+
+    init_database()
+    with ENGINE.begin() as connection:
+        rows = rebuild(connection)
+    LOGGER.info(f"Rebuilt expense_monthly_rollup with {rows} rows.")
@@ -0,0 +1,23 @@
+import math
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+
+def count_months(start_date: datetime, end_date: datetime) -> int:
+    """
+    Number of months an average over [start_date, end_date] is divided by: the complete months between the
+    dates plus the month in progress, so at least 1.
+    count_months(2024-01-15, 2024-03-10) == 2, count_months(2024-01-01, 2024-01-01) == 1
+    """
+    delta = relativedelta(end_date, start_date)
+    return delta.years * 12 + delta.months + 1
+
+
+def count_years(start_date: datetime, end_date: datetime) -> int:
+    """
+    Number of years an average over [start_date, end_date] is divided by: the years between the dates
+    rounded up on complete months, 0 when the interval is shorter than a month.
+    count_years(2023-01-01, 2024-02-01) == 2, count_years(2024-01-01, 2024-01-20) == 0
+    """
+    delta = relativedelta(end_date, start_date)
+    return math.ceil(delta.years + delta.months / 12)
@@ -0,0 +1,77 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+from config import ANALYTICS_CACHE_SIZE
+from database.DataGeneration import DataGeneration
+from metrics.MetricsRegistry import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ResultCache:
+    """
+    LRU cache of computed results tagged with the data generation they were computed at.
+    An entry from an older generation is a miss, so any committed write invalidates the whole cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[Hashable, tuple[int, object]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        # Read before computing: a write committed during compute leaves the entry already stale
+        generation = DataGeneration.current()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1] # type: ignore
+            self.misses += 1
+
+        value = compute()
+        if self.max_size > 0:
+            with self._lock:
+                self.entries[key] = (generation, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "generation": DataGeneration.current()
+            }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+# Results of /budget/calculate and /source/averages
+ANALYTICS_CACHE = ResultCache(ANALYTICS_CACHE_SIZE)
+
+METRICS.collected(
+    "analytics_cache_lookups_total", "counter", "Lookups of the analytics result cache",
+    lambda: {("hit",): ANALYTICS_CACHE.hits, ("miss",): ANALYTICS_CACHE.misses}, ("result",)
+)
+METRICS.collected(
+    "analytics_cache_hit_ratio", "gauge", "Share of the analytics result cache lookups that were hits",
+    lambda: {(): ANALYTICS_CACHE.hits / max(ANALYTICS_CACHE.hits + ANALYTICS_CACHE.misses, 1)}
+)
+METRICS.collected(
+    "analytics_cache_entries", "gauge", "Results held by the analytics result cache",
+    lambda: {(): len(ANALYTICS_CACHE.entries)}
+)
@@ -0,0 +1,13 @@
+from typing import Any, Callable, Hashable
+import orjson
+from fastapi.responses import Response
+
+from analytics.ResultCache import ANALYTICS_CACHE
+
+
+def cached_json_response(cache_key: Hashable, compute: Callable[[], Any]) -> Response:
+    """
+    JSON response of the DTOs returned by compute, encoded once by orjson and kept as bytes in ANALYTICS_CACHE
+    until the next committed write. A result depending on the current date has the date in its cache key.
+    """
+    return Response(ANALYTICS_CACHE.get_or_compute(cache_key, lambda: orjson.dumps(compute())), media_type="application/json")
@@ -0,0 +1,37 @@
+import uuid
+from typing import Optional
+from fastapi import Header, HTTPException, Response
+
+from database.DataGeneration import DataGeneration
+
+# The data generation restarts at 0 with the process, the token keeps ETags of different runs apart
+PROCESS_TOKEN = uuid.uuid4().hex[:12]
+
+
+def generation_etag(generation: int) -> str:
+    """Strong ETag of the data at a generation, it changes after every committed write."""
+    return f'"{PROCESS_TOKEN}-{generation}"'
+
+
+def check_etag(response: Response, if_none_match: Optional[str] = Header(None)) -> int:
+    """
+    Route dependency answering 304 Not Modified, before the database is queried, when the client already
+    has the current data. Otherwise returns the generation to pass to tag_response once the data is loaded.
+    """
+    generation = DataGeneration.current()
+    etag = generation_etag(generation)
+    if if_none_match is not None and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    # Let the browser keep the response but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return generation
+
+
+def tag_response(response: Response, generation: int):
+    """
+    Sets the ETag of the generation of check_etag, once the response data is loaded. When a write was
+    committed meanwhile the data may or may not include it, the response is then sent without an ETag
+    rather than with one the client would revalidate stale data with.
+    """
+    if DataGeneration.current() == generation:
+        response.headers["ETag"] = generation_etag(generation)
@@ -0,0 +1,63 @@
+import time
+
+from metrics.MetricsRegistry import METRICS
+from metrics.QueryMetrics import CURRENT_REQUEST_QUERIES, RequestQueries
+
+# Statements or rows of a request, from a cached answer to a full export
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 1000, 10000, 100000, 1000000)
+
+REQUEST_SECONDS = METRICS.histogram("http_request_duration_seconds", "Latency of the requests per route", ("method", "route", "status"))
+REQUEST_STATEMENTS = METRICS.histogram("http_request_sql_statements", "SQL statements executed per request", ("route",), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = METRICS.histogram("http_request_sql_seconds", "Seconds spent in SQL per request", ("route",))
+REQUEST_ROWS = METRICS.histogram("http_request_sql_rows", "Rows fetched from SQL statements per request", ("route",), COUNT_BUCKETS)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of each request and the SQL it ran, labelled with the route
+    template rather than the path so /api/expenses/1 and /api/expenses/2 are the same series.
+    The body of a streamed response is included in the latency, it is sent before the app returns.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        request_queries = RequestQueries()
+        token = CURRENT_REQUEST_QUERIES.set(request_queries)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            CURRENT_REQUEST_QUERIES.reset(token)
+            route = route_label(scope)
+            REQUEST_SECONDS.observe(seconds, (scope["method"], route, str(status)))
+            REQUEST_STATEMENTS.observe(request_queries.statements, (route,))
+            REQUEST_SQL_SECONDS.observe(request_queries.seconds, (route,))
+            REQUEST_ROWS.observe(request_queries.rows, (route,))
+
+
+def route_label(scope) -> str:
+    """
+    Template of the matched route as served, with the prefixes of the mount and of the routers including it,
+    e.g. /api/expenses/{expense_id}. FastAPI keeps the included routes unchanged, without the router prefix,
+    and sets the full template in the effective route context.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return scope.get("root_path", "") + getattr(context, "path", route.path)
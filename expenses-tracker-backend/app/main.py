@@ -1,11 +1,18 @@
 import logging
 import os
+from contextlib import asynccontextmanager
+import anyio.to_thread
 from fastapi import FastAPI
+from config import API_THREADPOOL_SIZE
+from DatabaseSetup import init_database
 from app.routers import Expenses
 from app.routers import Budget
 from app.routers import CategoryFamily
 from app.routers import Category
 from app.routers import Source
+from app.routers import Admin
+from app.routers import Metrics
+from app.MetricsMiddleware import MetricsMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
 # Get environment configuration
@@ -13,10 +20,19 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "dev")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 UI_URLS = os.getenv("UI_URLS", "http://localhost:4200")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Route handlers are sync and run in anyio's default threadpool, bound it to the database pool size
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    # Init script and migrations run on startup rather than on import, before the first request
+    await anyio.to_thread.run_sync(init_database)
+    yield
+
 app = FastAPI(
     title="Expense Tracker API",
     description="Upload Excel files to load expenses.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Allow automatic trailing-slash redirects so routes like /api/category-family redirect to /api/category-family/
@@ -40,6 +56,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it is the outermost middleware and its latency covers the whole request
+app.add_middleware(MetricsMiddleware)
 
 API_PREFIX = "/api"
 
@@ -48,5 +66,8 @@ app.include_router(Source.router, prefix=API_PREFIX)
 app.include_router(Budget.router, prefix=API_PREFIX)
 app.include_router(CategoryFamily.router, prefix=API_PREFIX)
 app.include_router(Category.router, prefix=API_PREFIX)
+app.include_router(Admin.router, prefix=API_PREFIX)
+# Scraped at the conventional path, outside of the API
+app.include_router(Metrics.router)
     
 
@@ -0,0 +1,42 @@
+import os
+import shutil
+import uuid
+from typing import Literal, Optional
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.params import Query
+
+from analytics.ResultCache import ANALYTICS_CACHE
+from config import DATA_DIR
+from database import DatabaseRestore
+from database.RestoreConflict import RestoreConflict
+from dto.RestoreResult import RestoreResult
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/cache", summary="Hit and miss counters of the analytics result cache")
+def get_cache_stats():
+    return ANALYTICS_CACHE.stats()
+
+@router.post("/restore", summary="Replace the database with a SQL dump, a SQLite database or an expenses CSV/Parquet file")
+def restore_database(
+    file: UploadFile = File(...),
+    format: Optional[Literal["sql", "sql.gz", "sqlite", "csv", "parquet"]] = Query(None, description="Detected from the file name and content when omitted"),
+) -> RestoreResult:
+    # The upload is copied next to the database, the restore reads it from a file
+    upload_path = os.path.join(DATA_DIR, f"restore-upload.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(upload_path, "wb") as f:
+            shutil.copyfileobj(file.file, f, length=1024 * 1024)
+        try:
+            return DatabaseRestore.restore_database(upload_path, format or DatabaseRestore.detect_format(file.filename, upload_path))
+        except RestoreConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
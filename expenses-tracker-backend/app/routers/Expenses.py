@@ -1,23 +1,31 @@
 from datetime import datetime
 import logging
-from typing import List, Optional
+import re
+from typing import Iterable, Iterator, List, Literal, Optional
 import os
 from pathlib import Path
 
+import orjson
 from fastapi.params import Query
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
-from DatabaseSetup import SESSION_MAKER, export_database
+from DatabaseSetup import READ_SESSION_MAKER, get_read_session, get_session
+from database import DatabaseExport, ExpenseFullText
 from database.Expense import Expense
 from database.Facades.ExpenseFacade import ExpenseFacade
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile
 
-from database.Source import Source
+from config import EXPENSE_PAGE_MAX_SIZE, EXPENSE_STREAM_BATCH_SIZE
+from app.OrjsonResponse import OrjsonResponse
+from dto.CategoryFamilyDto import CategoryFamilyDto
 from dto.ExpenseDto import ExpenseDto
-from dto.ExpensesUpload import ExpensesUpload
-from dto.FileFailedToExtract import FileFailedToExtract
-from extractors.FileExtractor import FileExtractor
-from extractors.FileExtractorCreator import FileExtractorCreator
+from dto.ExpenseFilter import ExpenseFilter
+from dto.ExpensePage import ExpensePage
+from dto.SourceDto import SourceDto
+from dto.UserDto import UserDto
+from extractors.UploadProcessor import UploadProcessor
 from payloads.CreateExpensePayload import CreateExpensePayload
 
 router = APIRouter(
@@ -28,75 +36,190 @@ router = APIRouter(
 
 LOGGER = logging.getLogger(__name__)
 
-@router.get("/", summary="Get expenses between start and end date")
-async def get_expenses_between_dates(
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def get_expense_filter(
     start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"), # type: ignore
-    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format") # type: ignore
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"), # type: ignore
+    source_id: Optional[List[int]] = Query(None, description="Only the expenses of these sources"), # type: ignore
+    category_family_id: Optional[List[int]] = Query(None, description="Only the expenses of these category families"), # type: ignore
+    min_amount: Optional[float] = Query(None, description="Minimum amount, inclusive"), # type: ignore
+    max_amount: Optional[float] = Query(None, description="Maximum amount, inclusive"), # type: ignore
+    calculation_status: Optional[List[str]] = Query(None, description="SKIP, INCLUDE, or NONE for expenses without a status"), # type: ignore
+    lock_category: Optional[bool] = Query(None, description="Only locked or unlocked expenses"), # type: ignore
+    description: Optional[str] = Query(None, description="Case insensitive substring of the description") # type: ignore
+) -> ExpenseFilter:
+    return ExpenseFilter(
+        start_date=datetime.strptime(start_date, "%Y-%m-%d") if start_date else None,
+        end_date=datetime.strptime(end_date, "%Y-%m-%d") if end_date else None,
+        source_ids=source_id,
+        category_family_ids=category_family_id,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        calculation_statuses=calculation_status,
+        lock_category=lock_category,
+        description=description
+    )
+
+@router.get("/", summary="Get expenses between start and end date")
+def get_expenses_between_dates(
+    expense_filter: ExpenseFilter = Depends(get_expense_filter),
+    limit: Optional[int] = Query(None, ge=1, le=EXPENSE_PAGE_MAX_SIZE, description="Page size, returns every expense when not set"), # type: ignore
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"), # type: ignore
+    sort_by: Optional[Literal["date", "amount", "description"]] = Query(None, description="Sort column, date when paginated"), # type: ignore
+    sort_order: Literal["asc", "desc"] = Query("asc"), # type: ignore
+    include_total: bool = Query(False, description="Also return the number of expenses matching the filters"), # type: ignore
+    stream: bool = Query(False, description="Stream every matching expense as NDJSON, same as Accept: application/x-ndjson"), # type: ignore
+    accept: Optional[str] = Header(None, include_in_schema=False),
+    session: Session = Depends(get_read_session)
 ):
-    start_date_datetime = None
-    if start_date:
-        start_date_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    end_date_datetime = None
-    if end_date:
-        end_date_datetime = datetime.strptime(end_date, "%Y-%m-%d")
+    expenseFacade = ExpenseFacade(session)
+    descending = sort_order == "desc"
 
-    expenses = []
-    with SESSION_MAKER() as session:
-        session: Session
-        expenseFacade = ExpenseFacade(session)
-        expenses = expenseFacade.get_expenses_between_dates(
-            start_date=start_date_datetime,
-            end_date=end_date_datetime
+    if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+        if limit is not None or cursor is not None or include_total:
+            raise HTTPException(status_code=400, detail="limit, cursor and include_total are not supported when streaming")
+        return StreamingResponse(
+            stream_expense_lines(expense_filter, sort_by, descending),
+            media_type=NDJSON_MEDIA_TYPE
         )
 
+    response: dict | ExpensePage
+    if limit is None:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="cursor requires limit")
+        rows = expenseFacade.get_expenses(expense_filter, sort_by=sort_by, descending=descending)
+        response = {"expenses": expense_dtos(rows)}
+        if include_total:
+            response["total"] = len(rows)
+    else:
+        try:
+            rows, next_cursor = expenseFacade.get_expenses_page(
+                expense_filter,
+                limit=limit,
+                cursor=cursor,
+                sort_by=sort_by or "date",
+                descending=descending
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = ExpensePage(
+            expenses=expense_dtos(rows),
+            next_cursor=next_cursor,
+            total=expenseFacade.count_expenses(expense_filter) if include_total else None
+        )
+
+    # Encode here, in the worker thread: FastAPI encodes the returned content on the event loop
+    return OrjsonResponse(response)
+
+@router.get("/search", summary="Get the expenses whose description matches a regular expression")
+def search_expenses(
+    pattern: str = Query(..., min_length=1, description="Case insensitive regular expression matched against the description"), # type: ignore
+    expense_filter: ExpenseFilter = Depends(get_expense_filter),
+    limit: Optional[int] = Query(None, ge=1, le=EXPENSE_PAGE_MAX_SIZE, description="Page size, returns every match when not set"), # type: ignore
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"), # type: ignore
+    sort_by: Optional[Literal["date", "amount", "description"]] = Query(None, description="Sort column, date when paginated"), # type: ignore
+    sort_order: Literal["asc", "desc"] = Query("asc"), # type: ignore
+    include_total: bool = Query(False, description="Also return the number of matching expenses"), # type: ignore
+    session: Session = Depends(get_read_session)
+):
+    """Same responses as GET /expenses/, the pattern is evaluated by SQLite together with the other filters."""
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regex pattern: {e}")
+    expense_filter.description_pattern = pattern
+    return get_expenses_between_dates(
+        expense_filter=expense_filter,
+        limit=limit,
+        cursor=cursor,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        include_total=include_total,
+        stream=False,
+        accept=None,
+        session=session
+    )
+
+@router.get("/fulltext", summary="Full-text search of the expense descriptions and original categories")
+def search_expenses_full_text(
+    q: str = Query(..., min_length=1, description='Words are matched as prefixes, "quoted words" as exact phrases'), # type: ignore
+    expense_filter: ExpenseFilter = Depends(get_expense_filter),
+    limit: int = Query(20, ge=1, le=EXPENSE_PAGE_MAX_SIZE, description="Page size"), # type: ignore
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"), # type: ignore
+    order: Literal["rank", "recent"] = Query("rank", description="Best matches first, or most recently added first for typeahead"), # type: ignore
+    include_total: bool = Query(False, description="Also return the number of matching expenses"), # type: ignore
+    session: Session = Depends(get_read_session)
+):
+    """Matches restricted by the same filters as GET /expenses/."""
+    match_query = ExpenseFullText.to_match_query(q)
+    if match_query is None:
+        raise HTTPException(status_code=400, detail="The query has no searchable word")
 
-    serialized_expenses = [serialize_expense(e) for e in expenses]
+    expenseFacade = ExpenseFacade(session)
+    try:
+        rows, next_cursor = expenseFacade.search_full_text(
+            match_query, expense_filter, limit=limit, cursor=cursor, by_rank=order == "rank"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = ExpensePage(
+        expenses=expense_dtos(rows),
+        next_cursor=next_cursor,
+        total=expenseFacade.count_full_text(match_query, expense_filter) if include_total else None
+    )
+    return OrjsonResponse(response)
 
-    return {"expenses": serialized_expenses}
+def stream_expense_lines(expense_filter: ExpenseFilter, sort_by: str | None, descending: bool) -> Iterator[bytes]:
+    """Yields the matching expenses as NDJSON, one chunk of lines per batch read from the database."""
+    # The response outlives the request scoped session, the stream reads through its own
+    with READ_SESSION_MAKER() as session:
+        for rows in ExpenseFacade(session).stream_expenses(expense_filter, sort_by, descending, EXPENSE_STREAM_BATCH_SIZE):
+            yield b"".join(orjson.dumps(expense, option=orjson.OPT_APPEND_NEWLINE) for expense in expense_dtos(rows))
 
 @router.patch("/{expense_id}", summary="Update an expense from UI")
-async def update_expense(
+def update_expense(
     expense_id: int,
     expense_update: ExpenseDto,
+    session: Session = Depends(get_session)
 ):
-    with SESSION_MAKER() as session:
-        session: Session
-        expense = session.query(Expense).filter(Expense.id == expense_id).first()
-        if not expense:
-            raise HTTPException(status_code=404, detail="Expense not found")
-
-        new_category_id = expense_update.categoryFamily.id if expense_update.categoryFamily else None        
-        if new_category_id is None:
-            raise HTTPException(status_code=400, detail="Category ID cannot be null")
-        if new_category_id != expense.category_family_id:
-            expense.category_family_id = new_category_id # type: ignore
-            LOGGER.info(f"Updated category familly id to {expense.category_family_id} for expense {expense.id}. Also locking category as manual update.")
-            expense_update.lock_category = True # if source changes, lock_category must be true
-        else:
-            LOGGER.info(f"Category Familly ID {expense.source_id} remains unchanged for expense {expense.id}")
-
-        lock_category = expense_update.lock_category
-        if lock_category is None:
-            lock_category = False
-        if lock_category != expense.lock_category:
-            expense.lock_category = lock_category # type: ignore
-            LOGGER.info(f"Updated lock_category to {expense.lock_category} for expense {expense.id}")
-
-        calculation_status = expense_update.calculation_status
-        if calculation_status != expense.calculation_status:
-            expense.calculation_status = calculation_status # type: ignore
-            LOGGER.info(f"Updated calculation_status to {expense.calculation_status} for expense {expense.id}")
-        else:
-            LOGGER.info(f"calculation_status {expense.calculation_status} remains unchanged for expense {expense.id}")
+    expense = session.query(Expense).filter(Expense.id == expense_id).first()
+    if not expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
+
+    new_category_id = expense_update.categoryFamily.id if expense_update.categoryFamily else None        
+    if new_category_id is None:
+        raise HTTPException(status_code=400, detail="Category ID cannot be null")
+    if new_category_id != expense.category_family_id:
+        expense.category_family_id = new_category_id # type: ignore
+        LOGGER.info(f"Updated category familly id to {expense.category_family_id} for expense {expense.id}. Also locking category as manual update.")
+        expense_update.lock_category = True # if source changes, lock_category must be true
+    else:
+        LOGGER.info(f"Category Familly ID {expense.source_id} remains unchanged for expense {expense.id}")
+
+    lock_category = expense_update.lock_category
+    if lock_category is None:
+        lock_category = False
+    if lock_category != expense.lock_category:
+        expense.lock_category = lock_category # type: ignore
+        LOGGER.info(f"Updated lock_category to {expense.lock_category} for expense {expense.id}")
+
+    calculation_status = expense_update.calculation_status
+    if calculation_status != expense.calculation_status:
+        expense.calculation_status = calculation_status # type: ignore
+        LOGGER.info(f"Updated calculation_status to {expense.calculation_status} for expense {expense.id}")
+    else:
+        LOGGER.info(f"calculation_status {expense.calculation_status} remains unchanged for expense {expense.id}")
             
 
-        session.commit()
-        session.refresh(expense)
+    session.commit()
+    session.refresh(expense)
 
-        return serialize_expense(expense)
+    return serialize_expense(expense)
 
 # Serialize expenses
 def serialize_expense(expense: Expense) -> ExpenseDto:
+    source, user, category_family = expense.source, expense.user, expense.category_family
     return ExpenseDto(
         id=expense.id,
         date=expense.date,
@@ -104,100 +227,106 @@ def serialize_expense(expense: Expense) -> ExpenseDto:
         amount=float(expense.amount),
         original_category=expense.original_category,
         lock_category=expense.lock_category,
-        source=expense.source,
         calculation_status=expense.calculation_status,
-        user=expense.user if expense.user else None,
-        categoryFamily=expense.category_family
+        source=SourceDto(source.id, source.name, source.type, source.card_number) if source else None,
+        user=UserDto(user.id, user.username) if user else None,
+        categoryFamily=CategoryFamilyDto(category_family.id, category_family.name, category_family.regex_pattern) if category_family else None
     )
 
 
+def expense_dtos(rows: Iterable[Row]) -> list[ExpenseDto]:
+    """
+    Same ExpenseDtos as serialize_expense, from the rows of ExpenseFacade.select_expense_rows. The rows are
+    unpacked in the column order, much faster than reading their columns by name, and the expenses of a
+    source or category family share its DTO.
+    """
+    sources: dict[int, SourceDto] = {}
+    category_families: dict[int, CategoryFamilyDto] = {}
+    expenses = []
+    for (
+        id, date, description, amount, original_category, lock_category, calculation_status,
+        source_id, source_name, source_type, source_card_number, user_id, user_username,
+        category_family_id, category_family_name, category_family_regex_pattern, *_
+    ) in rows:
+        source = sources.get(source_id)
+        if source is None and source_id is not None:
+            source = sources[source_id] = SourceDto(source_id, source_name, source_type, source_card_number)
+        category_family = category_families.get(category_family_id)
+        if category_family is None and category_family_id is not None:
+            category_family = category_families[category_family_id] = CategoryFamilyDto(
+                category_family_id, category_family_name, category_family_regex_pattern
+            )
+        expenses.append(ExpenseDto(
+            id, date, description, float(amount), original_category, lock_category, calculation_status,
+            source, UserDto(user_id, user_username) if user_id is not None else None, category_family # type: ignore
+        ))
+    return expenses
+
+
 @router.post("/upload/", summary="Upload Excel file to load expenses")
 async def upload_expenses(
     source_id: Optional[int] = None,
-    files: List[UploadFile] = File(...),
+    files: List[UploadFile] = File(...)
 ):
-    source: Source | None = None
+    processor = UploadProcessor(source_id)
+    if not await run_in_threadpool(processor.load_source):
+        raise HTTPException(status_code=404, detail="Source not found")
 
-    if source_id is not None:
-        with SESSION_MAKER() as session:
-            session: Session
-            source = session.query(Source).filter(Source.id == source_id).first()
+    for file in files:
+        if not file or not file.filename:
+            LOGGER.warning(f"File is empty or not provided: {file.filename}")
+            raise HTTPException(status_code=400, detail="No file provided or file is empty.")
 
-        if not source:
-            raise HTTPException(status_code=404, detail="Source not found")
-    
-    expensesUpload = ExpensesUpload(0, 0)
-    try:
-        for file in files:
-            LOGGER.info(f"Processing file: {file.filename} for source: {source.name if source else 'AUTO-DETECT'}")
-            if not file or not file.filename:
-                LOGGER.warning(f"File is empty or not provided: {file.filename}")
-                raise HTTPException(status_code=400, detail="No file provided or file is empty.")
-            
-            extractors: list[FileExtractor] = await FileExtractorCreator.create_extractor(file, source)
-            if not extractors or len(extractors) == 0:
-                LOGGER.warning(f"No extractor found for file: {file.filename}")
-                expensesUpload.filesFailedToExtract.append(FileFailedToExtract(filename=file.filename, reason=f"No extractor found for the file {file.filename}."))
-            elif len(extractors) > 1:
-                LOGGER.warning(f"Multiple extractors found for file: {file.filename}. Cannot proceed.")
-                classes = [extractor.__class__ for extractor in extractors]
-                expensesUpload.filesFailedToExtract.append(FileFailedToExtract(filename=file.filename,
-                                                                                reason=f"Multiple extractors: {classes} found for the file."))
-            else:
-                extractor = extractors[0]
-                LOGGER.info(f"Using extractor {extractor.__class__.__name__} for file: {file.filename}")
-                new_expensesUpload = await extractor.extract()
-                expensesUpload.created_expenses += new_expensesUpload.created_expenses
-                expensesUpload.existing_expenses += new_expensesUpload.existing_expenses
-                expensesUpload.filesFailedToExtract.extend(new_expensesUpload.filesFailedToExtract)
-                LOGGER.info(f"File {file.filename} processed. Created expenses: {new_expensesUpload.created_expenses}, Existing expenses: {new_expensesUpload.existing_expenses}")
-    except Exception as e:
-        LOGGER.error(f"Error creating extractor")
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    return expensesUpload
+    return await processor.process(files)
 
 @router.post("/", summary="Create a new expense", status_code=201)
-async def create_expense(expense: CreateExpensePayload):
-    with SESSION_MAKER() as session:
-        session: Session
-        expense_facade = ExpenseFacade(session)
+def create_expense(expense: CreateExpensePayload, session: Session = Depends(get_session)):
+    expense_facade = ExpenseFacade(session)
         
-        new_expense = expense_facade.create_expense(
-            description=expense.description,
-            amount=float(expense.amount),
-            date=datetime.strptime(expense.date, "%Y-%m-%d"),
-            category_name=expense.category_name,
-            source_id=expense.sourceId
-        )
+    new_expense = expense_facade.create_expense(
+        description=expense.description,
+        amount=float(expense.amount),
+        date=datetime.strptime(expense.date, "%Y-%m-%d"),
+        category_name=expense.category_name,
+        source_id=expense.sourceId
+    )
         
-        if not new_expense:
-            raise HTTPException(
-                status_code=409,
-                detail="An expense with the same details already exists"
-            )
+    if not new_expense:
+        raise HTTPException(
+            status_code=409,
+            detail="An expense with the same details already exists"
+        )
         
-        session.commit()
-        session.refresh(new_expense)
+    session.commit()
+    session.refresh(new_expense)
         
-        return serialize_expense(new_expense)
+    return serialize_expense(new_expense)
 
 
-@router.get("/export/database", summary="Export database as SQLite file")
-async def export_database_endpoint():
+@router.get("/export/database", summary="Export database as SQL dump or SQLite file")
+def export_database_endpoint(
+    format: Literal["sql", "sql.gz", "sqlite"] = Query("sql", description="SQL dump, gzip compressed SQL dump, or SQLite database file") # type: ignore
+):
     """
-    Export the entire expenses database as a SQLite file.
-    Returns the database file as a downloadable attachment.
+    Export the entire expenses database as a downloadable attachment.
+    The export is reused until the next committed write, otherwise SQL dumps are streamed while produced.
     """
+    export_format = DatabaseExport.EXPORT_FORMATS[format]
+    filename = os.path.basename(export_format.path)
     try:
-        LOGGER.info(f"Exporting database...")
-        file_path = export_database()
+        file_path = DatabaseExport.cached_export(format)
+        if file_path is None and format == "sqlite":
+            LOGGER.info("Exporting database with the backup API...")
+            file_path = DatabaseExport.export_sqlite()
+        if file_path is not None:
+            return FileResponse(path=file_path, media_type=export_format.media_type, filename=filename)
 
-        return FileResponse(
-            path=file_path,
-            media_type="application/sql",
-            headers={"Content-Disposition": f"attachment; filename={os.path.basename(file_path)}"},
+        LOGGER.info(f"Exporting database as {format}...")
+        return StreamingResponse(
+            DatabaseExport.stream_sql_dump(format),
+            media_type=export_format.media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
     except Exception as e:
         LOGGER.error(f"Error exporting database: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error exporting database: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error exporting database: {str(e)}")
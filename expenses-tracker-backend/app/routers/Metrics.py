@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics.MetricsRegistry import METRICS
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics", summary="Metrics of the process in the Prometheus text format", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
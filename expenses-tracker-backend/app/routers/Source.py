@@ -1,8 +1,11 @@
-from datetime import datetime
-from fastapi import APIRouter
+from datetime import date, datetime
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
 from typing import Optional
 
-from DatabaseSetup import SESSION_MAKER
+from DatabaseSetup import get_read_session
+from app.CachedJsonResponse import cached_json_response
+from app.ETag import check_etag, tag_response
 from sqlalchemy.orm import Session
 from fastapi.params import Query
 
@@ -25,19 +28,18 @@ def serialize_source(source: Source) -> SourceDto:
     )
 
 @router.get("/", summary="Get available sources")
-async def get_all_sources():
-    with SESSION_MAKER() as session:
-        session: Session
-        sources = session.query(Source).all()
-        return [serialize_source(s) for s in sources]
+def get_all_sources(response: Response, generation: int = Depends(check_etag), session: Session = Depends(get_read_session)):
+    sources = session.query(Source).all()
+    tag_response(response, generation)
+    return [serialize_source(s) for s in sources]
     
 
 @router.get("/averages", summary="Calculate the all the source average for the given interval.")
-async def get_source_averages_between_dates(
+def get_source_averages_between_dates(
     start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"), # type: ignore
-    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format") # type: ignore
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format"), # type: ignore
+    session: Session = Depends(get_read_session)
 ):
-    print(f"Received request to calculate budget averages between {start_date} and {end_date}")
     start_date_datetime = None
     if start_date:
         start_date_datetime = datetime.strptime(start_date, "%Y-%m-%d")
@@ -45,14 +47,10 @@ async def get_source_averages_between_dates(
     if end_date:
         end_date_datetime = datetime.strptime(end_date, "%Y-%m-%d")
 
-    print(f"Start date: {start_date_datetime}, End date: {end_date_datetime}")
-
-    averages = []
-    with SESSION_MAKER() as session:
-        session: Session
-        expenseFacade = SourceFacade(session)
-        averages = expenseFacade.get_average_expense_for_sources(
+    def calculate():
+        return SourceFacade(session).get_average_expense_for_sources(
             start_date=start_date_datetime,
             end_date=end_date_datetime
         )
-    return averages
\ No newline at end of file
+
+    return cached_json_response(("source/averages", start_date_datetime, end_date_datetime or date.today()), calculate)
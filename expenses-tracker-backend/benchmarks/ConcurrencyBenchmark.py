@@ -0,0 +1,133 @@
+"""
+Measures the latency of a light endpoint (/source/) while heavy endpoints (/expenses/, /budget/calculate)
+are requested concurrently, against a synthetic database created in a temporary directory.
+
+    python benchmarks/ConcurrencyBenchmark.py --expenses 100000 --light-requests 200 --heavy-clients 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(latencies: list[float], percent: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def seed_database(expense_count: int):
+    from sqlalchemy import insert
+    from DatabaseSetup import ENGINE, init_database
+    from database.Models import Budget, CategoryFamily, Expense, Source
+
+    init_database()
+    random_generator = random.Random(42)
+    first_date = datetime(2020, 1, 1)
+    with ENGINE.begin() as connection:
+        connection.execute(insert(Source.__table__), [
+            {"id": i, "name": f"Source {i}", "type": "BNC", "card_number": f"{i:04d}"} for i in range(1, 5)
+        ])
+        connection.execute(insert(CategoryFamily.__table__), [
+            {"id": i, "name": f"Family {i}"} for i in range(1, 21)
+        ])
+        connection.execute(insert(Budget.__table__), [
+            {"frequency_type": i % 2, "target_amount": 500, "category_family_id": i} for i in range(1, 21)
+        ])
+        connection.execute(insert(Expense.__table__), [
+            {
+                "description": f"Expense {i}",
+                "amount": round(random_generator.uniform(-50, 500), 2),
+                "date": first_date + timedelta(days=random_generator.randrange(5 * 365)),
+                "original_category": f"Category {i % 20}",
+                "lock_category": 0,
+                "source_id": random_generator.randint(1, 4),
+                "category_family_id": random_generator.randint(1, 20)
+            }
+            for i in range(expense_count)
+        ])
+
+
+async def run(light_requests: int, heavy_clients: int) -> dict:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def timed_light_requests() -> list[float]:
+                latencies = []
+                for _ in range(light_requests):
+                    start = time.perf_counter()
+                    response = await client.get("/api/source/")
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                return latencies
+
+            # Light requests alone, then while the heavy clients keep requesting the heavy endpoints
+            idle = await timed_light_requests()
+
+            done = asyncio.Event()
+            heavy_latencies: list[float] = []
+
+            async def heavy_client(path: str):
+                while not done.is_set():
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    response.raise_for_status()
+                    heavy_latencies.append(time.perf_counter() - start)
+
+            paths = ["/api/expenses/", "/api/budget/calculate"]
+            heavy_tasks = [asyncio.create_task(heavy_client(paths[i % len(paths)])) for i in range(heavy_clients)]
+            await asyncio.sleep(0.1)
+            loaded = await timed_light_requests()
+            done.set()
+            await asyncio.gather(*heavy_tasks)
+
+    def summary(latencies: list[float]) -> dict:
+        return {
+            "requests": len(latencies),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2)
+        }
+
+    return {
+        "light_idle": summary(idle),
+        "light_under_load": summary(loaded),
+        "heavy": summary(heavy_latencies) if heavy_latencies else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=50000, help="number of synthetic expenses")
+    parser.add_argument("--light-requests", type=int, default=200, help="number of /source/ requests per measure")
+    parser.add_argument("--heavy-clients", type=int, default=4, help="number of clients requesting the heavy endpoints")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    # config.py resolves the data directory relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="expenses-tracker-benchmark-"))
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    seed_database(args.expenses)
+    results = asyncio.run(run(args.light_requests, args.heavy_clients))
+    results["expenses"] = args.expenses
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Measures the ingestion of synthetic statements (see StatementGenerator.py) of every format, against a
+database created in a temporary directory, stage by stage:
+
+    detect     FileExtractorCreator picking the extractor from the head of the file
+    parse      the extractor reading the file into (description, amount, date, category, source) rows
+    classify   the category family regex rules and category names, on a classifier built cold
+    dedupe     preloading the existing expense keys of the statement window and looking the rows up
+    insert     the INSERT of the new rows, rolled back
+    upload     the whole upload through POST /api/expenses/upload/, committed
+
+Before each measured statement, a previous statement holding its first `duplicate ratio` rows is uploaded,
+so that share of the rows already exists. Every stage but upload is repeated, the median is reported.
+The results are written as JSON; with --baseline, fails when the rows/s of a stage dropped more than the
+tolerance compared to the same run of a previous --output.
+
+    python benchmarks/IngestionBenchmark.py --sizes 1000,100000,1000000 --output ingestion.json
+    python benchmarks/IngestionBenchmark.py --formats bnc,roger_html --sizes 100000 --baseline ingestion.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from StatementGenerator import CATEGORIES, FORMATS, generate, rule_patterns
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Card number of the source of each source type
+CARD_NUMBERS = {"BNC": "1111", "ROGER": "2222", "TANGERINE": "3333", "TRIANGLE": "4444"}
+
+
+def seed_database(rule_count: int):
+    """One source per source type, the categories of the statements and the regex rules."""
+    from DatabaseSetup import SESSION_MAKER, init_database
+    from database.Models import Category, CategoryFamily, Source
+
+    init_database()
+    with SESSION_MAKER() as session:
+        session.add_all(Source(name=f"{source_type} card", type=source_type, card_number=card_number) for source_type, card_number in CARD_NUMBERS.items())
+        for name in CATEGORIES + ["Uncategorized"]:
+            session.add(Category(name=name, category_family=CategoryFamily(name=name)))
+        session.add_all(CategoryFamily(name=f"Rule {index}", regex_pattern=pattern) for index, pattern in enumerate(rule_patterns(rule_count)))
+        session.commit()
+
+
+def upload_file(filename: str, data: bytes):
+    from fastapi import UploadFile
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def timed(function, repeat: int) -> tuple[float, object]:
+    """Median seconds of `repeat` calls and the result of the last one."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def parse(extractor, source, data: bytes) -> list[tuple]:
+    """The rows extracted by the extractor, without the database writes of extract()."""
+    from extractors.excel.ExcelFileExtractor import ExcelFileExtractor
+    from extractors.html.RogerStatementParser import parse_roger_statement
+
+    if isinstance(extractor, ExcelFileExtractor):
+        extractor.file.file.seek(0)
+        # What extract() sets up before reading the file
+        if hasattr(extractor, "sources"):
+            extractor.sources = [source]  # BNC rows are mapped to their source by card number
+        else:
+            extractor.source = source
+        rows = []
+        for chunk in extractor.read_chunks():
+            rows.extend(extractor.to_rows(extractor.transform(chunk.rename(columns=extractor.COLUMN_MAPPING))))
+        return rows
+    parsed_rows, _ = parse_roger_statement(data)
+    return [(description, amount, date, category, source.id) for description, amount, date, category in parsed_rows or []]
+
+
+def classify(session, rows: list[tuple]) -> dict[tuple[str, str], int | None]:
+    """The category family of each distinct (description, category) like an upload, on a cold classifier."""
+    from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+
+    CategoryFamilyClassifier.invalidate()
+    classifier = CategoryFamilyClassifier.get(session)
+    category_family_ids: dict[tuple[str, str], int | None] = {}
+    for description, _, _, category, _ in rows:
+        if (description, category) not in category_family_ids:
+            category_family_ids[(description, category)] = classifier.classify(description, category)
+    return category_family_ids
+
+
+def dedupe(session, rows: list[tuple]) -> list[tuple]:
+    """The rows not in the database yet."""
+    from database.Facades.ExpenseFacade import ExpenseFacade
+
+    expense_facade = ExpenseFacade(session)
+    source_id = rows[0][4]
+    expense_facade.preload_existing_keys(source_id, min(row[2] for row in rows), max(row[2] for row in rows))
+    return [row for row in rows if not expense_facade.is_existing_key((row[0], row[1], row[2], row[4]))]
+
+
+def insert(session, rows: list[tuple], category_family_ids: dict[tuple[str, str], int | None], default_category_family_id: int) -> int:
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from database.Expense import Expense
+
+    result = session.execute(sqlite_insert(Expense.__table__).on_conflict_do_nothing(), [
+        {
+            "description": description, "amount": amount, "date": date, "original_category": category, "source_id": source_id,
+            "category_family_id": category_family_ids.get((description, category)) or default_category_family_id,
+        }
+        for description, amount, date, category, source_id in rows
+    ])
+    session.rollback()
+    return result.rowcount
+
+
+async def run(formats: list[str], sizes: list[int], duplicate_ratios: list[float], repeat: int) -> list[dict]:
+    import httpx
+    from app.main import app
+    from DatabaseSetup import SESSION_MAKER
+    from database.CategoryFamily import CategoryFamily
+    from database.Source import Source
+    from extractors.FileExtractorCreator import FileExtractorCreator
+
+    # Imports the extractors, not measured by the first detection
+    FileExtractorCreator.registry.extractors
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def upload(statement_format, filename: str, data: bytes, source) -> dict:
+                params = {} if statement_format.detectable else {"source_id": source.id}
+                response = await client.post("/api/expenses/upload/", params=params, files={"files": (filename, data)})
+                response.raise_for_status()
+                return response.json()
+
+            run_index = 0
+            for format in formats:
+                statement_format = FORMATS[format]
+                for rows in sizes:
+                    for duplicate_ratio in duplicate_ratios:
+                        # A period of its own per run, the statements of the previous runs are not in its dedupe window
+                        run_index += 1
+                        start_date = datetime(2000 + 5 * run_index, 1, 1)
+                        card_number = CARD_NUMBERS[statement_format.source_type]
+                        filename = f"{format}_{rows}{statement_format.extension}"
+                        with SESSION_MAKER() as session:
+                            source = session.query(Source).filter(Source.type == statement_format.source_type).one()
+                            default_category_family_id = session.query(CategoryFamily.id).filter(CategoryFamily.name == "Uncategorized").scalar()
+
+                        duplicate_rows = int(rows * duplicate_ratio)
+                        if duplicate_rows:
+                            await upload(statement_format, f"previous_{filename}", generate(format, duplicate_rows, run_index, card_number, start_date), source)
+                        data = generate(format, rows, run_index, card_number, start_date)
+
+                        result = {"format": format, "rows": rows, "duplicate_ratio": duplicate_ratio, "file_bytes": len(data), "stages": {}}
+
+                        def create_extractors():
+                            return FileExtractorCreator.create_extractor(upload_file(filename, data), None if statement_format.detectable else source)
+                        seconds, extractors = timed(create_extractors, repeat)
+                        if len(extractors) != 1:
+                            raise RuntimeError(f"Expected a single extractor for {filename}, got {extractors}")
+                        extractor = extractors[0]
+                        result["extractor"] = extractor.__class__.__name__
+                        result["stages"]["detect"] = {"seconds": seconds}
+
+                        seconds, parsed_rows = timed(lambda: parse(extractor, source, data), repeat)
+                        result["stages"]["parse"] = {"seconds": seconds, "rows": len(parsed_rows)}
+                        with SESSION_MAKER() as session:
+                            seconds, category_family_ids = timed(lambda: classify(session, parsed_rows), repeat)
+                            result["stages"]["classify"] = {"seconds": seconds, "rows": len(parsed_rows), "distinct": len(category_family_ids)}
+                            seconds, new_rows = timed(lambda: dedupe(session, parsed_rows), repeat)
+                            result["stages"]["dedupe"] = {"seconds": seconds, "rows": len(parsed_rows), "existing": len(parsed_rows) - len(new_rows)}
+                            seconds, inserted = timed(lambda: insert(session, new_rows, category_family_ids, default_category_family_id), repeat)
+                            result["stages"]["insert"] = {"seconds": seconds, "rows": inserted}
+
+                        start = time.perf_counter()
+                        uploaded = await upload(statement_format, filename, data, source)
+                        result["stages"]["upload"] = {
+                            "seconds": time.perf_counter() - start, "rows": len(parsed_rows),
+                            "created": uploaded["created_expenses"], "existing": uploaded["existing_expenses"],
+                        }
+                        if uploaded["filesFailedToExtract"]:
+                            raise RuntimeError(f"Upload of {filename} failed: {uploaded['filesFailedToExtract']}")
+
+                        for stage in result["stages"].values():
+                            if "rows" in stage:
+                                stage["rows_per_second"] = round(stage["rows"] / max(stage["seconds"], 1e-9))
+                            stage["seconds"] = round(stage["seconds"], 4)
+                        print(json.dumps(result), file=sys.stderr)
+                        results.append(result)
+    return results
+
+
+def regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """The stages of the runs also in the baseline whose rows/s dropped more than tolerance percent."""
+    def key(result: dict) -> tuple:
+        return result["format"], result["rows"], result["duplicate_ratio"], result.get("rules")
+
+    baseline_runs = {key(result): result for result in baseline}
+    failures = []
+    for result in results:
+        baseline_run = baseline_runs.get(key(result))
+        if baseline_run is None:
+            continue
+        for stage, measure in result["stages"].items():
+            baseline_measure = baseline_run["stages"].get(stage, {})
+            if "rows_per_second" not in measure or not baseline_measure.get("rows_per_second"):
+                continue
+            limit = baseline_measure["rows_per_second"] * (1 - tolerance / 100)
+            if measure["rows_per_second"] < limit:
+                failures.append(
+                    f"{result['format']} {result['rows']} rows {stage}: {measure['rows_per_second']} rows/s, "
+                    f"under {limit:.0f} rows/s ({tolerance}% below the baseline)"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma separated statement formats")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma separated numbers of rows per statement")
+    parser.add_argument("--duplicate-ratios", default="0.1", help="comma separated shares of the rows already in the database")
+    parser.add_argument("--rules", type=int, default=100, help="number of category family regex rules")
+    parser.add_argument("--repeat", type=int, default=3, help="measures of every stage but upload, the median is reported")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare the rows/s with")
+    parser.add_argument("--tolerance", type=float, default=20, help="allowed rows/s drop under the baseline, in percent")
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+    unknown = [format for format in formats if format not in FORMATS]
+    if unknown:
+        parser.error(f"unknown formats {unknown}, expected some of {list(FORMATS)}")
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # config.py resolves the data directory relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="expenses-tracker-ingestion-"))
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    seed_database(args.rules)
+    runs = asyncio.run(run(
+        formats, [int(size) for size in args.sizes.split(",")],
+        [float(ratio) for ratio in args.duplicate_ratios.split(",")], max(args.repeat, 1)
+    ))
+    for result in runs:
+        result["rules"] = args.rules
+    results = {"rules": args.rules, "repeat": args.repeat, "runs": runs}
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            failures = regressions(runs, json.load(f)["runs"], args.tolerance)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measures the per-row cost of listing expenses, against a synthetic database created in a temporary directory,
+stage by stage:
+
+    orm_query         the ORM query loading Expense identities with their source, category family and user
+    orm_dto           serialize_expense of the ORM expenses
+    core_query        ExpenseFacade.get_expenses, the Core select of the needed columns
+    row_dto           expense_dtos of the Core rows
+    jsonable_encoder  JSONResponse of jsonable_encoder of the DTOs
+    orjson            OrjsonResponse of the DTOs
+    request           the whole GET /api/expenses/
+
+Every stage is repeated, the median is reported in microseconds per row, with the ORM and jsonable_encoder
+read path and the Core and orjson one added up.
+
+    python benchmarks/ListingBenchmark.py --expenses 100000 --output listing.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from ConcurrencyBenchmark import seed_database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median_seconds(function: Callable, repeat: int):
+    """Median duration of the calls and the result of the last one."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def measure_stages(repeat: int) -> dict[str, float]:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from sqlalchemy.orm import joinedload
+    from DatabaseSetup import READ_SESSION_MAKER
+    from app.OrjsonResponse import OrjsonResponse
+    from app.routers.Expenses import expense_dtos, serialize_expense
+    from database.Expense import Expense
+    from database.Facades.ExpenseFacade import ExpenseFacade
+    from dto.ExpenseFilter import ExpenseFilter
+
+    def orm_query():
+        # A new session each time, the identity map would otherwise keep the expenses of the previous call
+        with READ_SESSION_MAKER() as session:
+            return session.query(Expense).options(
+                joinedload(Expense.source), joinedload(Expense.category_family), joinedload(Expense.user)
+            ).all()
+
+    def core_query():
+        with READ_SESSION_MAKER() as session:
+            return ExpenseFacade(session).get_expenses(ExpenseFilter())
+
+    stages = {}
+    # The detached expenses keep the relationships loaded by the query
+    stages["orm_query"], expenses = median_seconds(orm_query, repeat)
+    stages["orm_dto"], _ = median_seconds(lambda: [serialize_expense(expense) for expense in expenses], repeat)
+    stages["core_query"], rows = median_seconds(core_query, repeat)
+    stages["row_dto"], dtos = median_seconds(lambda: expense_dtos(rows), repeat)
+    stages["jsonable_encoder"], _ = median_seconds(lambda: JSONResponse(jsonable_encoder({"expenses": dtos})).body, repeat)
+    stages["orjson"], _ = median_seconds(lambda: OrjsonResponse({"expenses": dtos}).body, repeat)
+    return stages
+
+
+async def measure_request(repeat: int) -> float:
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.get("/api/expenses/")
+                response.raise_for_status()
+                durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=50000, help="number of synthetic expenses")
+    parser.add_argument("--repeat", type=int, default=5, help="measures of every stage, the median is reported")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    repeat = max(args.repeat, 1)
+
+    # config.py resolves the data directory relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="expenses-tracker-benchmark-"))
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    seed_database(args.expenses)
+    stages = measure_stages(repeat)
+    stages["request"] = asyncio.run(measure_request(repeat))
+
+    def per_row(seconds: float) -> float:
+        return round(seconds / args.expenses * 1_000_000, 3)
+
+    results = {
+        "expenses": args.expenses,
+        "repeat": repeat,
+        "us_per_row": {stage: per_row(seconds) for stage, seconds in stages.items()},
+        "orm_jsonable_encoder_us_per_row": per_row(stages["orm_query"] + stages["orm_dto"] + stages["jsonable_encoder"]),
+        "core_orjson_us_per_row": per_row(stages["core_query"] + stages["row_dto"] + stages["orjson"]),
+    }
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Measures the startup of the API: the import of app.main, with the cumulative import time of each module it
+imports from python -X importtime, and the lifespan startup (database initialization) against an empty
+database in a temporary directory. Every run is a new interpreter, the medians are reported.
+
+Fails when a module that must be loaded lazily (pandas by default) is imported at startup, or when the
+import is slower than a baseline written by a previous run with --output.
+
+    python benchmarks/StartupBenchmark.py --runs 5 --output startup.json
+    python benchmarks/StartupBenchmark.py --baseline startup.json --tolerance 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the measured interpreter, prints the timings as JSON
+STARTUP_PROGRAM = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(startup())
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "lifespan_ms": (time.perf_counter() - imported) * 1000,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    """Cumulative import time in ms of the modules imported by app.main itself, from -X importtime lines."""
+    # A module's line comes after the lines of its imports, nested imports are indented by two more spaces
+    direct_imports: dict[str, float] = {}
+    app_imports: dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        indent = len(name) - len(name.lstrip())
+        if indent == 3:
+            direct_imports[name.strip()] = int(cumulative) / 1000
+        elif indent == 1:
+            if name.strip() == "app.main":
+                app_imports = direct_imports
+            direct_imports = {}
+    return app_imports
+
+
+def run_once() -> tuple[dict, dict[str, float]]:
+    working_dir = tempfile.mkdtemp(prefix="expenses-tracker-startup-")
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, LOG_LEVEL="WARNING")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_PROGRAM],
+        cwd=working_dir, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(process.stdout.strip().splitlines()[-1]), parse_importtime(process.stderr)
+
+
+def run(runs: int, lazy_modules: list[str], top: int) -> dict:
+    timings = []
+    imports: dict[str, list[float]] = {}
+    modules: set[str] = set()
+    for _ in range(runs):
+        timing, app_imports = run_once()
+        timings.append(timing)
+        modules.update(timing["modules"])
+        for name, milliseconds in app_imports.items():
+            imports.setdefault(name, []).append(milliseconds)
+
+    slowest = sorted(((statistics.median(ms), name) for name, ms in imports.items()), reverse=True)[:top]
+    return {
+        "runs": runs,
+        "import_ms": round(statistics.median(t["import_ms"] for t in timings), 1),
+        "lifespan_ms": round(statistics.median(t["lifespan_ms"] for t in timings), 1),
+        "slowest_imports_ms": {name: round(ms, 1) for ms, name in slowest},
+        "eager_lazy_modules": sorted(m for m in lazy_modules if m in modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of measured interpreter starts")
+    parser.add_argument("--lazy-module", action="append", default=None, help="module that must not be imported at startup, pandas by default")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports of app.main reported")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare the import time with")
+    parser.add_argument("--tolerance", type=float, default=20, help="allowed import slowdown over the baseline, in percent")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.lazy_module or ["pandas"], args.top)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = [f"{module} is imported at startup" for module in results["eager_lazy_modules"]]
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline["import_ms"] * (1 + args.tolerance / 100)
+        if results["import_ms"] > limit:
+            failures.append(f"import took {results['import_ms']} ms, over {limit:.1f} ms ({args.tolerance}% above the baseline)")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Generates realistic synthetic statements in every format the extractors read, for the benchmarks:
+
+    bnc         BNC ; separated CSV with a card number column
+    roger_csv   Rogers CSV export, only read with its source selected on upload
+    roger_html  Rogers HTML statement with the selected cardholder
+    tangerine   Tangerine latin-1 CSV with French headers
+    triangle    Triangle CSV with the account information preamble
+
+The expenses only depend on the seed: the first n expenses of a seed are the same whatever the number
+generated, so a statement of n rows followed by one of m > n rows re-uploads n existing expenses.
+
+    python benchmarks/StatementGenerator.py bnc --rows 100000 --output bnc.csv
+"""
+import argparse
+import csv
+import html
+import io
+import random
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterator
+
+# (description, amount, date, category), amount is positive for a purchase, negative for a refund or payment
+SyntheticExpense = tuple[str, float, datetime, str]
+
+MERCHANTS = [
+    "METRO", "IGA", "PROVIGO", "MAXI", "COSTCO WHOLESALE", "WALMART", "SHELL", "PETRO-CANADA", "ESSO",
+    "UBER TRIP", "UBER EATS", "AMAZON.CA", "NETFLIX.COM", "SPOTIFY", "SAQ", "TIM HORTONS", "STARBUCKS",
+    "MCDONALD'S", "HYDRO-QUEBEC", "VIDEOTRON", "BELL CANADA", "PHARMAPRIX", "JEAN COUTU", "CANADIAN TIRE",
+    "IKEA", "STM", "AIR CANADA", "AIRBNB", "DOLLARAMA", "SEPAQ",
+]
+CITIES = ["MONTREAL", "LAVAL", "QUEBEC", "LONGUEUIL", "GATINEAU", "SHERBROOKE", "TORONTO", "OTTAWA"]
+CATEGORIES = [
+    "Épicerie", "Restaurants", "Essence", "Transport", "Magasinage", "Divertissement", "Services publics",
+    "Santé", "Voyage", "Abonnements", "Maison", "Alcool",
+]
+# Share of the expenses that are refunds or payments
+CREDIT_RATIO = 0.05
+STORE_COUNT = 9999
+
+
+def synthetic_expenses(count: int, seed: int = 0, start_date: datetime = datetime(2020, 1, 1), days: int = 5 * 365) -> Iterator[SyntheticExpense]:
+    random_generator = random.Random(seed)
+    for _ in range(count):
+        merchant = random_generator.choice(MERCHANTS)
+        store = random_generator.randint(1, STORE_COUNT)
+        amount = round(random_generator.lognormvariate(3.5, 1.0), 2)
+        if random_generator.random() < CREDIT_RATIO:
+            amount = -amount
+        yield (
+            f"{merchant} #{store:04d} {random_generator.choice(CITIES)}",
+            amount,
+            start_date + timedelta(days=random_generator.randrange(days)),
+            random_generator.choice(CATEGORIES),
+        )
+
+
+def rule_patterns(count: int, seed: int = 0) -> list[str]:
+    """Category family regex rules matching the descriptions of a store, like the rules users write."""
+    random_generator = random.Random(seed)
+    return [
+        "^" + re.escape(f"{random_generator.choice(MERCHANTS)} #{random_generator.randint(1, STORE_COUNT):04d}") + r"\b"
+        for _ in range(count)
+    ]
+
+
+def _money(amount: float) -> str:
+    return f"-${-amount:,.2f}" if amount < 0 else f"${amount:,.2f}"
+
+
+def write_bnc(expenses: Iterator[SyntheticExpense], card_number: str) -> bytes:
+    lines = ["Date;card Number;Description;Category;Debit;Credit"]
+    for description, amount, date, category in expenses:
+        debit, credit = (f"{amount:.2f}", "") if amount >= 0 else ("", f"{-amount:.2f}")
+        lines.append(f"{date:%Y-%m-%d};************{card_number};{description};{category};{debit};{credit}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def write_roger_csv(expenses: Iterator[SyntheticExpense], card_number: str) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow([
+        "Date", "Posted Date", "Reference Number", "Activity Type", "Activity Status", "Card Number",
+        "Merchant Category Description", "Merchant Name", "Merchant City", "Merchant State or Province",
+        "Merchant Country Code", "Merchant Postal Code", "Amount", "Rewards", "Name on Card",
+    ])
+    for index, (description, amount, date, category) in enumerate(expenses):
+        writer.writerow([
+            f"{date:%Y-%m-%d}", f"{date + timedelta(days=1):%Y-%m-%d}", 85000000000 + index, "TRANS", "APPROVED",
+            f"************{card_number}", category, description, description.rsplit(" ", 1)[-1], "QC", "CAN",
+            "H2X 1Y4", _money(amount), "", "JANE DOE",
+        ])
+    return output.getvalue().encode()
+
+
+def write_roger_html(expenses: Iterator[SyntheticExpense], card_number: str) -> bytes:
+    rows = []
+    for description, amount, date, category in expenses:
+        rows.append(
+            f'<tr class="transaction"><td><span>{date:%b %d, %Y}</span></td><td>{date + timedelta(days=1):%b %d, %Y}</td>'
+            f'<td><div class="merchant">{html.escape(description)}</div></td><td>{html.escape(category)}</td>'
+            f'<td><img alt="posted">Posted</td><td class="amount">{_money(amount)}</td><td>0</td></tr>\n'
+        )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Statement</title>'
+        '<style>td { padding: 2px; }</style><script>window.statement = {};</script></head><body>'
+        '<header><img src="logo.svg" alt="Rogers bank logo"></header>'
+        f'<div class="card"><p aria-label="Selected cardholder">JANE DOE <span>....{card_number}.</span></p></div>'
+        '<table><thead><tr><th>Pending</th></tr></thead>'
+        '<tbody><tr><td>No pending transactions</td></tr></tbody></table>'
+        '<table><tbody><tr><th>Date</th><th>Posted date</th><th>Description</th><th>Category</th><th>Status</th><th>Amount</th><th>Rewards</th></tr>\n'
+        f'{"".join(rows)}</tbody></table></body></html>'
+    ).encode()
+
+
+def write_tangerine(expenses: Iterator[SyntheticExpense], card_number: str) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["Date de l'opération", "Transaction", "Nom", "Description", "Montant"])
+    for description, amount, date, category in expenses:
+        # Purchases are negative amounts
+        writer.writerow([
+            f"{date:%m/%d/%Y}", "ACHAT" if amount >= 0 else "CRÉDIT", description,
+            f"Points Remises en argent ~ Category: {category}", f"{-amount:.2f}",
+        ])
+    return output.getvalue().encode("latin-1")
+
+
+def write_triangle(expenses: Iterator[SyntheticExpense], card_number: str) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["Triangle Mastercard"])
+    writer.writerow(["Card number", f"************{card_number}"])
+    writer.writerow(["Statement date", f"{datetime(2024, 1, 1):%Y-%m-%d}"])
+    writer.writerow(["REF", "TRANSACTION DATE", "POSTED DATE", "TYPE", "DESCRIPTION", "Category", "AMOUNT"])
+    for index, (description, amount, date, category) in enumerate(expenses):
+        writer.writerow([
+            f"{index:012d}", f"{date:%Y-%m-%d}", f"{date + timedelta(days=1):%Y-%m-%d}",
+            "PURCHASE" if amount >= 0 else "PAYMENT", description, category, f"{amount:.2f}",
+        ])
+    return output.getvalue().encode()
+
+
+@dataclass
+class StatementFormat:
+    name: str
+    source_type: str
+    extension: str
+    write: Callable[[Iterator[SyntheticExpense], str], bytes]
+    detectable: bool = True  # recognized on upload without selecting its source
+
+
+FORMATS = {
+    statement_format.name: statement_format for statement_format in [
+        StatementFormat("bnc", "BNC", ".csv", write_bnc),
+        StatementFormat("roger_csv", "ROGER", ".csv", write_roger_csv, detectable=False),
+        StatementFormat("roger_html", "ROGER", ".html", write_roger_html),
+        StatementFormat("tangerine", "TANGERINE", ".csv", write_tangerine),
+        StatementFormat("triangle", "TRIANGLE", ".csv", write_triangle),
+    ]
+}
+
+
+def generate(format: str, rows: int, seed: int = 0, card_number: str = "1234", start_date: datetime = datetime(2020, 1, 1)) -> bytes:
+    """The content of a statement file of `rows` synthetic expenses in the format."""
+    return FORMATS[format].write(synthetic_expenses(rows, seed, start_date), card_number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("format", choices=FORMATS)
+    parser.add_argument("--rows", type=int, default=1000, help="number of expenses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--card-number", default="1234", help="last 4 digits of the card")
+    parser.add_argument("--output", help="file written, named after the format by default")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.format}_{args.rows}{FORMATS[args.format].extension}"
+    with open(output, "wb") as f:
+        f.write(generate(args.format, args.rows, args.seed, args.card_number))
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import logging
+import re
+import threading
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from database.Category import Category
+from database.CategoryFamily import CategoryFamily
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CategoryFamilyClassifier:
+    """
+    Holds the classification rules of the category families in memory:
+    - the regex patterns, pre-compiled and kept in precedence order (category family id)
+    - the category name -> category family id mapping used when no regex matches
+
+    The rules are loaded once per rules version. Any write changing the rules (regex update,
+    combine, category creation/deletion) must call `invalidate()` so the next `get()` rebuilds it.
+    """
+
+    _lock = threading.Lock()
+    _version = 0
+    _instance: Optional["CategoryFamilyClassifier"] = None
+
+    def __init__(self, patterns: list[tuple[int, str]], categories: dict[str, int], version: int = 0):
+        self.version = version
+        self.patterns = patterns
+        self.categories = categories
+        self.compiled: list[tuple[int, re.Pattern]] = []
+        for category_family_id, pattern in patterns:
+            try:
+                self.compiled.append((category_family_id, re.compile(pattern, re.IGNORECASE)))
+            except re.error as e:
+                LOGGER.warning(f"Ignoring invalid regex pattern '{pattern}' of category family {category_family_id}: {e}")
+
+    @classmethod
+    def load(cls, session: Session, version: int = 0) -> "CategoryFamilyClassifier":
+        """Builds a classifier from the rules currently stored in the database."""
+        patterns = session.query(CategoryFamily.id, CategoryFamily.regex_pattern).filter(
+            CategoryFamily.regex_pattern.isnot(None),
+            CategoryFamily.regex_pattern != ''
+        ).order_by(CategoryFamily.id).all()
+        categories = session.query(Category.name, Category.category_family_id).order_by(Category.id.desc()).all()
+        return cls(
+            patterns=[(family_id, pattern) for family_id, pattern in patterns],
+            # Ordered by descending id so the first created category wins on duplicated names, like `.first()` did
+            categories={name: family_id for name, family_id in categories},
+            version=version
+        )
+
+    @classmethod
+    def get(cls, session: Session) -> "CategoryFamilyClassifier":
+        """Returns the classifier of the current rules version, building it if the rules changed."""
+        with cls._lock:
+            if cls._instance is None or cls._instance.version != cls._version:
+                cls._instance = cls.load(session, cls._version)
+                LOGGER.info(f"Category family classifier built for rules version {cls._version} with {len(cls._instance.compiled)} regex patterns and {len(cls._instance.categories)} categories.")
+            return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """Marks the cached rules as stale. To call after every write changing the category families rules."""
+        with cls._lock:
+            cls._version += 1
+            LOGGER.info(f"Category family classifier invalidated. Rules version is now {cls._version}.")
+
+    def match_regex(self, description: str | None) -> int | None:
+        """Returns the id of the first category family whose regex matches the description."""
+        if not description:
+            return None
+        for category_family_id, pattern in self.compiled:
+            if pattern.search(description):
+                return category_family_id
+        return None
+
+    def classify(self, description: str | None, category_name: str | None) -> int | None:
+        """
+        Returns the category family id for an expense:
+        - the first category family whose regex matches the description
+        - otherwise the category family of the category named `category_name`
+        - otherwise None, the caller decides if a new category family must be created.
+        """
+        category_family_id = self.match_regex(description)
+        if category_family_id is not None:
+            return category_family_id
+        if category_name is None:
+            return None
+        return self.categories.get(category_name)
+
+    def add_category(self, category_name: str, category_family_id: int):
+        """Registers a category created by the caller without rebuilding the whole classifier."""
+        # The instance is shared between the request threads, `rules()` must not see the dict while it changes
+        with self._lock:
+            self.categories.setdefault(category_name, category_family_id)
+
+    def rules(self) -> tuple[list[tuple[int, str]], dict[str, int]]:
+        """Returns a copy of the patterns and of the category mapping, safe to pickle while `add_category` runs."""
+        with self._lock:
+            return list(self.patterns), dict(self.categories)
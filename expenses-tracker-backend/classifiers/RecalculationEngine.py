@@ -0,0 +1,153 @@
+import logging
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+from config import RECALCULATION_CHUNK_SIZE, RECALCULATION_WORKERS
+from DatabaseSetup import WRITE_LOCK
+from database.Expense import Expense
+from database.Facades.CategoryFamilyFacade import CategoryFamilyFacade
+from dto.RecalculationResult import RecalculationResult
+
+LOGGER = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters of a statement
+UPDATE_BATCH_SIZE = 900
+
+_WORKER_CLASSIFIER: CategoryFamilyClassifier | None = None
+
+
+def _init_worker(patterns: list[tuple[int, str]], categories: dict[str, int]):
+    global _WORKER_CLASSIFIER
+    _WORKER_CLASSIFIER = CategoryFamilyClassifier(patterns, categories)
+
+
+def _classify_chunk(rows: list[tuple[int, str, str, int]]) -> tuple[list[tuple[int, int]], list[tuple[int, str]]]:
+    return classify_rows(_WORKER_CLASSIFIER, rows) # type: ignore
+
+
+def classify_rows(classifier: CategoryFamilyClassifier, rows: list[tuple[int, str, str, int]]) -> tuple[list[tuple[int, int]], list[tuple[int, str]]]:
+    """
+    Classifies (id, description, original_category, category_family_id) rows.
+    Returns the (id, new category_family_id) of the rows to move and the (id, original_category)
+    of the rows matching neither a regex nor a known category.
+    """
+    changes = []
+    unresolved = []
+    for expense_id, description, original_category, current_family_id in rows:
+        category_family_id = classifier.classify(description, original_category)
+        if category_family_id is None:
+            unresolved.append((expense_id, original_category))
+        elif category_family_id != current_family_id:
+            changes.append((expense_id, category_family_id))
+    return changes, unresolved
+
+
+class RecalculationEngine:
+    """
+    Recalculates the category family of every unlocked expense:
+    - streams (id, description, original_category, category_family_id) tuples with a Core select
+    - classifies them by chunk, in a process pool when there is at least one chunk per worker
+    - creates the missing category families once, then applies one bulk UPDATE per target category family
+    The run is a single transaction, under WRITE_LOCK so the upload batches do not interleave with it.
+    """
+
+    def __init__(self, session: Session, chunk_size: int = RECALCULATION_CHUNK_SIZE, workers: int = RECALCULATION_WORKERS):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def run(self) -> RecalculationResult:
+        with WRITE_LOCK:
+            try:
+                result = self._recalculate()
+            except Exception:
+                self.session.rollback()
+                raise
+        LOGGER.info(f"Recalculation complete: {result}")
+        return result
+
+    def _recalculate(self) -> RecalculationResult:
+        result = RecalculationResult()
+
+        start = time.perf_counter()
+        classifier = CategoryFamilyClassifier.get(self.session)
+        total = self.session.execute(select(func.count(Expense.id)).where(Expense.lock_category == 0)).scalar_one()
+        result.timings["load_rules"] = time.perf_counter() - start
+        LOGGER.info(f"Recalculating {total} expenses with {len(classifier.compiled)} regex patterns.")
+
+        start = time.perf_counter()
+        targets: dict[int, list[int]] = defaultdict(list)
+        unresolved: dict[str, list[int]] = defaultdict(list)
+        for changes, chunk_unresolved, scanned in self._classify(classifier, total):
+            result.scanned_expenses += scanned
+            for expense_id, category_family_id in changes:
+                targets[category_family_id].append(expense_id)
+            for expense_id, original_category in chunk_unresolved:
+                unresolved[original_category].append(expense_id)
+        result.timings["stream_and_classify"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        category_family_facade = CategoryFamilyFacade(self.session)
+        for original_category, expense_ids in unresolved.items():
+            if original_category is None:
+                LOGGER.warning(f"{len(expense_ids)} expenses have no regex match and no original category. Keeping their category family.")
+                continue
+            family = category_family_facade.add_category_family(original_category)
+            targets[family.id].extend(expense_ids)
+            result.created_category_families += 1
+        result.timings["create_category_families"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for category_family_id, expense_ids in targets.items():
+            for i in range(0, len(expense_ids), UPDATE_BATCH_SIZE):
+                batch = expense_ids[i:i + UPDATE_BATCH_SIZE]
+                updated = self.session.execute(
+                    update(Expense)
+                    .where(Expense.id.in_(batch), Expense.lock_category == 0)
+                    .values(category_family_id=category_family_id)
+                    .execution_options(synchronize_session=False)
+                )
+                result.updated_expenses += updated.rowcount
+        self.session.commit()
+        if result.created_category_families:
+            CategoryFamilyClassifier.invalidate()
+        result.timings["apply_updates"] = time.perf_counter() - start
+        return result
+
+    def _stream_chunks(self):
+        rows = self.session.execute(
+            select(Expense.id, Expense.description, Expense.original_category, Expense.category_family_id)
+            .where(Expense.lock_category == 0)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        for partition in rows.partitions():
+            yield [tuple(row) for row in partition]
+
+    def _classify(self, classifier: CategoryFamilyClassifier, total: int):
+        # Starting the worker processes costs more than classifying a few chunks in process
+        if self.workers <= 1 or total < self.chunk_size * self.workers:
+            for rows in self._stream_chunks():
+                yield *classify_rows(classifier, rows), len(rows)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=classifier.rules()
+        ) as executor:
+            # Bound the in-flight chunks so memory does not grow with the table size
+            pending: deque[tuple[Future, int]] = deque()
+            for rows in self._stream_chunks():
+                pending.append((executor.submit(_classify_chunk, rows), len(rows)))
+                if len(pending) >= self.workers * 2:
+                    future, scanned = pending.popleft()
+                    yield *future.result(), scanned
+            while pending:
+                future, scanned = pending.popleft()
+                yield *future.result(), scanned
@@ -13,9 +13,51 @@ UI_URL = os.getenv("UI_URL", "http://localhost:4200")
 DATA_DIR = "data"
 DB_PATH = os.path.join(DATA_DIR, "expenses_tracker.db")
 DB_SQL_EXPORT_PATH = os.path.join(DATA_DIR, "exported_expenses_tracker.sql")
+DB_SQL_GZ_EXPORT_PATH = os.path.join(DATA_DIR, "exported_expenses_tracker.sql.gz")
+DB_SQLITE_EXPORT_PATH = os.path.join(DATA_DIR, "exported_expenses_tracker.db")
+# Bytes of SQL dump compressed and sent at once when exporting the database
+DB_EXPORT_CHUNK_SIZE = int(os.getenv("DB_EXPORT_CHUNK_SIZE", str(1024 * 1024)))
 SQL_INIT_SCRIPT_PATH = os.path.join(DATA_DIR, "init_db.sql")
 SQL_INIT_DATA_PATH = "init_data.txt"
 
+# Number of rows parsed and committed at once when importing a CSV file, 0 to read the whole file at once
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "50000"))
+
+# Number of uploaded files processed at the same time, and of worker processes for CPU heavy parsing (0 to parse in the upload thread)
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_PROCESS_WORKERS = int(os.getenv("UPLOAD_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+# Bytes read from the start of an uploaded file to detect its format when no source is selected
+UPLOAD_SNIFF_SIZE = int(os.getenv("UPLOAD_SNIFF_SIZE", str(64 * 1024)))
+
+# Category family recalculation
+RECALCULATION_CHUNK_SIZE = int(os.getenv("RECALCULATION_CHUNK_SIZE", "5000"))
+RECALCULATION_WORKERS = int(os.getenv("RECALCULATION_WORKERS", str(os.cpu_count() or 1)))
+
+# Worker threads running the route handlers, kept below SQLAlchemy's 15 pooled connections (5 + 10 overflow)
+# so a burst of requests waits for a thread instead of a connection. Uploads use UPLOAD_CONCURRENCY more.
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "10"))
+
+# Largest page of GET /expenses/?limit=
+EXPENSE_PAGE_MAX_SIZE = int(os.getenv("EXPENSE_PAGE_MAX_SIZE", "5000"))
+# Rows fetched from the database per chunk of a streamed (NDJSON) expense listing
+EXPENSE_STREAM_BATCH_SIZE = int(os.getenv("EXPENSE_STREAM_BATCH_SIZE", "1000"))
+
+# Results of /budget/calculate and /source/averages kept in memory until the next write, 0 to disable
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+
+# Compiled patterns kept for the SQLite REGEXP function
+REGEXP_CACHE_SIZE = int(os.getenv("REGEXP_CACHE_SIZE", "128"))
+
+# SQLite storage: WAL lets readers run while a single writer imports, see https://www.sqlite.org/pragma.html
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable with WAL except on power loss
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative values are in KiB, so 64 MiB per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # milliseconds a writer waits for the write lock
+# Connections of the read-only engine used by the GET endpoints
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", str(API_THREADPOOL_SIZE)))
+
 if os.path.isdir(DATA_DIR) is False:
     os.makedirs(DATA_DIR)
 
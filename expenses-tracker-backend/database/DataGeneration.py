@@ -0,0 +1,18 @@
+import threading
+
+
+class DataGeneration:
+    """Process wide counter of the committed writes, bumped by GenerationDialect."""
+
+    _lock = threading.Lock()
+    _value = 0
+
+    @classmethod
+    def current(cls) -> int:
+        return cls._value
+
+    @classmethod
+    def bump(cls) -> int:
+        with cls._lock:
+            cls._value += 1
+            return cls._value
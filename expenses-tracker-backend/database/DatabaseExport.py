@@ -0,0 +1,156 @@
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Iterator
+
+from config import DB_EXPORT_CHUNK_SIZE, DB_SQL_EXPORT_PATH, DB_SQL_GZ_EXPORT_PATH, DB_SQLITE_EXPORT_PATH
+from DatabaseSetup import READ_ENGINE
+from database.DataGeneration import DataGeneration
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ExportFormat:
+    path: str
+    media_type: str
+    compressed: bool = False
+
+
+EXPORT_FORMATS = {
+    "sql": ExportFormat(DB_SQL_EXPORT_PATH, "application/sql"),
+    "sql.gz": ExportFormat(DB_SQL_GZ_EXPORT_PATH, "application/gzip", compressed=True),
+    "sqlite": ExportFormat(DB_SQLITE_EXPORT_PATH, "application/vnd.sqlite3"),
+}
+
+# Data generation of the export file of each format, the file is reused while no write was committed since
+_lock = threading.Lock()
+_export_generations: dict[str, int] = {}
+
+
+def cached_export(format: str) -> str | None:
+    """Path of the export of the current data in the format, None when it has to be exported again."""
+    path = EXPORT_FORMATS[format].path
+    with _lock:
+        if _export_generations.get(format) == DataGeneration.current() and os.path.exists(path):
+            return path
+    return None
+
+
+def _publish(format: str, generation: int, temporary_path: str):
+    path = EXPORT_FORMATS[format].path
+    with _lock:
+        # A download of the previous file keeps reading it, replacing only changes what the path points to
+        os.replace(temporary_path, path)
+        _export_generations[format] = generation
+    LOGGER.info(f"Exported the database as {format} at generation {generation} to {path}.")
+
+
+def _temporary_path(path: str) -> str:
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def stream_sql_dump(format: str) -> Iterator[bytes]:
+    """
+    Yields the SQL dump of the database, gzip compressed for sql.gz, in chunks as it is produced, and
+    keeps a copy for the next exports of the same data. The dump reads a single snapshot: in WAL mode
+    the read transaction sees the data of its start and writers are not blocked meanwhile.
+    """
+    export_format = EXPORT_FORMATS[format]
+    # Read before the snapshot starts, at the first read after BEGIN, see GenerationDialect. A write committed
+    # meanwhile may be in the dump too, the file is then stored with an older generation and not reused.
+    generation = DataGeneration.current()
+    temporary_path = _temporary_path(export_format.path)
+    # wbits=31 writes the gzip container around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if export_format.compressed else None
+    try:
+        with READ_ENGINE.connect() as connection, open(temporary_path, "wb") as file:
+            dbapi_connection: sqlite3.Connection = connection.connection.driver_connection # type: ignore
+            dbapi_connection.execute("BEGIN")
+            try:
+                lines: list[str] = []
+                size = 0
+                for line in dump_statements(dbapi_connection):
+                    lines.append(f"{line}\n")
+                    size += len(line) + 1
+                    if size >= DB_EXPORT_CHUNK_SIZE:
+                        chunk = _encode(lines, compressor)
+                        file.write(chunk)
+                        yield chunk
+                        lines, size = [], 0
+                chunk = _encode(lines, compressor) + (compressor.flush() if compressor is not None else b"")
+                file.write(chunk)
+                yield chunk
+            finally:
+                dbapi_connection.rollback()
+        _publish(format, generation, temporary_path)
+    finally:
+        # Left over when the client disconnected or the dump failed
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def dump_statements(dbapi_connection: sqlite3.Connection) -> Iterator[str]:
+    """
+    iterdump's statements, restorable with virtual tables: iterdump inserts their schema with writable_schema,
+    which is only loaded by a new connection, and dumps their rows and shadow tables. Virtual tables are
+    created with their CREATE statement instead, and the FTS5 indexes rebuilt once the data is restored.
+    The schema version is dumped too, restoring the dump does not run the migrations again.
+    """
+    tables = dbapi_connection.execute("SELECT name, type FROM pragma_table_list WHERE schema = 'main' AND type IN ('virtual', 'shadow')").fetchall()
+    schemas = dict(dbapi_connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%'").fetchall())
+    skipped_prefixes = ["PRAGMA writable_schema="]
+    for name, type in tables:
+        skipped_prefixes.append(f'INSERT INTO "{name}" VALUES(')
+        if type == "shadow":
+            skipped_prefixes.append(f"CREATE TABLE '{name}'")
+    skipped = tuple(skipped_prefixes)
+    virtual_table_prefix = "INSERT INTO sqlite_master(type,name,tbl_name,rootpage,sql)VALUES('table','"
+    fts5_tables = [name for name, sql in schemas.items() if "using fts5" in sql.lower()]
+    schema_version = dbapi_connection.execute("PRAGMA user_version").fetchone()[0]
+
+    for statement in dbapi_connection.iterdump():
+        if statement.startswith(skipped):
+            continue
+        if statement.startswith(virtual_table_prefix):
+            name = statement[len(virtual_table_prefix):].split("'", 1)[0]
+            statement = f"{schemas[name]};"
+        elif statement == "COMMIT;":
+            for name in fts5_tables:
+                yield f"INSERT INTO \"{name}\" (\"{name}\") VALUES ('rebuild');"
+            yield f"PRAGMA user_version = {schema_version};"
+        yield statement
+
+
+def _encode(lines: list[str], compressor) -> bytes:
+    data = "".join(lines).encode()
+    return compressor.compress(data) if compressor is not None else data
+
+
+def export_sqlite() -> str:
+    """
+    Copies the database with the SQLite online backup API and returns the path of the copy, a standalone
+    database file. Copying every page in one step reads a single snapshot without blocking writers.
+    """
+    export_format = EXPORT_FORMATS["sqlite"]
+    # Read before the backup reads its snapshot, like for the SQL dump
+    generation = DataGeneration.current()
+    temporary_path = _temporary_path(export_format.path)
+    try:
+        target = sqlite3.connect(temporary_path)
+        try:
+            with READ_ENGINE.connect() as connection:
+                connection.connection.driver_connection.backup(target) # type: ignore
+            # The copy has the WAL journal mode of the database, a download is a single file
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+        _publish("sqlite", generation, temporary_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return export_format.path
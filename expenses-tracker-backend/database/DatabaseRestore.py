@@ -0,0 +1,301 @@
+import gzip
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from sqlalchemy import Connection, create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from analytics import MonthlyRollup
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+from config import DATA_DIR, SQLITE_CACHE_SIZE
+from DatabaseSetup import ENGINE, WRITE_LOCK
+from database import ExpenseFullText
+from database.DataGeneration import DataGeneration
+from database.Migrations import migrate
+from database.RestoreConflict import RestoreConflict
+from dto.RestoreResult import RestoreResult
+
+LOGGER = logging.getLogger(__name__)
+
+RESTORE_FORMATS = ("sql", "sql.gz", "sqlite", "csv", "parquet")
+# Formats replacing only the expenses, the rest of the database is copied from the live one
+EXPENSE_FORMATS = ("csv", "parquet")
+FORMAT_EXTENSIONS = {
+    ".sql.gz": "sql.gz", ".sql": "sql", ".db": "sqlite", ".sqlite": "sqlite", ".sqlite3": "sqlite",
+    ".csv": "csv", ".parquet": "parquet",
+}
+SQLITE_HEADER = b"SQLite format 3\x00"
+GZIP_HEADER = b"\x1f\x8b"
+
+# Columns of the canonical expenses CSV/Parquet, named like the expense table columns
+REQUIRED_EXPENSE_COLUMNS = ["description", "amount", "date", "source_id", "category_family_id"]
+OPTIONAL_EXPENSE_COLUMNS = ["id", "original_category", "lock_category", "calculation_status", "user_id"]
+TEXT_EXPENSE_COLUMNS = ["description", "original_category", "calculation_status"]
+NUMERIC_EXPENSE_COLUMNS = ["id", "amount", "lock_category", "source_id", "category_family_id", "user_id"]
+# Format of the DateTime columns written by SQLAlchemy
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# The database is built in a new file nothing else reads: a crash only loses that file, so it is
+# written without journal nor fsync, and the swap into the live database is the only durable write.
+RELAXED_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA threads = {min(os.cpu_count() or 1, 8)}",  # helper threads sorting the rows of CREATE INDEX
+    f"PRAGMA cache_size = {min(SQLITE_CACHE_SIZE, -262144)}",  # at least 256 MiB
+]
+
+
+def detect_format(filename: str | None, path: str) -> str:
+    """Restore format of a file from its extension, or from its first bytes when the extension is unknown."""
+    name = (filename or "").lower()
+    for extension, format in FORMAT_EXTENSIONS.items():
+        if name.endswith(extension):
+            return format
+    with open(path, "rb") as f:
+        head = f.read(len(SQLITE_HEADER))
+    if head.startswith(SQLITE_HEADER):
+        return "sqlite"
+    if head.startswith(GZIP_HEADER):
+        return "sql.gz"
+    raise ValueError(f"Can not tell the restore format of {filename}, expected one of {', '.join(RESTORE_FORMATS)}.")
+
+
+def restore_database(path: str, format: str) -> RestoreResult:
+    """
+    Replaces the database with the content of a SQL dump (sql, sql.gz), a SQLite database file (sqlite),
+    or the expenses of a canonical CSV/Parquet file, which keeps the users, sources and categories.
+    The new database is built and migrated in a temporary file, then copied over the live database in a
+    single transaction: readers see the old or the new data, never a partial restore.
+    An expenses file is loaded in a copy of the live database: the imports wait from the copy to the swap,
+    and the restore is rejected with RestoreConflict if another write was committed meanwhile.
+    """
+    if format not in RESTORE_FORMATS:
+        raise ValueError(f"Unknown restore format {format}, expected one of {', '.join(RESTORE_FORMATS)}.")
+    if format in EXPENSE_FORMATS:
+        with WRITE_LOCK:
+            return _restore(path, format, DataGeneration.current())
+    return _restore(path, format)
+
+
+def _restore(path: str, format: str, copied_generation: int | None = None) -> RestoreResult:
+    result = RestoreResult(format=format)
+    start = time.perf_counter()
+    temporary_path = os.path.join(DATA_DIR, f"restore.{uuid.uuid4().hex}.tmp")
+    engine = create_engine(f"sqlite:///{temporary_path}", poolclass=NullPool)
+    event.listen(engine, "connect", _relax_connection)
+    try:
+        with engine.connect() as connection:
+            phase_start = time.perf_counter()
+            if format in ("sql", "sql.gz"):
+                result.rows = _load_sql_dump(connection, path, compressed=format == "sql.gz")
+            elif format == "sqlite":
+                result.rows = _load_sqlite(connection, path)
+            else:
+                result.rows = _load_expenses(connection, path, format)
+            result.timings["load"] = time.perf_counter() - phase_start
+            result.rows_per_second = round(result.rows / max(result.timings["load"], 1e-9))
+
+        phase_start = time.perf_counter()
+        # Dumps and backups of older versions are brought to the current schema before going live
+        result.schema_version = migrate(engine)
+        with engine.connect() as connection:
+            _check(connection)
+            result.expenses = connection.exec_driver_sql("SELECT count(*) FROM expense").scalar_one()
+        result.timings["migrate_and_check"] = time.perf_counter() - phase_start
+        engine.dispose()
+
+        phase_start = time.perf_counter()
+        _swap(temporary_path, copied_generation)
+        result.timings["swap"] = time.perf_counter() - phase_start
+    except DBAPIError as e:
+        raise ValueError(f"Could not restore the {format} file: {e.orig}") from e
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Could not restore the {format} file: {e}") from e
+    finally:
+        engine.dispose()
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    result.seconds = time.perf_counter() - start
+    LOGGER.info(
+        f"Restored {result.rows} rows from a {format} file at {result.rows_per_second} rows/s, "
+        f"{result.expenses} expenses in {result.seconds:.2f}s: {result.timings}"
+    )
+    return result
+
+
+def _relax_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in RELAXED_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _driver_connection(connection: Connection) -> sqlite3.Connection:
+    return connection.connection.driver_connection # type: ignore
+
+
+def _load_sql_dump(connection: Connection, path: str, compressed: bool) -> int:
+    """Runs the dump, a single transaction from BEGIN TRANSACTION to COMMIT which creates the indexes after the rows."""
+    _use_page_size(connection)
+    with (gzip.open(path, "rt") if compressed else open(path)) as f:
+        script = f.read()
+    if not script.lstrip().upper().startswith("BEGIN"):
+        script = f"BEGIN;\n{script}\nCOMMIT;"
+    _driver_connection(connection).executescript(script)
+    return _count_table_rows(connection)
+
+
+def _load_sqlite(connection: Connection, path: str) -> int:
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        source.backup(_driver_connection(connection))
+    finally:
+        source.close()
+    # The copy has the page size of the file, the swap needs the page size of the live database
+    page_size = _live_page_size()
+    if connection.exec_driver_sql("PRAGMA page_size").scalar_one() != page_size:
+        connection.exec_driver_sql(f"PRAGMA page_size = {page_size}")
+        connection.exec_driver_sql("VACUUM")
+    return _count_table_rows(connection)
+
+
+def _load_expenses(connection: Connection, path: str, format: str) -> int:
+    """
+    Replaces the expenses of a copy of the live database by the rows of the file in one transaction. The
+    expense indexes and triggers are dropped during the insert, then recreated with the rollup and the
+    full-text index rebuilt once, instead of being updated for every row.
+    """
+    columns, rows = _read_expenses(path, format)
+    with ENGINE.connect() as live_connection:
+        _driver_connection(live_connection).backup(_driver_connection(connection))
+
+    dbapi_connection = _driver_connection(connection)
+    dbapi_connection.execute("BEGIN")
+    schema = dbapi_connection.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'expense' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    for type, name, _ in schema:
+        dbapi_connection.execute(f'DROP {type.upper()} "{name}"')
+    dbapi_connection.execute("DELETE FROM expense")
+    dbapi_connection.executemany(
+        f"INSERT INTO expense ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+    )
+    loaded = dbapi_connection.execute("SELECT count(*) FROM expense").fetchone()[0]
+    violations = dbapi_connection.execute("SELECT count(*) FROM pragma_foreign_key_check('expense')").fetchone()[0]
+    if violations:
+        raise ValueError(f"{violations} expenses reference a user, source or category family missing from the database.")
+    for _, _, sql in schema:
+        dbapi_connection.execute(sql)
+    MonthlyRollup.rebuild(connection)
+    ExpenseFullText.rebuild(connection)
+    dbapi_connection.execute("ANALYZE expense")
+    dbapi_connection.execute("COMMIT")
+    return loaded
+
+
+def _read_expenses(path: str, format: str) -> tuple[list[str], list[tuple]]:
+    import pandas as pd  # only restores of CSV/Parquet files need pandas
+
+    if format == "csv":
+        # Only empty fields are missing values, a description like "NA" is kept
+        frame = pd.read_csv(
+            path, dtype={column: str for column in TEXT_EXPENSE_COLUMNS},
+            keep_default_na=False, na_values={column: [""] for column in REQUIRED_EXPENSE_COLUMNS + OPTIONAL_EXPENSE_COLUMNS},
+        )
+    else:
+        try:
+            frame = pd.read_parquet(path)
+        except ImportError as e:
+            raise ValueError(f"Restoring a Parquet file needs pyarrow or fastparquet installed: {e}") from e
+
+    missing = [column for column in REQUIRED_EXPENSE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"The expenses file is missing the columns {', '.join(missing)}.")
+    if "lock_category" not in frame.columns:
+        frame["lock_category"] = 0
+    columns = [column for column in REQUIRED_EXPENSE_COLUMNS + OPTIONAL_EXPENSE_COLUMNS if column in frame.columns]
+    values = {}
+    try:
+        values["date"] = pd.to_datetime(frame["date"], format="ISO8601").dt.strftime(DATE_FORMAT)
+        for column in NUMERIC_EXPENSE_COLUMNS:
+            if column in frame.columns:
+                values[column] = pd.to_numeric(frame[column])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid value in the expenses file: {e}") from e
+    values["lock_category"] = values["lock_category"].fillna(0)
+
+    # Column lists zipped in rows, missing values as None
+    column_values = []
+    for column in columns:
+        series = values.get(column, frame[column]).astype(object)
+        column_values.append(series.where(series.notna(), None).tolist())
+    return columns, list(zip(*column_values))
+
+
+def _count_table_rows(connection: Connection) -> int:
+    tables = connection.exec_driver_sql(
+        "SELECT name FROM pragma_table_list WHERE schema = 'main' AND type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).scalars().all()
+    return sum(connection.exec_driver_sql(f'SELECT count(*) FROM "{table}"').scalar_one() for table in tables)
+
+
+def _use_page_size(connection: Connection):
+    # Set on the empty file before the first table is created
+    connection.exec_driver_sql(f"PRAGMA page_size = {_live_page_size()}")
+
+
+def _live_page_size() -> int:
+    with ENGINE.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA page_size").scalar_one()
+
+
+def _check(connection: Connection):
+    tables = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'expense'").scalars().all()
+    if not tables:
+        raise ValueError("The restored database has no expense table, it is not an expenses tracker database.")
+    integrity = connection.exec_driver_sql("PRAGMA quick_check").scalars().all()
+    if integrity != ["ok"]:
+        raise ValueError(f"The restored database is corrupt: {'; '.join(integrity[:5])}")
+
+
+def _swap(temporary_path: str, copied_generation: int | None = None):
+    """
+    Copies the restored database over the live one with the backup API, a single write transaction of the
+    live database: with WAL the readers keep their snapshot until their transaction ends, the next ones
+    read the restored data. The write lock keeps the imports out meanwhile.
+    The data generation of the copy of the live database is checked first when the restore started from one.
+    """
+    source = sqlite3.connect(temporary_path)
+    try:
+        with WRITE_LOCK, ENGINE.connect() as connection:
+            if copied_generation is not None and DataGeneration.current() != copied_generation:
+                raise RestoreConflict("The database was modified during the restore, the expenses file was not restored. Retry the restore.")
+            source.backup(_driver_connection(connection))
+    finally:
+        source.close()
+    # The cached analytics results, exports and classification rules are of the old data
+    DataGeneration.bump()
+    CategoryFamilyClassifier.invalidate()
+
+
+if __name__ == "__main__":
+    # python -m database.DatabaseRestore <file> [--format sql|sql.gz|sqlite|csv|parquet]
+    import argparse
+    import json
+    from dataclasses import asdict
+    from DatabaseSetup import init_database
+
+    parser = argparse.ArgumentParser(description="Replaces the database with a SQL dump, a SQLite database or an expenses CSV/Parquet file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=RESTORE_FORMATS, help="detected from the file when omitted")
+    args = parser.parse_args()
+
+    init_database()
+    restore_result = restore_database(args.path, args.format or detect_format(args.path, args.path))
+    print(json.dumps(asdict(restore_result), indent=2))
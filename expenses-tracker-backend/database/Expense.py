@@ -24,4 +24,5 @@ class Expense(Base):
 
     __table_args__ = (
         UniqueConstraint("description", "amount", "date", "user_id", "source_id", name="unique_expense_constraint"),
+        # The indexes are created by the migrations, see database/Migrations.py
     )
\ No newline at end of file
@@ -0,0 +1,79 @@
+import logging
+import re
+from sqlalchemy import Connection, column, func, literal_column, table
+
+LOGGER = logging.getLogger(__name__)
+
+# External content FTS5 index of expense: only the index is stored, the text is read back from expense.
+# The prefix indexes answer the 2 and 3 characters typeahead prefixes without scanning the term list.
+CREATE_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5(
+        description, original_category,
+        content='expense', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )"""
+
+_INDEX_SQL = "INSERT INTO expense_fts (rowid, description, original_category) VALUES (NEW.id, NEW.description, NEW.original_category);"
+_UNINDEX_SQL = (
+    "INSERT INTO expense_fts (expense_fts, rowid, description, original_category) "
+    "VALUES ('delete', OLD.id, OLD.description, OLD.original_category);"
+)
+
+# Same as the monthly rollup, triggers keep the index in sync whatever the code path writing to expense
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_insert AFTER INSERT ON expense
+    BEGIN {_INDEX_SQL}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_delete AFTER DELETE ON expense
+    BEGIN {_UNINDEX_SQL}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_update AFTER UPDATE OF description, original_category ON expense
+    BEGIN {_UNINDEX_SQL} {_INDEX_SQL}
+    END""",
+]
+
+EXPENSE_FTS = table("expense_fts", column("rowid"), column("description"), column("original_category"))
+EXPENSE_FTS_MATCH = literal_column("expense_fts")
+
+# bm25 weights of description and original_category, a description hit ranks above a category hit.
+# bm25 is negative, the best matches have the lowest rank.
+RANK = func.bm25(EXPENSE_FTS_MATCH, 10.0, 1.0)
+
+# A "quoted phrase" with an optional trailing *, or a bare word
+QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"(\*?)|([^\s"]+)')
+
+
+def create(connection: Connection):
+    connection.exec_driver_sql(CREATE_TABLE_SQL)
+    for trigger in TRIGGERS:
+        connection.exec_driver_sql(trigger)
+
+
+def rebuild(connection: Connection):
+    """Reindexes every expense, e.g. after editing the database by hand."""
+    connection.exec_driver_sql("INSERT INTO expense_fts (expense_fts) VALUES ('rebuild')")
+
+
+def to_match_query(query: str) -> str | None:
+    """
+    Converts a search box query to an FTS5 MATCH expression, None when it has no searchable term.
+    Bare words are prefixes, "quoted words" are exact phrases, or phrase prefixes when followed by *.
+    Every term must match. The user query never reaches the FTS5 syntax, so it can not be invalid.
+    """
+    terms = []
+    for phrase, phrase_prefix, word in QUERY_TERM_PATTERN.findall(query):
+        text, prefix = (phrase, phrase_prefix == "*") if phrase else (word.rstrip("*"), True)
+        if not any(character.isalnum() for character in text):
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) if terms else None
+
+
+if __name__ == "__main__":
+    # python -m database.ExpenseFullText: reindexes every expense description
+    from DatabaseSetup import ENGINE, init_database
+
+    init_database()
+    with ENGINE.begin() as connection:
+        rebuild(connection)
+    LOGGER.info("Rebuilt expense_fts.")
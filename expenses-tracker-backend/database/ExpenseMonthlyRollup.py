@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Float, Integer
+from database.Base import Base
+
+
+class ExpenseMonthlyRollup(Base):
+    """
+    Sum and count of the included expenses (see analytics/MonthlyRollup.py) per month, category family,
+    source and user. Maintained by triggers on the expense table.
+    """
+    __tablename__ = 'expense_monthly_rollup'
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    category_family_id = Column(Integer, primary_key=True)
+    source_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True, default=0)  # 0 for the expenses without a user
+    total = Column(Float, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,7 @@
 import logging
 from sqlalchemy.orm import Session
 
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
 from database.Category import Category
 from database.CategoryFamily import CategoryFamily
 
@@ -13,45 +14,36 @@ class CategoryFamilyFacade:
     def get_or_create_by_category_name(self, expense_description: str | None, category_name: str) -> CategoryFamily:
         """
         Get or create a CategoryFamily and Category by category_name.
-        - If a CategoryFamily with the given name exists, returns it.
+        - If a CategoryFamily regex matches the expense_description, returns it.
+        - If a Category with the given name exists, returns its CategoryFamily.
         - Otherwise, creates a new CategoryFamily and a Category linked to it.
         Returns the CategoryFamily instance.
         """
 
-        self.logger.info(f"Getting or creating CategoryFamily for category name and description: {category_name}, {expense_description}")
-
-        if expense_description is not None:
-            # Try to find a CategoryFamily by matching the regex_pattern with the expense_description
-            family = self.session.query(CategoryFamily).filter(
-                CategoryFamily.regex_pattern.isnot(None),
-                CategoryFamily.regex_pattern != ''
-            ).all()
-            for f in family:
-                import re
-                if re.search(f.regex_pattern, expense_description, re.IGNORECASE):
-                    self.logger.info(f"Matched regex pattern '{f.regex_pattern}' for description '{expense_description}' for family '{f.name}'")
-                    return f
-
-        # Get or create the Category
-        category = self.session.query(Category).filter_by(name=category_name).first()
-        if category:
-            self.logger.info(f"Category found: {category.name}")
-            return category.category_family
-            
+        self.logger.debug(f"Getting or creating CategoryFamily for category name and description: {category_name}, {expense_description}")
 
+        classifier = CategoryFamilyClassifier.get(self.session)
+        category_family_id = classifier.classify(expense_description, category_name)
+        if category_family_id is not None:
+            return self.session.get(CategoryFamily, category_family_id)
+
+        return self.create_category_family(category_name)
+
+    def create_category_family(self, category_name: str) -> CategoryFamily:
+        """Creates a new CategoryFamily and a Category with the same name linked to it, and commits them."""
+        family = self.add_category_family(category_name)
+        self.session.commit()
+        CategoryFamilyClassifier.get(self.session).add_category(category_name, family.id)
+        return family
+
+    def add_category_family(self, category_name: str) -> CategoryFamily:
+        """
+        Adds a new CategoryFamily and a Category with the same name linked to it, flushed in the current
+        transaction. The caller commits, then calls CategoryFamilyClassifier.invalidate().
+        """
         family = CategoryFamily(name=category_name)
+        family.categories.append(Category(name=category_name))
         self.session.add(family)
-        self.session.commit()
-        self.session.refresh(family)
-        self.logger.info(f"Created new CategoryFamily: {family.name}")
-
-        category = Category(
-            category_family_id=family.id,
-            name=category_name
-        )
-        self.session.add(category)
-        self.session.commit()
-        self.session.refresh(category)
-        self.logger.info(f"Created new Category: {category.name} under Family: {family.name}")
-        
-        return family
\ No newline at end of file
+        self.session.flush()
+        self.logger.info(f"Created new CategoryFamily: {family.name} and its Category")
+        return family
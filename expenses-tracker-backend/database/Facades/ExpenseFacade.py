@@ -1,39 +1,110 @@
+import base64
+from collections import Counter
 from datetime import datetime
+import json
 import logging
-from typing import Optional
-from sqlalchemy import DateTime
+from typing import Iterator, Optional, Sequence
+from sqlalchemy import DateTime, Row, Select, and_, func, insert, null, or_, select, tuple_
 from sqlalchemy.orm import Session, Query
-from sqlalchemy.orm import joinedload
 
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
 from database.Facades.SourceFacade import SourceFacade
+from database import ExpenseFullText
+from database.CategoryFamily import CategoryFamily
 from database.Expense import Expense
+from database.Source import Source
+from database.User import User
 from database.Facades.CategoryFamilyFacade import CategoryFamilyFacade
+from dto.ExpenseFilter import ExpenseFilter
+
+# Columns the expense listing can be sorted by, the id breaks ties so the (column, id) keyset is unique
+SORT_COLUMNS = {
+    "date": Expense.date,
+    "amount": Expense.amount,
+    "description": Expense.description,
+}
+# JSON types of the last value of a cursor per sort column, rank is null when searching by id
+CURSOR_VALUE_TYPES = {
+    "date": (str,),
+    "amount": (int, float),
+    "description": (str,),
+    "rank": (int, float, type(None)),
+}
 
 class ExpenseFacade:
     def __init__(self, db_session: Session):
         self.db = db_session
         self.extracted = set()
+        # Expenses of the loaded windows and the ones the facade inserted, per (description, amount, date, source_id) key
+        self.existing_keys: Counter[tuple[str, float, datetime, int | None]] = Counter()
+        self.inserted_keys: Counter[tuple[str, float, datetime, int | None]] = Counter()
+        # source_id -> loaded (start_date, end_date, max expense id read)
+        self.preloaded_windows: dict[int | None, tuple[datetime, datetime, int]] = {}
+        # category name -> id of the category families created by create_expenses
+        self.created_category_families: dict[str, int] = {}
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
 
     def get_expense_by_details(self, description: str, amount: float, date: datetime, source_id: int | None) -> Optional[Expense]:
         return self.db.query(Expense).filter_by(description=description, amount=amount, date=date, source_id=source_id).first()
     
+    def preload_existing_keys(self, source_id: int | None, start_date: datetime, end_date: datetime):
+        """
+        Loads the (description, amount, date, source_id) keys of the source's expenses between start_date
+        and end_date, so duplicate detection in that window is a set lookup instead of a query.
+        Called for every batch, under WRITE_LOCK: only the part of the window not loaded yet is read, and the
+        expenses committed in the loaded part since the previous call, by this upload or any other.
+        """
+        max_expense_id = self.db.query(func.coalesce(func.max(Expense.id), 0)).scalar()
+        query = self.db.query(Expense.description, Expense.amount, Expense.date).filter(
+            Expense.source_id == source_id,
+            Expense.id <= max_expense_id
+        )
+        window = self.preloaded_windows.get(source_id)
+        if window is None:
+            query = query.filter(Expense.date >= start_date, Expense.date <= end_date)
+        else:
+            loaded_start_date, loaded_end_date, loaded_max_expense_id = window
+            missing_windows = []
+            if max_expense_id > loaded_max_expense_id:
+                missing_windows.append(and_(Expense.date >= loaded_start_date, Expense.date <= loaded_end_date, Expense.id > loaded_max_expense_id))
+            if start_date < loaded_start_date:
+                missing_windows.append(and_(Expense.date >= start_date, Expense.date < loaded_start_date))
+            if end_date > loaded_end_date:
+                missing_windows.append(and_(Expense.date > loaded_end_date, Expense.date <= end_date))
+            if not missing_windows:
+                return
+            query = query.filter(or_(*missing_windows))
+            start_date, end_date = min(start_date, loaded_start_date), max(end_date, loaded_end_date)
+
+        keys = [(description, amount, date, source_id) for description, amount, date in query]
+        self.existing_keys.update(keys)
+        self.preloaded_windows[source_id] = (start_date, end_date, max_expense_id)
+        self.logger.info(f"Preloaded {len(keys)} existing expense keys for source {source_id} between {start_date} and {end_date}")
+
+    def is_existing_key(self, key: tuple[str, float, datetime, int | None]) -> bool:
+        """Whether an expense of a preloaded window has the key, other than the ones the facade inserted."""
+        return self.existing_keys[key] > self.inserted_keys[key]
+
+    def is_existing_expense(self, description: str, amount: float, date: datetime, source_id: int | None) -> bool:
+        window = self.preloaded_windows.get(source_id)
+        if window is not None and window[0] <= date <= window[1]:
+            return self.is_existing_key((description, amount, date, source_id))
+        return self.get_expense_by_details(description, amount, date, source_id) is not None
+
     def is_multiple_row_in_same_extract(self, description: str, amount: float, date: datetime, source_id: int | None) -> bool:
         count = self.db.query(Expense).filter_by(description=description, amount=amount, date=date, source_id=source_id).count()
         return count > 1
 
     def create_expense(self, description: str, amount: float, date: datetime, category_name: str, source_id: int) -> Expense | None:
-        catetogyFacade = CategoryFamilyFacade(self.db)
-        category_family = catetogyFacade.get_or_create_by_category_name(description, category_name)
+        category_family_facade = CategoryFamilyFacade(self.db)
+        category_family = category_family_facade.get_or_create_by_category_name(description, category_name)
 
         self.logger.info(f"Creating expense: {description}, {amount}, {date}, {category_family.name}, {source_id}")
         if (description, amount, date, source_id) in self.extracted:
             self.logger.warning(f"Duplicate expense in the same extract: {description}, {amount}, {date}, {source_id}. Will not consider as duplicate in DB.")
-        else:
-            existing_expense = self.get_expense_by_details(description, amount, date, source_id)
-            if existing_expense:
-                self.logger.info(f"Expense already exists: {existing_expense.description}, {existing_expense.amount}, {existing_expense.date}. Not saving duplicate.")
-                return None
+        elif self.is_existing_expense(description, amount, date, source_id):
+            self.logger.info(f"Expense already exists: {description}, {amount}, {date}. Not saving duplicate.")
+            return None
         
 
         new_expense = Expense(description=description,
@@ -47,10 +118,248 @@ class ExpenseFacade:
         self.extracted.add((description, amount, date, source_id))
         return new_expense
     
-    def get_expenses_between_dates(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> list[Expense]:
-        query: Query = self.db.query(Expense).options(joinedload(Expense.source), joinedload(Expense.category_family), joinedload(Expense.user))
-        if start_date:
-            query = query.filter(Expense.date >= start_date)
-        if end_date:
-            query = query.filter(Expense.date <= end_date)
-        return query.all()
\ No newline at end of file
+    def create_expenses(self, expenses: list[tuple[str, float, datetime, str, int]]) -> tuple[int, int]:
+        """
+        Bulk version of create_expense for the (description, amount, date, category_name, source_id) rows of a file:
+        - preloads the dedupe keys of each source for the date window of the rows
+        - classifies each distinct (description, category_name) once
+        - creates the missing category families in the transaction of the batch, see created_category_families
+        - inserts the new rows with a single executemany INSERT
+        Can be called once per chunk of the same file: like with `self.extracted`, a row repeated in the
+        file is only a duplicate of the expenses the facade did not insert, by an earlier upload, another
+        file of the same upload or a concurrent upload. The keys are the only guard against duplicates: the
+        unique constraint includes user_id, which is NULL for uploaded expenses, so it never applies.
+        Returns the number of created and existing expenses.
+        """
+        windows: dict[int, tuple[datetime, datetime]] = {}
+        for _, _, date, _, source_id in expenses:
+            start_date, end_date = windows.get(source_id, (date, date))
+            windows[source_id] = (min(start_date, date), max(end_date, date))
+        for source_id, (start_date, end_date) in windows.items():
+            self.preload_existing_keys(source_id, start_date, end_date)
+
+        classifier = CategoryFamilyClassifier.get(self.db)
+        category_family_facade = CategoryFamilyFacade(self.db)
+        category_family_ids: dict[tuple[str, str], int] = {}
+        new_expenses = []
+        existing_count = 0
+        for description, amount, date, category_name, source_id in expenses:
+            key = (description, amount, date, source_id)
+            if self.is_existing_key(key):
+                existing_count += 1
+                continue
+
+            category_family_id = category_family_ids.get((description, category_name))
+            if category_family_id is None:
+                category_family_id = classifier.classify(description, category_name)
+                if category_family_id is None:
+                    category_family_id = self.created_category_families.get(category_name)
+                if category_family_id is None:
+                    category_family_id = category_family_facade.add_category_family(category_name).id
+                    self.created_category_families[category_name] = category_family_id
+                category_family_ids[(description, category_name)] = category_family_id
+
+            new_expenses.append({
+                "description": description,
+                "amount": amount,
+                "date": date,
+                "original_category": category_name,
+                "source_id": source_id,
+                "category_family_id": category_family_id
+            })
+
+        if new_expenses:
+            self.db.execute(insert(Expense.__table__), new_expenses)
+            self.inserted_keys.update((expense["description"], expense["amount"], expense["date"], expense["source_id"]) for expense in new_expenses)
+        created_count = len(new_expenses)
+        self.logger.info(f"Inserted {created_count} expenses, {existing_count} already existed.")
+        return created_count, existing_count
+
+    def get_expenses_between_dates(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Sequence[Row]:
+        return self.get_expenses(ExpenseFilter(start_date=start_date, end_date=end_date))
+
+    @staticmethod
+    def select_expense_rows() -> Select:
+        """
+        Core select of the flat rows of the expenses with their source, category family and user columns.
+        The listings read these columns only, without building ORM identities for every expense.
+        """
+        return (
+            select(
+                Expense.id, Expense.date, Expense.description, Expense.amount, Expense.original_category,
+                Expense.lock_category, Expense.calculation_status,
+                Source.id.label("source_id"), Source.name.label("source_name"), Source.type.label("source_type"),
+                Source.card_number.label("source_card_number"),
+                User.id.label("user_id"), User.username.label("user_username"),
+                CategoryFamily.id.label("category_family_id"), CategoryFamily.name.label("category_family_name"),
+                CategoryFamily.regex_pattern.label("category_family_regex_pattern")
+            )
+            .outerjoin(Source, Source.id == Expense.source_id)
+            .outerjoin(CategoryFamily, CategoryFamily.id == Expense.category_family_id)
+            .outerjoin(User, User.id == Expense.user_id)
+        )
+
+    def get_expenses(self, expense_filter: ExpenseFilter, sort_by: str | None = None, descending: bool = False) -> Sequence[Row]:
+        """The rows of select_expense_rows of the matching expenses."""
+        query = self.filter_expenses(self.select_expense_rows(), expense_filter)
+        if sort_by is not None:
+            query = query.order_by(*self.sort_order(sort_by, descending))
+        return self.db.execute(query).all()
+
+    def get_expenses_page(
+        self,
+        expense_filter: ExpenseFilter,
+        limit: int,
+        cursor: str | None = None,
+        sort_by: str = "date",
+        descending: bool = False
+    ) -> tuple[Sequence[Row], str | None]:
+        """
+        Returns a page of at most limit expense rows and the cursor of the next page, None on the last page.
+        Pages are read by keyset on (sort column, id): the cursor holds the last row's values and the next
+        page starts right after them, so the cost of a page does not depend on how deep it is.
+        """
+        sort_column = SORT_COLUMNS[sort_by]
+        query = self.filter_expenses(self.select_expense_rows(), expense_filter)
+        if cursor is not None:
+            last_value, last_id = self.decode_cursor(cursor, sort_by)
+            keyset = tuple_(sort_column, Expense.id)
+            query = query.filter(keyset < (last_value, last_id) if descending else keyset > (last_value, last_id))
+        # One extra row tells if there is a next page
+        rows = self.db.execute(query.order_by(*self.sort_order(sort_by, descending)).limit(limit + 1)).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, self.encode_cursor(getattr(last, sort_by), last.id)
+
+    def stream_expenses(
+        self,
+        expense_filter: ExpenseFilter,
+        sort_by: str | None = None,
+        descending: bool = False,
+        batch_size: int = 1000
+    ) -> Iterator[Sequence[Row]]:
+        """
+        Yields batches of the rows of select_expense_rows, fetched batch_size rows at a time from the SQLite
+        cursor so the whole result is never held in memory.
+        """
+        query = self.filter_expenses(self.select_expense_rows(), expense_filter)
+        if sort_by is not None:
+            query = query.order_by(*self.sort_order(sort_by, descending))
+        result = self.db.execute(query.execution_options(yield_per=batch_size))
+        yield from result.partitions()
+
+    def search_full_text(
+        self,
+        match_query: str,
+        expense_filter: ExpenseFilter,
+        limit: int,
+        cursor: str | None = None,
+        by_rank: bool = True
+    ) -> tuple[Sequence[Row], str | None]:
+        """
+        Returns a page of the rows of the expenses matching the FTS5 match_query and the filters and the cursor
+        of the next page. Pages are read by keyset like get_expenses_page: on (rank, id) for the best ranked
+        first, otherwise on the id alone for the most recently added first. Ranking scores every match, the id
+        order is read straight from the index and stays fast however many expenses match.
+        """
+        query = self.filter_expenses(
+            self.select_expense_rows()
+            .add_columns(ExpenseFullText.RANK.label("rank") if by_rank else null().label("rank"))
+            .join(ExpenseFullText.EXPENSE_FTS, ExpenseFullText.EXPENSE_FTS.c.rowid == Expense.id)
+            .filter(ExpenseFullText.EXPENSE_FTS_MATCH.match(match_query)),
+            expense_filter
+        )
+        if by_rank:
+            if cursor is not None:
+                last_rank, last_id = self.decode_cursor(cursor, "rank")
+                query = query.filter(tuple_(ExpenseFullText.RANK, Expense.id) > (last_rank, last_id))
+            query = query.order_by(ExpenseFullText.RANK, Expense.id)
+        else:
+            if cursor is not None:
+                _, last_id = self.decode_cursor(cursor, "rank")
+                query = query.filter(ExpenseFullText.EXPENSE_FTS.c.rowid < last_id)
+            # Ordered by the FTS rowid, not Expense.id, so SQLite lets FTS5 return the matches in order
+            query = query.order_by(ExpenseFullText.EXPENSE_FTS.c.rowid.desc())
+        rows = self.db.execute(query.limit(limit + 1)).all()
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], self.encode_cursor(last.rank, last.id)
+
+    def count_full_text(self, match_query: str, expense_filter: ExpenseFilter) -> int:
+        query = self.filter_expenses(
+            select(func.count())
+            .select_from(Expense)
+            .join(ExpenseFullText.EXPENSE_FTS, ExpenseFullText.EXPENSE_FTS.c.rowid == Expense.id)
+            .where(ExpenseFullText.EXPENSE_FTS_MATCH.match(match_query)),
+            expense_filter
+        )
+        return self.db.execute(query).scalar_one()
+
+    def count_expenses(self, expense_filter: ExpenseFilter) -> int:
+        query = self.filter_expenses(select(func.count()).select_from(Expense), expense_filter)
+        return self.db.execute(query).scalar_one()
+
+    @staticmethod
+    def filter_expenses(query, expense_filter: ExpenseFilter):
+        """Applies the filter to an ORM query or a Core select on the expense table."""
+        if expense_filter.start_date:
+            query = query.filter(Expense.date >= expense_filter.start_date)
+        if expense_filter.end_date:
+            query = query.filter(Expense.date <= expense_filter.end_date)
+        if expense_filter.source_ids:
+            query = query.filter(Expense.source_id.in_(expense_filter.source_ids))
+        if expense_filter.category_family_ids:
+            query = query.filter(Expense.category_family_id.in_(expense_filter.category_family_ids))
+        if expense_filter.min_amount is not None:
+            query = query.filter(Expense.amount >= expense_filter.min_amount)
+        if expense_filter.max_amount is not None:
+            query = query.filter(Expense.amount <= expense_filter.max_amount)
+        if expense_filter.calculation_statuses:
+            statuses = [status for status in expense_filter.calculation_statuses if status != "NONE"]
+            conditions = [Expense.calculation_status.in_(statuses)] if statuses else []
+            if "NONE" in expense_filter.calculation_statuses:
+                conditions.append(Expense.calculation_status.is_(None))
+            query = query.filter(or_(*conditions))
+        if expense_filter.lock_category is not None:
+            query = query.filter(Expense.lock_category == int(expense_filter.lock_category))
+        if expense_filter.description:
+            escaped = expense_filter.description.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.filter(Expense.description.ilike(f"%{escaped}%", escape="\\"))
+        if expense_filter.description_pattern:
+            query = query.filter(Expense.description.op("REGEXP")(expense_filter.description_pattern))
+        return query
+
+    @staticmethod
+    def sort_order(sort_by: str, descending: bool) -> list:
+        columns = [SORT_COLUMNS[sort_by], Expense.id]
+        return [column.desc() for column in columns] if descending else columns
+
+    @staticmethod
+    def encode_cursor(last_value, last_id: int) -> str:
+        if isinstance(last_value, datetime):
+            last_value = last_value.isoformat()
+        return base64.urlsafe_b64encode(json.dumps([last_value, last_id]).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort_by: str) -> tuple:
+        """
+        Decodes a cursor of encode_cursor, raises ValueError when it is invalid or its last value is not of
+        the type of the sort column: compared with a value of another type, SQLite would return no row.
+        """
+        try:
+            last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            # bool is an int for isinstance
+            if isinstance(last_value, bool) or not isinstance(last_value, CURSOR_VALUE_TYPES[sort_by]):
+                raise TypeError(f"{sort_by} cursor value {last_value!r}")
+            if isinstance(last_id, bool) or not isinstance(last_id, int):
+                raise TypeError(f"cursor id {last_id!r}")
+            if sort_by == "date":
+                last_value = datetime.fromisoformat(last_value)
+            elif sort_by == "amount":
+                last_value = float(last_value)
+            return last_value, last_id
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
\ No newline at end of file
@@ -1,12 +1,14 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import extract, func, or_
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from dateutil.relativedelta import relativedelta
 
+from analytics.MonthlyRollup import MonthlyRollup
+from analytics.PeriodCounter import count_months
 from database.Expense import Expense
 from database.Source import Source
 from dto.SourceAverage import SourceAverage
+from dto.SourceDto import SourceDto
 
 
 class SourceFacade:
@@ -32,41 +34,19 @@ class SourceFacade:
         end_date: Optional[datetime] = None
     ) -> list[SourceAverage]:
 
-        query = self.session.query(Expense).filter(
-            or_(Expense.amount >= 0, Expense.calculation_status == "INCLUDE"),
-            or_(Expense.calculation_status != "SKIP", Expense.calculation_status.is_(None))
-        )
-        if start_date:
-            query = query.filter(Expense.date >= start_date)
-        if end_date:
-            query = query.filter(Expense.date <= end_date)
+        totals = MonthlyRollup(self.session).included_totals("source_id", start_date, end_date)
 
-        avg = 0.0
         if start_date is None:
             start_date = self.session.query(func.min(Expense.date)).scalar()
         if end_date is None:
             end_date = datetime.now()
         if start_date is None or end_date is None:
             return []
-        delta = relativedelta(end_date, start_date)
 
-        subquery = (
-            query.with_entities(
-                extract('year', Expense.date).label('year'),
-                extract('month', Expense.date).label('month'),
-                Expense.source_id.label('source_id'),
-                func.sum(Expense.amount).label('monthly_sum')
-            )
-            .group_by("source_id", "year", "month")
-            .subquery()
-        )
-        total_months = delta.years * 12 + delta.months
-        if delta.days is not None or delta.days > 0:
-            total_months += 1
-        result = self.session.query(
-            Source,
-            (func.sum(subquery.c.monthly_sum) / total_months).label("average_expense")
-        ).join(Source, Source.id == subquery.c.source_id) \
-         .group_by(Source.id).all()
+        total_months = count_months(start_date, end_date)
+        sources = self.session.query(Source).filter(Source.id.in_(totals.keys())).all()
 
-        return [SourceAverage(source=source, average=average_expense) for source, average_expense in result]
\ No newline at end of file
+        return [
+            SourceAverage(SourceDto(source.id, source.name, source.type, source.card_number), totals[source.id] / total_months) # type: ignore
+            for source in sources
+        ]
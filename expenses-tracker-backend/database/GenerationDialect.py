@@ -0,0 +1,18 @@
+from sqlalchemy.dialects.sqlite.pysqlite import SQLiteDialect_pysqlite
+
+from database.DataGeneration import DataGeneration
+
+
+class GenerationDialect(SQLiteDialect_pysqlite):
+    """
+    pysqlite dialect of the writer engine, registered as sqlite+generation by DatabaseSetup. Bumps the data
+    generation once each DBAPI commit has returned, so the cached results, ETags and exports computed from
+    data read while current() returned N are valid as long as current() == N. The engine `commit` event
+    fires before the DBAPI commit: a reader could see the new generation and still read the data before the write.
+    """
+
+    supports_statement_cache = True
+
+    def do_commit(self, dbapi_connection):
+        super().do_commit(dbapi_connection)
+        DataGeneration.bump()
@@ -0,0 +1,85 @@
+import logging
+from dataclasses import dataclass
+from typing import Callable
+from sqlalchemy import Connection, Engine
+
+from analytics import MonthlyRollup
+from database import ExpenseFullText
+from database.Base import Base
+from database.ExpenseMonthlyRollup import ExpenseMonthlyRollup
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_tables(connection: Connection):
+    # Databases created before the migrations already have their tables, create_all only adds the missing ones
+    Base.metadata.create_all(connection)
+
+
+def create_expense_indexes(connection: Connection):
+    # The only definition of the expense indexes. IF NOT EXISTS: create_all of older versions also created them
+    for statement in [
+        # Date range listing, min(date) and the source averages
+        "CREATE INDEX IF NOT EXISTS ix_expense_date ON expense (date)",
+        # Budget averages: one category family over a date range, covering the summed columns
+        "CREATE INDEX IF NOT EXISTS ix_expense_category_family_date ON expense (category_family_id, date, amount, calculation_status)",
+        # Dedupe key lookups and the preloaded dedupe window of an upload (source_id, date range)
+        "CREATE INDEX IF NOT EXISTS ix_expense_dedupe ON expense (source_id, date, description, amount)",
+        # Recalculation of the unlocked expenses and the moves between category families
+        "CREATE INDEX IF NOT EXISTS ix_expense_lock_category_family ON expense (lock_category, category_family_id)",
+    ]:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("ANALYZE expense")
+
+
+def create_monthly_rollup(connection: Connection):
+    ExpenseMonthlyRollup.__table__.create(connection, checkfirst=True) # type: ignore
+    MonthlyRollup.create_triggers(connection)
+    rows = MonthlyRollup.rebuild(connection)
+    LOGGER.info(f"Filled expense_monthly_rollup with {rows} rows.")
+
+
+def create_expense_full_text_index(connection: Connection):
+    ExpenseFullText.create(connection)
+    ExpenseFullText.rebuild(connection)
+
+
+# Append only: a released migration must never change, add a new version instead
+MIGRATIONS = [
+    Migration(1, "Create the tables", create_tables),
+    Migration(2, "Index the expense hot query paths", create_expense_indexes),
+    Migration(3, "Add the expense monthly rollup and its triggers", create_monthly_rollup),
+    Migration(4, "Add the expense description full-text index and its triggers", create_expense_full_text_index),
+]
+
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar_one()
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Upgrades the database in place to the latest migration, the applied version is stored in PRAGMA user_version.
+    Returns the schema version of the database.
+    """
+    with engine.connect() as connection:
+        version = get_schema_version(connection)
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        LOGGER.info(f"Migrating database to version {migration.version}: {migration.description}")
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {migration.version}")
+        version = migration.version
+
+    LOGGER.info(f"Database schema at version {version}.")
+    return version
@@ -4,4 +4,5 @@ from database.Source import Source
 from database.CategoryFamily import CategoryFamily
 from database.Category import Category
 from database.Expense import Expense
-from database.Budget import Budget
\ No newline at end of file
+from database.Budget import Budget
+from database.ExpenseMonthlyRollup import ExpenseMonthlyRollup
\ No newline at end of file
@@ -0,0 +1,2 @@
+class RestoreConflict(ValueError):
+    """Raised when the live database was written while an expenses file was restored into a copy of it."""
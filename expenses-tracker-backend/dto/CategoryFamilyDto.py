@@ -2,7 +2,7 @@ from dataclasses import dataclass
 
 from dto.CategoryDTO import CategoryDto
 
-@dataclass
+@dataclass(slots=True)
 class CategoryFamilyDto:
     id: int
     name: str
@@ -7,7 +7,7 @@ from dto.CategoryFamilyDto import CategoryFamilyDto
 from dto.SourceDto import SourceDto
 from dto.UserDto import UserDto
 
-@dataclass
+@dataclass(slots=True)
 class ExpenseDto:
   id: int
   date: datetime
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class ExpenseFilter:
+    start_date: datetime | None = None
+    end_date: datetime | None = None
+    source_ids: list[int] | None = None
+    category_family_ids: list[int] | None = None
+    min_amount: float | None = None
+    max_amount: float | None = None
+    calculation_statuses: list[str] | None = None  # SKIP, INCLUDE, or NONE for expenses without a status
+    lock_category: bool | None = None
+    description: str | None = None  # case insensitive substring
+    description_pattern: str | None = None  # case insensitive regular expression, evaluated by SQLite REGEXP
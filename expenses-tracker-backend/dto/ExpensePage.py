@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+from dto.ExpenseDto import ExpenseDto
+
+
+@dataclass(slots=True)
+class ExpensePage:
+    expenses: list[ExpenseDto]
+    next_cursor: str | None = None  # None on the last page
+    total: int | None = None  # only when requested with include_total
@@ -0,0 +1,9 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RecalculationResult:
+    updated_expenses: int = 0
+    scanned_expenses: int = 0
+    created_category_families: int = 0
+    timings: dict[str, float] = field(default_factory=dict)  # seconds per phase
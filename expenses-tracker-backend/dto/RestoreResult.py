@@ -0,0 +1,12 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RestoreResult:
+    format: str
+    rows: int = 0  # rows loaded from the file
+    expenses: int = 0  # expenses in the restored database
+    schema_version: int = 0
+    rows_per_second: float = 0.0
+    seconds: float = 0.0
+    timings: dict[str, float] = field(default_factory=dict)  # seconds per phase
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 
-from database.Source import Source
+from dto.SourceDto import SourceDto
 
 @dataclass
 class SourceAverage:
-    source: Source
+    source: SourceDto
     average: float
\ No newline at end of file
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True)
 class UserDto:
     id: int
     name: str
\ No newline at end of file
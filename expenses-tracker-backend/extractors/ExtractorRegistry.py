@@ -0,0 +1,85 @@
+import importlib
+import logging
+import os
+import threading
+from fastapi import UploadFile
+
+from config import UPLOAD_SNIFF_SIZE
+from database.Source import Source
+from extractors.FileExtractor import FileExtractor
+from extractors.FileHead import FileHead
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ExtractorRegistry:
+    """
+    The extractors an upload can be read with. Auto-detection reads the head of the file once, then every
+    extractor scores it with its sniff signature: the cost is one small read whatever the number of extractors.
+    """
+
+    # Extractors scoring within this margin of the best score are as likely, the upload is ambiguous
+    AMBIGUITY_MARGIN = 0.05
+
+    def __init__(self, extractor_modules: list[str] | None = None, sniff_size: int = UPLOAD_SNIFF_SIZE):
+        self.extractor_modules: list[str] = []
+        self._extractors: list[type[FileExtractor]] | None = None
+        self._lock = threading.Lock()
+        self.sniff_size = sniff_size
+        for module_name in extractor_modules or []:
+            self.register(module_name)
+
+    def register(self, module_name: str):
+        """
+        Registers the extractor class of the module, named like its module. The module is only imported
+        on the first upload: the extractors pull in pandas, which slows down the startup.
+        """
+        with self._lock:
+            self.extractor_modules.append(module_name)
+            self._extractors = None
+
+    @property
+    def extractors(self) -> list[type[FileExtractor]]:
+        with self._lock:
+            if self._extractors is None:
+                self._extractors = [
+                    getattr(importlib.import_module(module_name), module_name.rsplit(".", 1)[-1])
+                    for module_name in self.extractor_modules
+                ]
+            return self._extractors
+
+    def scores(self, file: UploadFile) -> list[tuple[type[FileExtractor], float]]:
+        """The extractors recognizing the file with their confidence, the most confident first."""
+        head = FileHead.read(file.filename, file.file, self.sniff_size)
+        scores = []
+        for extractor_class in self.extractors:
+            try:
+                score = extractor_class.sniff(head)
+            except Exception as e:
+                LOGGER.error(f"Error sniffing {file.filename} with {extractor_class.__name__}: {e}")
+                continue
+            if score > 0:
+                scores.append((extractor_class, score))
+        scores.sort(key=lambda extractor_score: extractor_score[1], reverse=True)
+        LOGGER.info(f"Sniffed {file.filename}: {[(c.__name__, s) for c, s in scores]}")
+        return scores
+
+    def detect(self, file: UploadFile) -> list[type[FileExtractor]]:
+        """
+        The most confident extractor of the file, several when others are as confident, none when no
+        extractor recognizes it.
+        """
+        scores = self.scores(file)
+        if not scores:
+            return []
+        best_score = scores[0][1]
+        return [extractor_class for extractor_class, score in scores if score >= best_score - self.AMBIGUITY_MARGIN]
+
+    def for_source(self, filename: str, source: Source) -> type[FileExtractor] | None:
+        """The extractor of the files of the source type with the filename's extension."""
+        extension = os.path.splitext(filename)[1].lower()
+        for extractor_class in self.extractors:
+            if extractor_class.SOURCE_TYPE is not None and extractor_class.SOURCE_TYPE.lower() == source.type.lower() \
+                    and extension in extractor_class.EXTENSIONS:
+                return extractor_class
+        return None
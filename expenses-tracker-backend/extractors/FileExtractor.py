@@ -1,31 +1,69 @@
 from abc import abstractmethod
+from datetime import datetime
+from typing import Iterable
 from fastapi import UploadFile
 
-from DatabaseSetup import SESSION_MAKER
+from config import UPLOAD_SNIFF_SIZE
+from DatabaseSetup import READ_SESSION_MAKER, SESSION_MAKER, WRITE_LOCK
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+from database.Facades.ExpenseFacade import ExpenseFacade
 from database.Source import Source
 from dto.ExpensesUpload import ExpensesUpload
+from extractors.FileHead import FileHead
 from sqlalchemy.orm import Session
 
 
 class FileExtractor:
+    SOURCE_TYPE: str | None = None  # type of the sources whose files the extractor reads
+    EXTENSIONS: tuple[str, ...] = ()  # lower case extensions of those files
+
     def __init__(self, file: UploadFile, source: Source):
         self.file = file
         self.source = source
 
     @abstractmethod
-    async def extract(self) -> ExpensesUpload:
+    def extract(self) -> ExpensesUpload:
         """Extracts the content of the file."""
         pass
 
-    @abstractmethod
-    async def apply(self) -> bool:
-        """Extracts the content of the file."""
-        pass
+    @classmethod
+    def sniff(cls, head: FileHead) -> float:
+        """
+        Confidence, from 0 to 1, that the file is in the format of the extractor, from the head of the
+        file only. 0 when the extractor can not read the file.
+        """
+        return 0.0
+
+    def apply(self) -> bool:
+        """Validates if the extractor can read the file."""
+        return self.sniff(FileHead.read(self.file.filename, self.file.file, UPLOAD_SNIFF_SIZE)) > 0
 
     def get_sources(self, type: str) -> list[Source]:
         if self.source is None:
-            with SESSION_MAKER() as session:
+            with READ_SESSION_MAKER() as session:
                 session: Session
                 return session.query(Source).filter(Source.type == type).all()
         else:
-            return [self.source]
\ No newline at end of file
+            return [self.source]
+
+    def save_expenses(self, batches: Iterable[list[tuple[str, float, datetime, str, int]]]) -> ExpensesUpload:
+        """
+        Classifies, deduplicates and inserts the (description, amount, date, category_name, source_id) rows,
+        committing after each batch so the database write lock is released between batches.
+        Batches of concurrent uploads are written one at a time, the next batch is parsed meanwhile.
+        """
+        expensesUpload = ExpensesUpload(0, 0)
+        with SESSION_MAKER() as session:
+            session: Session
+            expenseFacade = ExpenseFacade(session)
+            for expenses in batches:
+                with WRITE_LOCK:
+                    created_category_families = len(expenseFacade.created_category_families)
+                    created_count, existing_count = expenseFacade.create_expenses(expenses)
+                    session.commit()
+                    if len(expenseFacade.created_category_families) > created_category_families:
+                        # Before the next batch of any upload classifies its rows with the cached rules
+                        CategoryFamilyClassifier.invalidate()
+                expensesUpload.created_expenses += created_count
+                expensesUpload.existing_expenses += existing_count
+        return expensesUpload
\ No newline at end of file
@@ -0,0 +1,59 @@
+import codecs
+import csv
+import functools
+import os
+from typing import BinaryIO
+
+
+class FileHead:
+    """
+    The first bytes of an uploaded file, read once and shared by the signatures of every extractor.
+    Decoding and splitting in lines are done on first use only.
+    """
+
+    def __init__(self, filename: str | None, data: bytes, truncated: bool):
+        self.filename = filename or ""
+        self.data = data
+        self.truncated = truncated  # the file is longer than data
+
+    @classmethod
+    def read(cls, filename: str | None, file: BinaryIO, size: int) -> "FileHead":
+        data = file.read(size + 1)
+        file.seek(0)
+        return cls(filename, data[:size], len(data) > size)
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename)[1].lower()
+
+    @functools.cached_property
+    def text(self) -> str:
+        """The head decoded as UTF-8, or latin-1 when it is not valid UTF-8 like some bank exports."""
+        try:
+            # Incremental so a character cut at the end of the head is not a decoding error
+            return codecs.getincrementaldecoder("utf-8-sig")().decode(self.data, final=not self.truncated)
+        except UnicodeDecodeError:
+            return self.data.decode("latin-1")
+
+    @functools.cached_property
+    def lines(self) -> list[str]:
+        lines = self.text.splitlines()
+        if self.truncated and lines:
+            lines.pop()  # cut by the end of the head
+        return lines
+
+    def fields(self, line_index: int, delimiter: str) -> list[str]:
+        """The stripped fields of a CSV line of the head, empty when the head has fewer lines."""
+        if line_index >= len(self.lines):
+            return []
+        return [field.strip() for field in next(csv.reader([self.lines[line_index]], delimiter=delimiter), [])]
+
+    def header_score(self, line_index: int, delimiter: str, required_headers) -> float:
+        """1 when the line holds exactly the required headers, 0.9 when it holds them and more, else 0."""
+        headers = set(self.fields(line_index, delimiter))
+        if not set(required_headers).issubset(headers):
+            return 0.0
+        return 1.0 if headers == set(required_headers) else 0.9
+
+    def contains(self, marker: bytes) -> bool:
+        return marker in self.data
@@ -0,0 +1,25 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, TypeVar
+
+from config import UPLOAD_PROCESS_WORKERS
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+
+
+def run_in_process(function: Callable[..., T], *args) -> T:
+    """
+    Runs a CPU heavy parsing function in the process pool shared by the extractors, created on first use.
+    The function runs in the calling thread when UPLOAD_PROCESS_WORKERS is 0.
+    """
+    global _pool
+    if UPLOAD_PROCESS_WORKERS <= 0:
+        return function(*args)
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=UPLOAD_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool.submit(function, *args).result()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+import anyio
+from fastapi import UploadFile
+
+from config import UPLOAD_CONCURRENCY
+from DatabaseSetup import READ_SESSION_MAKER
+from database.Source import Source
+from dto.ExpensesUpload import ExpensesUpload
+from dto.FileFailedToExtract import FileFailedToExtract
+from extractors.FileExtractorCreator import FileExtractorCreator
+from metrics.MetricsRegistry import METRICS
+
+# Rows per second of a file, from a handful of rows to a multi-year export
+ROWS_PER_SECOND_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+UPLOAD_FILES = METRICS.counter("upload_files_total", "Uploaded files per extractor and outcome", ("extractor", "outcome"))
+UPLOAD_ROWS = METRICS.counter("upload_rows_total", "Expenses read from the uploaded files, created or existing", ("extractor",))
+UPLOAD_SECONDS = METRICS.counter("upload_seconds_total", "Seconds spent detecting, parsing and writing the uploaded files", ("extractor",))
+UPLOAD_ROWS_PER_SECOND = METRICS.histogram(
+    "upload_rows_per_second", "Expenses processed per second for each uploaded file", ("extractor",), ROWS_PER_SECOND_BUCKETS
+)
+
+
+class UploadProcessor:
+    """
+    Processes the files of an upload concurrently, off the event loop: each file is detected and parsed
+    in a worker thread, at most `concurrency` at a time, and the parsed batches are written one at a time.
+    """
+
+    def __init__(self, source_id: int | None, concurrency: int = UPLOAD_CONCURRENCY):
+        self.source_id = source_id
+        self.source: Source | None = None
+        self.limiter = anyio.CapacityLimiter(max(concurrency, 1))
+        self.LOGGER = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
+
+    def load_source(self) -> bool:
+        """Loads the source of the upload, in a session closed before the files are processed. False when it does not exist."""
+        if self.source_id is None:
+            return True
+        with READ_SESSION_MAKER() as session:
+            self.source = session.get(Source, self.source_id)
+        return self.source is not None
+
+    async def process(self, files: list[UploadFile]) -> ExpensesUpload:
+        results = await asyncio.gather(*(anyio.to_thread.run_sync(self.process_file, file, limiter=self.limiter) for file in files))
+
+        expensesUpload = ExpensesUpload(0, 0)
+        for result in results:
+            expensesUpload.created_expenses += result.created_expenses
+            expensesUpload.existing_expenses += result.existing_expenses
+            expensesUpload.filesFailedToExtract.extend(result.filesFailedToExtract)
+        return expensesUpload
+
+    def process_file(self, file: UploadFile) -> ExpensesUpload:
+        self.LOGGER.info(f"Processing file: {file.filename} for source: {self.source.name if self.source else 'AUTO-DETECT'}")
+        start = time.perf_counter()
+        extractor_name = "unknown"
+        try:
+            extractors = FileExtractorCreator.create_extractor(file, self.source)
+            if not extractors or len(extractors) == 0:
+                self.LOGGER.warning(f"No extractor found for file: {file.filename}")
+                UPLOAD_FILES.inc(1, (extractor_name, "no_extractor"))
+                return ExpensesUpload(0, 0, [FileFailedToExtract(filename=file.filename, reason=f"No extractor found for the file {file.filename}.")]) # type: ignore
+            if len(extractors) > 1:
+                self.LOGGER.warning(f"Multiple extractors found for file: {file.filename}. Cannot proceed.")
+                classes = [extractor.__class__ for extractor in extractors]
+                UPLOAD_FILES.inc(1, (extractor_name, "multiple_extractors"))
+                return ExpensesUpload(0, 0, [FileFailedToExtract(filename=file.filename, reason=f"Multiple extractors: {classes} found for the file.")]) # type: ignore
+
+            extractor = extractors[0]
+            extractor_name = extractor.__class__.__name__
+            self.LOGGER.info(f"Using extractor {extractor_name} for file: {file.filename}")
+            expensesUpload = extractor.extract()
+            self.LOGGER.info(f"File {file.filename} processed. Created expenses: {expensesUpload.created_expenses}, Existing expenses: {expensesUpload.existing_expenses}")
+            self._record(extractor_name, expensesUpload.created_expenses + expensesUpload.existing_expenses, time.perf_counter() - start)
+            return expensesUpload
+        except Exception as e:
+            self.LOGGER.error(f"Error extracting file {file.filename}: {e}")
+            UPLOAD_FILES.inc(1, (extractor_name, "error"))
+            return ExpensesUpload(0, 0, [FileFailedToExtract(filename=file.filename, reason=str(e))]) # type: ignore
+
+    def _record(self, extractor_name: str, rows: int, seconds: float):
+        UPLOAD_FILES.inc(1, (extractor_name, "processed"))
+        UPLOAD_ROWS.inc(rows, (extractor_name,))
+        UPLOAD_SECONDS.inc(seconds, (extractor_name,))
+        if rows and seconds > 0:
+            UPLOAD_ROWS_PER_SECOND.observe(rows / seconds, (extractor_name,))
@@ -1,8 +1,74 @@
+import logging
+from datetime import datetime
+from typing import Iterator
+import pandas as pd
+
+from config import IMPORT_CHUNK_SIZE
+from dto.ExpensesUpload import ExpensesUpload
 from extractors.FileExtractor import FileExtractor
 
+LOGGER = logging.getLogger(__name__)
+
 
 class ExcelFileExtractor(FileExtractor):
+    """
+    Shared pipeline of the CSV extractors. A subclass declares how to read its file and how its columns
+    map to the normalized expense columns. The file is streamed by chunks of IMPORT_CHUNK_SIZE rows, each
+    chunk is transformed with vectorized pandas operations and saved before the next one is read, so the
+    memory used does not depend on the file size.
+    """
+
+    EXPENSE_COLUMNS = ["description", "amount", "date", "category", "source_id"]
+    DEFAULT_CATEGORY = "Uncategorized"
+
+    READ_CSV_OPTIONS: dict = {}
+    USECOLS: list[str] | None = None  # only parse the columns used by the extractor
+    COLUMN_MAPPING: dict[str, str] = {}  # file column -> normalized expense column
+    DATE_FORMAT = "%Y-%m-%d"
+
+    def extract(self) -> ExpensesUpload:
+        return self.save_expenses(
+            self.to_rows(self.transform(chunk.rename(columns=self.COLUMN_MAPPING))) for chunk in self.read_chunks()
+        )
+
+    def read_chunks(self, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """Reads the file by chunks of chunk_size rows, or at once when chunk_size is 0."""
+        if chunk_size <= 0:
+            yield pd.read_csv(self.file.file, usecols=self.USECOLS, **self.READ_CSV_OPTIONS)
+            return
+        with pd.read_csv(self.file.file, usecols=self.USECOLS, chunksize=chunk_size, **self.READ_CSV_OPTIONS) as reader:
+            yield from reader
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized transforms of the renamed file frame into the normalized expense columns."""
+        df = df.assign(
+            date=pd.to_datetime(df["date"], format=self.DATE_FORMAT),
+            category=self.default_category(df["category"])
+        )
+        if "source_id" not in df.columns:
+            df = df.assign(source_id=self.source.id)
+        return df
+
+    def to_rows(self, expenses: pd.DataFrame) -> list[tuple[str, float, datetime, str, int]]:
+        expenses = expenses[self.EXPENSE_COLUMNS]
+        complete = expenses.dropna()
+        if len(complete) != len(expenses):
+            LOGGER.warning(f"Skipping {len(expenses) - len(complete)} rows with a missing description, amount, date or source in {self.file.filename}")
+        return list(zip(
+            complete["description"].astype(str).tolist(),
+            complete["amount"].astype(float).tolist(),
+            [date.to_pydatetime() for date in complete["date"]],
+            complete["category"].astype(str).tolist(),
+            complete["source_id"].astype(int).tolist()
+        ))
+
+    @classmethod
+    def default_category(cls, categories: pd.Series) -> pd.Series:
+        categories = categories.fillna("").astype(str)
+        return categories.where(categories.str.strip() != "", cls.DEFAULT_CATEGORY)
 
-    async def apply(self) -> bool:
-        """Extracts the content of the file."""
-        return self.file.filename is not None and self.file.filename.lower().endswith(".csv")
\ No newline at end of file
+    @staticmethod
+    def parse_amount(amounts: pd.Series) -> pd.Series:
+        """Parses amounts formatted like "$1,234.50", invalid amounts become NaN."""
+        cleaned = amounts.astype(str).str.replace(r"[$,\s]", "", regex=True)
+        return pd.to_numeric(cleaned, errors="coerce")
@@ -1,17 +1,12 @@
 import logging
 from fastapi import UploadFile
 import pandas as pd
-from database.Facades.ExpenseFacade import ExpenseFacade
 from database.Source import Source
-from dto.ExpensesUpload import ExpensesUpload
-from extractors.FileExtractor import FileExtractor
-from DatabaseSetup import SESSION_MAKER
-from sqlalchemy.orm import Session
+from extractors.FileHead import FileHead
+from extractors.excel.ExcelFileExtractor import ExcelFileExtractor
 
-from datetime import datetime
 
-
-class RogerFileExtractor(FileExtractor):
+class RogerFileExtractor(ExcelFileExtractor):
     """
     Extracts content from a BNC Excel file.
     """
@@ -39,41 +34,23 @@ class RogerFileExtractor(FileExtractor):
         "Name on Card": pd.StringDtype()
 }
 
+    SOURCE_TYPE = "ROGER"
+    EXTENSIONS = (".csv",)
+
+    READ_CSV_OPTIONS = dict(sep=',', dtype=COLUMN_TYPES, header=0)
+    USECOLS = ["Date", "Merchant Name", "Merchant Category Description", "Amount"]
+    COLUMN_MAPPING = {
+        "Date": "date", "Merchant Name": "description", "Merchant Category Description": "category", "Amount": "amount"
+    }
+
     def __init__(self, file: UploadFile, source: Source):
         super().__init__(file, source)
         self.LOGGER = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
 
-    async def extract(self) -> ExpensesUpload:
-        """
-        Extracts the content of the BNC Excel file.
-        """
-        # Implement the extraction logic specific to BNC Excel files
-        # For example, reading the file and processing its content
-        df = pd.read_csv(self.file.file, sep=',', dtype=RogerFileExtractor.COLUMN_TYPES, header=0)
-        created_count = 0
-        existing_expenses = 0
-        with SESSION_MAKER() as session:
-            session: Session
-            expenseFacade = ExpenseFacade(session)
-            for _, row in df.iterrows():
-                self.LOGGER.debug(f"Processing row: {row}")
-
-                amount_str = str(row["Amount"]).replace("$", "").replace(",", "").strip()
-                
-                category: str | None = row["Merchant Category Description"]
-                if category is None or pd.isna(category) or category.strip() == "":
-                    category = "Uncategorized"
+    @classmethod
+    def sniff(cls, head: FileHead) -> float:
+        """Roger CSV files have no distinctive content, the source must be selected on upload."""
+        return 0.0
 
-                created_expense = expenseFacade.create_expense(
-                    description=row["Merchant Name"],
-                    amount=float(amount_str),
-                    date=datetime.strptime(row["Date"], "%Y-%m-%d"),
-                    category_name=category,
-                    source_id=self.source.id
-                )
-                if created_expense is not None:
-                    created_count += 1
-                else:
-                    existing_expenses += 1
-            session.commit()
-        return ExpensesUpload(created_count, existing_expenses)
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return super().transform(df.assign(amount=self.parse_amount(df["amount"])))
@@ -2,17 +2,15 @@ import logging
 import re
 from fastapi import UploadFile
 import pandas as pd
-from datetime import datetime
-from sqlalchemy.orm import Session
 
-from database.Facades.ExpenseFacade import ExpenseFacade
 from database.Source import Source
 from dto.ExpensesUpload import ExpensesUpload
-from extractors.FileExtractor import FileExtractor
-from DatabaseSetup import SESSION_MAKER
+from dto.FileFailedToExtract import FileFailedToExtract
+from extractors.FileHead import FileHead
+from extractors.excel.ExcelFileExtractor import ExcelFileExtractor
 
 
-class TangerineFileExtractor(FileExtractor):
+class TangerineFileExtractor(ExcelFileExtractor):
     """
     Extracts content from a Tangerine card CSV file with columns:
     Date de l'opération,Transaction,Nom,Description,Montant
@@ -26,7 +24,12 @@ class TangerineFileExtractor(FileExtractor):
         "Montant": pd.StringDtype()  # parse manually to handle signs/formatting
     }
 
+    READ_CSV_OPTIONS = dict(sep=',', dtype=COLUMN_TYPES, header=0, encoding='latin-1')
+
+    REQUIRED_HEADERS = ["Date de l'opération", "Transaction", "Nom", "Description", "Montant"]
+
     SOURCE_TYPE = "TANGERINE"
+    EXTENSIONS = (".csv",)
 
     def __init__(self, file: UploadFile, source: Source):
         super().__init__(file, source)
@@ -39,33 +42,13 @@ class TangerineFileExtractor(FileExtractor):
                 return n
         raise Exception(f"None of the possible column names found for: {possible_names}")
     
-    async def apply(self) -> bool:
-        """Extracts the content of the Tangerine CSV file."""
-        self.LOGGER.info(f"Applying Tangerine file extractor on file {self.file.filename}")
-        try:
-            # Read first few rows to validate file format
-            df = pd.read_csv(self.file.file, sep=',', nrows=2)
-            
-            # Verify if required headers are present
-            file_headers = set(df.columns)
-            required_headers = {
-                "Date de l'opération", "Transaction", "Nom", "Description", "Montant"
-            }
-            
-            if not required_headers.issubset(file_headers):
-                missing_headers = required_headers - file_headers
-                self.LOGGER.info(f"Missing required headers: {missing_headers}. File headers: {file_headers}")
-                return False
-
-            self.LOGGER.info("Tangerine file format validated successfully.")    
-            return True
-        except Exception as e:
-            self.LOGGER.error(f"Error reading file: {str(e)}")
-            return False
-        finally:
-            self.file.file.seek(0)  # Reset file pointer for future reads
-
-    async def extract(self) -> ExpensesUpload:
+    @classmethod
+    def sniff(cls, head: FileHead) -> float:
+        """The Tangerine headers on the first line, the extension is not required but lowers the confidence."""
+        score = head.header_score(0, ',', cls.REQUIRED_HEADERS)
+        return score if head.extension in cls.EXTENSIONS else score / 2
+
+    def extract(self) -> ExpensesUpload:
         self.LOGGER.info(f"Extracting Tangerine file: {self.file.filename}")
 
         sources = self.get_sources(TangerineFileExtractor.SOURCE_TYPE)
@@ -78,77 +61,30 @@ class TangerineFileExtractor(FileExtractor):
             return ExpensesUpload(0, 0, [FileFailedToExtract(self.file.filename, f"Multiple sources found for type {TangerineFileExtractor.SOURCE_TYPE}. No card number in tangerine excel download")]) # type: ignore
         self.source = sources[0]
 
-        df = pd.read_csv(
-            self.file.file,
-            sep=',',
-            dtype=TangerineFileExtractor.COLUMN_TYPES,
-            header=0,
-            encoding='latin-1'
-        )
+        return super().extract()
 
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         date_col = self.find_col(df, ["Date de l'opération", "Date de l'operation", "Date", "Date de l'opÃ©ration"])
         name_col = self.find_col(df, ["Nom", "Name", "Merchant"])
         desc_col = self.find_col(df, ["Description", "Description "])
         amount_col = self.find_col(df, ["Montant", "Amount", "AMOUNT"])
 
-        created_count = 0
-        existing_expenses = 0
-
-        with SESSION_MAKER() as session:
-            session: Session
-            expenseFacade = ExpenseFacade(session)
-
-            for _, row in df.iterrows():
-                self.LOGGER.debug("Processing row: %s", row)
-
-                # parse date
-                date_str = str(row[date_col]) if date_col is not None else ""
-                try:
-                    date = datetime.strptime(date_str.strip(), "%m/%d/%Y")
-                except Exception:
-                    # fallback: try ISO or empty -> skip
-                    try:
-                        date = datetime.fromisoformat(date_str.strip())
-                    except Exception:
-                        self.LOGGER.warning("Unable to parse date '%s', skipping row", date_str)
-                        continue
-
-                # parse amount (handle currency symbols, thousands separators)
-                raw_amount = str(row[amount_col]) if amount_col is not None else "0"
-                amount_str = raw_amount.replace("$", "").replace(",", "").strip()
-                try:
-                    amount = float(amount_str) * -1  # Tangerine amounts are negative for expenses
-                except Exception:
-                    self.LOGGER.warning("Unable to parse amount '%s', skipping row", raw_amount)
-                    continue
-
-                # description / merchant name
-                merchant = str(row[name_col]).strip()
-
-                # extract category from Description if present (e.g. "... ~ Category: Parking")
-                category = "Uncategorized"
-                if desc_col is not None:
-                    desc = str(row[desc_col]) if not pd.isna(row[desc_col]) else ""
-                    # common patterns: "Category: <name>" or "Category : <name>"
-                    m = re.search(r"Category\s*[:]\s*([^,~\n\r]+)", desc, flags=re.IGNORECASE)
-                    if m:
-                        category = m.group(1).strip()
-                    else:
-                        self.LOGGER.warning("No category found in description '%s', defaulting to 'Uncategorized'", desc)
-
-                created_expense = expenseFacade.create_expense(
-                    description=merchant,
-                    amount=amount,
-                    date=date,
-                    category_name=category,
-                    source_id=self.source.id
-                )
-
-                if created_expense is not None:
-                    created_count += 1
-                else:
-                    existing_expenses += 1
-
-            session.commit()
-
-        return ExpensesUpload(created_count, existing_expenses)
\ No newline at end of file
+        # parse date, fallback on ISO dates
+        date_str = df[date_col].astype(str).str.strip()
+        dates = pd.to_datetime(date_str, format="%m/%d/%Y", errors="coerce")
+        dates = dates.fillna(pd.to_datetime(date_str, format="ISO8601", errors="coerce"))
+
+        # extract category from Description if present (e.g. "... ~ Category: Parking")
+        categories = df[desc_col].fillna("").astype(str).str.extract(r"Category\s*[:]\s*([^,~\n\r]+)", flags=re.IGNORECASE)[0]
+
+        expenses = pd.DataFrame({
+            "description": df[name_col].str.strip(),
+            "amount": self.parse_amount(df[amount_col]) * -1,  # Tangerine amounts are negative for expenses
+            "date": dates,
+            "category": self.default_category(categories.str.strip()),
+            "source_id": self.source.id
+        })
+        invalid = expenses["date"].isna() | expenses["amount"].isna()
+        if invalid.any():
+            self.LOGGER.warning(f"Unable to parse the date or amount of {int(invalid.sum())} rows, skipping them")
+        return expenses[~invalid]
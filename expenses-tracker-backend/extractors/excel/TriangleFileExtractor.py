@@ -4,13 +4,10 @@ import pandas as pd
 from database.Source import Source
 from dto.ExpensesUpload import ExpensesUpload
 from dto.FileFailedToExtract import FileFailedToExtract
-from extractors.FileExtractor import FileExtractor
-from database.Facades.ExpenseFacade import ExpenseFacade
-from DatabaseSetup import SESSION_MAKER
-from datetime import datetime
-from sqlalchemy.orm import Session
+from extractors.FileHead import FileHead
+from extractors.excel.ExcelFileExtractor import ExcelFileExtractor
 
-class TriangleFileExtractor(FileExtractor):
+class TriangleFileExtractor(ExcelFileExtractor):
     """
     Extracts content from a Triangle CSV file.
     """
@@ -30,37 +27,27 @@ class TriangleFileExtractor(FileExtractor):
         "AMOUNT": pd.Float64Dtype()
     }
 
+    # Skip the first 4 lines (header information)
+    READ_CSV_OPTIONS = dict(sep=',', dtype=COLUMN_TYPES, skiprows=4, names=HEADERS)
+    USECOLS = ["TRANSACTION DATE", "DESCRIPTION", "Category", "AMOUNT"]
+    COLUMN_MAPPING = {
+        "TRANSACTION DATE": "date", "DESCRIPTION": "description", "Category": "category", "AMOUNT": "amount"
+    }
+
     SOURCE_TYPE = "TRIANGLE"
+    EXTENSIONS = (".csv",)
 
     def __init__(self, file: UploadFile, source: Source):
         super().__init__(file, source)
         self.LOGGER = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
 
-    async def apply(self) -> bool:
-        """Extracts the content of the file."""
-        self.LOGGER.info(f"Applying Triangle file extractor on file {self.file.filename}")
-        try:
-            # Read first few rows to validate file format
-            df = pd.read_csv(self.file.file, sep=',', nrows=2, skiprows=3)
-            
-            # Verify if required headers are present
-            file_headers = set(df.columns)
-            required_headers = set(TriangleFileExtractor.HEADERS)
-            
-            if not required_headers.issubset(file_headers):
-                missing_headers = required_headers - file_headers
-                self.LOGGER.info(f"Missing required headers: {missing_headers}. File headers: {file_headers}")
-                return False
-
-            self.LOGGER.info("Triangle file format validated successfully.")    
-            return True
-        except Exception as e:
-            self.LOGGER.error(f"Error reading file: {str(e)}")
-            return False
-        finally:
-            self.file.file.seek(0)  # Reset file pointer after reading
+    @classmethod
+    def sniff(cls, head: FileHead) -> float:
+        """The Triangle headers on the line after the 3 lines of account information."""
+        score = head.header_score(3, ',', cls.HEADERS)
+        return score if head.extension in cls.EXTENSIONS else score / 2
 
-    async def extract(self) -> ExpensesUpload:
+    def extract(self) -> ExpensesUpload:
         """
         Extracts the content of the Triangle CSV file.
         """
@@ -76,37 +63,4 @@ class TriangleFileExtractor(FileExtractor):
             return ExpensesUpload(0, 0, [FileFailedToExtract(self.file.filename, f"Multiple sources found for type {TriangleFileExtractor.SOURCE_TYPE}. No card number in triangle excel download")]) # type: ignore
         self.source = sources[0]
 
-        # Skip the first 4 lines (header information)
-        df = pd.read_csv(self.file.file, sep=',', dtype=TriangleFileExtractor.COLUMN_TYPES, 
-                        skiprows=4, names=TriangleFileExtractor.HEADERS)
-        
-        created_count = 0
-        existing_expenses = 0
-
-        with SESSION_MAKER() as session:
-            session: Session
-            expenseFacade = ExpenseFacade(session)
-            
-            for _, row in df.iterrows():
-                self.LOGGER.debug(f"Processing row: {row}")
-                                
-                category: str | None = row["Category"]
-                if category is None or pd.isna(category) or category.strip() == "":
-                    category = "Uncategorized"
-
-                created_expense = expenseFacade.create_expense(
-                    description=row["DESCRIPTION"],
-                    amount=float(row["AMOUNT"]),
-                    date=datetime.strptime(row["TRANSACTION DATE"], "%Y-%m-%d"),
-                    category_name=category,
-                    source_id=self.source.id
-                )
-                
-                if created_expense is not None:
-                    created_count += 1
-                else:
-                    existing_expenses += 1
-                    
-            session.commit()
-            
-        return ExpensesUpload(created_count, existing_expenses)
\ No newline at end of file
+        return super().extract()
@@ -0,0 +1,88 @@
+from datetime import datetime
+import functools
+import html
+import re
+
+# The statement is scanned with a few regexes running in C instead of building a tree of the whole
+# document, rows are cut from the posted transactions tbody and their text nodes pulled directly.
+# Comments, scripts and styles become an empty "<!>" tag: never scanned, but still separating text nodes.
+IGNORED_PATTERN = re.compile(r"<!--.*?-->|<(script|style)\b.*?</\1\s*>", re.DOTALL | re.IGNORECASE)
+TBODY_TAG_PATTERN = re.compile(r"<(/?)tbody\b[^>]*>", re.IGNORECASE)
+ROW_START_PATTERN = re.compile(r"<tr\b[^>]*>", re.IGNORECASE)
+TEXT_NODE_PATTERN = re.compile(r">([^<]+)")
+TAG_PATTERN = re.compile(r"<[^>]*>")
+CARD_HOLDER_PATTERN = re.compile(
+    r"""<p\b(?:[^>"']|"[^"]*"|'[^']*')*?\baria-label\s*=\s*(["']?)Selected cardholder\1(?:[^>"']|"[^"]*"|'[^']*')*>(.*?)</p\s*>""",
+    re.DOTALL | re.IGNORECASE
+)
+
+
+def parse_roger_statement(html_bytes: bytes) -> tuple[list[tuple[str, float, datetime, str]] | None, str | None]:
+    """
+    Parses a Roger HTML statement. Kept free of database imports so it can run in a worker process.
+    Returns the (description, amount, date, category) rows of the posted transactions, None when the
+    posted transactions table is not found, and the card number of the selected cardholder, if any.
+    """
+    document = IGNORED_PATTERN.sub("<!>", html_bytes.decode("utf-8"))
+
+    tbodies = tbody_contents(document)
+    if len(tbodies) == 2:
+        posted_transactions = tbodies[1]
+    elif len(tbodies) == 1:
+        posted_transactions = tbodies[0]
+    else:
+        return None, None
+
+    card_number = None
+    card_holder = CARD_HOLDER_PATTERN.search(document)
+    if card_holder is not None:
+        card_number = html.unescape(TAG_PATTERN.sub("", card_holder.group(2))).strip().split(" ")[-1].replace(".", "")
+
+    rows = []
+    # The first row holds the column titles
+    for row in ROW_START_PATTERN.split(posted_transactions)[2:]:
+        data = cell_texts(TEXT_NODE_PATTERN.findall(row))
+        if len(data) != 7:
+            raise ValueError(f"Invalid number of columns in HTML row: {';'.join(data)}")
+        date, _, description, category, _, amount, _ = data
+        rows.append((
+            description.strip(),
+            float(amount.replace("$", "").replace(",", "").replace(" ", "").strip()),
+            parse_date(date.strip()),
+            category.strip()
+        ))
+    return rows, card_number
+
+
+def tbody_contents(document: str) -> list[str]:
+    """The HTML inside each tbody element, up to the next tbody start or end tag."""
+    tags = list(TBODY_TAG_PATTERN.finditer(document))
+    contents = []
+    for index, tag in enumerate(tags):
+        if tag.group(1):
+            continue
+        end = tags[index + 1].start() if index + 1 < len(tags) else len(document)
+        contents.append(document[tag.end():end])
+    return contents
+
+
+def cell_texts(text_nodes: list[str]) -> list[str]:
+    """The unescaped text nodes of a row, without the blank space at the start and end of the row."""
+    data = [html.unescape(text) if "&" in text else text for text in text_nodes]
+    start = 0
+    end = len(data)
+    while start < end and not data[start].strip():
+        start += 1
+    while end > start and not data[end - 1].strip():
+        end -= 1
+    data = data[start:end]
+    if data:
+        data[0] = data[0].lstrip()
+        data[-1] = data[-1].rstrip()
+    return data
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_date(date: str) -> datetime:
+    # A statement has a few distinct dates for many rows, strptime is the slowest step of a row
+    return datetime.strptime(date, "%b %d, %Y")
@@ -0,0 +1,109 @@
+import sqlite3
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from sqlalchemy import Engine, event
+
+from metrics.MetricsRegistry import METRICS
+
+SQL_STATEMENTS = METRICS.counter("sql_statements_total", "SQL statements executed", ("engine",))
+SQL_SECONDS = METRICS.counter("sql_seconds_total", "Seconds spent executing SQL statements and fetching their rows", ("engine",))
+SQL_ROWS = METRICS.counter("sql_rows_returned_total", "Rows fetched from SQL statements", ("engine",))
+
+
+@dataclass
+class RequestQueries:
+    """The SQL of the request being handled."""
+    statements: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+
+
+# Set by the metrics middleware for each request. The handlers run in worker threads with a copy of the
+# request context, so their statements are counted in the RequestQueries object of their request.
+CURRENT_REQUEST_QUERIES: ContextVar[RequestQueries | None] = ContextVar("current_request_queries", default=None)
+
+
+class CountingCursor(sqlite3.Cursor):
+    """
+    Counts the rows fetched and the time spent fetching them: SQLite computes the rows of a SELECT as they
+    are fetched, the execute events only see the time to the first row. The totals are recorded once
+    when the cursor is closed, which SQLAlchemy does when the result is exhausted.
+    """
+
+    rows = 0
+    fetch_seconds = 0.0
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.fetch_seconds += time.perf_counter() - start
+        if row is not None:
+            self.rows += 1
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.fetch_seconds += time.perf_counter() - start
+        self.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.fetch_seconds += time.perf_counter() - start
+        self.rows += len(rows)
+        return rows
+
+    def close(self):
+        if self.rows or self.fetch_seconds:
+            engine_name = getattr(self.connection, "engine_name", "")
+            SQL_ROWS.inc(self.rows, (engine_name,))
+            SQL_SECONDS.inc(self.fetch_seconds, (engine_name,))
+            request_queries = CURRENT_REQUEST_QUERIES.get()
+            if request_queries is not None:
+                request_queries.rows += self.rows
+                request_queries.seconds += self.fetch_seconds
+            self.rows = 0
+            self.fetch_seconds = 0.0
+        super().close()
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors count their rows, the `factory` of the engine connect_args."""
+
+    engine_name = ""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+def instrument(engine: Engine, name: str):
+    """Counts the statements of the engine and their time, labelled with the engine name."""
+
+    # First of the connect listeners, the pragmas of the other ones are counted for the engine
+    @event.listens_for(engine, "connect", insert=True)
+    def name_connection(dbapi_connection, connection_record):
+        dbapi_connection.engine_name = name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - connection.info["query_start"].pop()
+        SQL_STATEMENTS.inc(1, (name,))
+        SQL_SECONDS.inc(seconds, (name,))
+        # Updated without a lock: the files of an upload run in parallel threads and may rarely lose a count
+        request_queries = CURRENT_REQUEST_QUERIES.get()
+        if request_queries is not None:
+            request_queries.statements += 1
+            request_queries.seconds += seconds
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # after_cursor_execute is not called for a failed statement
+        if exception_context.connection is not None and exception_context.connection.info.get("query_start"):
+            exception_context.connection.info["query_start"].pop()
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# config.py resolves the data directory relative to the working directory, the tests use a temporary one.
+# Set before any backend module is imported.
+os.chdir(tempfile.mkdtemp(prefix="expenses-tracker-tests-"))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Small chunks so uploads of a few thousand rows are written in several batches
+os.environ.setdefault("IMPORT_CHUNK_SIZE", "500")
+os.environ.setdefault("UPLOAD_PROCESS_WORKERS", "0")
+
+
+@pytest.fixture
+def database():
+    """Migrated database without expenses, sources or categories, the writer engine is returned."""
+    from sqlalchemy import text
+    from DatabaseSetup import ENGINE, init_database
+    from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+
+    init_database()
+    with ENGINE.begin() as connection:
+        for table in ["expense", "budget", "category", "category_family", "source", "user"]:
+            connection.execute(text(f'DELETE FROM "{table}"'))
+    CategoryFamilyClassifier.invalidate()
+    return ENGINE
@@ -0,0 +1,65 @@
+import anyio
+import httpx
+import pytest
+from sqlalchemy import text
+
+
+def get(path: str) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+
+    return anyio.run(request)
+
+
+def execute(engine, *statements: str):
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+@pytest.fixture
+def averages_data(database):
+    execute(
+        database,
+        "INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111'), (2, 'Amex', 'AMEX', '2222')",
+        "INSERT INTO category_family (id, name, regex_pattern) VALUES (1, 'Food', 'GROCERY'), (2, 'Travel', NULL)",
+        "INSERT INTO budget (id, frequency_type, target_amount, category_family_id) VALUES (1, 0, 100, 1)",
+        """INSERT INTO expense (description, amount, date, lock_category, source_id, category_family_id) VALUES
+            ('GROCERY', 10.5, '2024-01-05 00:00:00.000000', 0, 1, 1),
+            ('TRAIN', 20, '2024-02-05 00:00:00.000000', 0, 2, 2),
+            ('GROCERY', 7, '2024-03-15 00:00:00.000000', 0, 1, 1)""",
+    )
+    return database
+
+
+def test_averages_are_cached_until_the_next_write(averages_data):
+    from analytics.ResultCache import ANALYTICS_CACHE
+
+    path = "/api/budget/calculate?start_date=2024-01-01&end_date=2024-03-31"
+    response = get(path)
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"averages": [{
+        "budget": {
+            "id": 1, "frequency_type": 0, "target_amount": 100.0,
+            "category_family": {"id": 1, "name": "Food", "regex_pattern": "GROCERY", "categories": None},
+        },
+        "average": pytest.approx(17.5 / 3),
+    }]}
+    hits = ANALYTICS_CACHE.stats()["hits"]
+    assert get(path).content == response.content
+    assert ANALYTICS_CACHE.stats()["hits"] == hits + 1
+
+    execute(averages_data, "INSERT INTO expense (description, amount, date, lock_category, source_id, category_family_id) VALUES ('GROCERY', 12.5, '2024-03-20 00:00:00.000000', 0, 1, 1)")
+    assert get(path).json()["averages"][0]["average"] == pytest.approx(10)
+
+
+def test_source_averages(averages_data):
+    averages = get("/api/source/averages?start_date=2024-01-01&end_date=2024-03-31").json()
+
+    assert sorted(averages, key=lambda average: average["source"]["id"]) == [
+        {"source": {"id": 1, "name": "BNC", "type": "BNC", "card_number": "1111"}, "average": pytest.approx(17.5 / 3)},
+        {"source": {"id": 2, "name": "Amex", "type": "AMEX", "card_number": "2222"}, "average": pytest.approx(20 / 3)},
+    ]
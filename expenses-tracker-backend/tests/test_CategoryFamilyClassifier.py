@@ -0,0 +1,92 @@
+import pickle
+import threading
+from sqlalchemy import text
+
+from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+
+
+def test_first_matching_regex_wins_in_category_family_id_order():
+    classifier = CategoryFamilyClassifier(
+        patterns=[(1, "GROCERY"), (2, "GROCERY|BAKERY"), (3, "BAKERY")],
+        categories={}
+    )
+
+    assert classifier.classify("GROCERY BAKERY", None) == 1
+    assert classifier.classify("BAKERY", None) == 2
+
+
+def test_regex_matching_ignores_the_case():
+    classifier = CategoryFamilyClassifier(patterns=[(1, "grocery")], categories={})
+
+    assert classifier.classify("Corner GROCERY store", None) == 1
+    assert classifier.match_regex("corner grocery") == 1
+
+
+def test_invalid_regex_is_ignored():
+    classifier = CategoryFamilyClassifier(patterns=[(1, "("), (2, "UBER")], categories={})
+
+    assert [family_id for family_id, _ in classifier.compiled] == [2]
+    assert classifier.classify("UBER TRIP", None) == 2
+
+
+def test_category_name_is_the_fallback_when_no_regex_matches():
+    classifier = CategoryFamilyClassifier(patterns=[(1, "GROCERY")], categories={"Transport": 3})
+
+    # The regex wins over the category name
+    assert classifier.classify("GROCERY", "Transport") == 1
+    assert classifier.classify("UBER", "Transport") == 3
+    assert classifier.classify("UBER", "Unknown") is None
+    assert classifier.classify("UBER", None) is None
+    assert classifier.classify(None, "Transport") == 3
+
+
+def test_add_category_keeps_the_existing_mapping():
+    classifier = CategoryFamilyClassifier(patterns=[], categories={"Transport": 3})
+
+    classifier.add_category("Transport", 4)
+    classifier.add_category("Leisure", 5)
+
+    assert classifier.categories == {"Transport": 3, "Leisure": 5}
+
+
+def test_rules_can_be_pickled_while_categories_are_added():
+    classifier = CategoryFamilyClassifier(patterns=[(1, "GROCERY")], categories={})
+
+    def add_categories():
+        for index in range(20000):
+            classifier.add_category(f"Category {index}", index)
+
+    thread = threading.Thread(target=add_categories)
+    thread.start()
+    try:
+        while thread.is_alive():
+            patterns, _ = pickle.loads(pickle.dumps(classifier.rules()))
+            assert patterns == [(1, "GROCERY")]
+    finally:
+        thread.join()
+    assert len(classifier.rules()[1]) == 20000
+
+
+def test_get_reuses_the_instance_until_invalidated(database):
+    from DatabaseSetup import SESSION_MAKER
+
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO category_family (id, name, regex_pattern) VALUES (1, 'Food', 'GROCERY'), (2, 'Travel', NULL)"))
+        connection.execute(text("INSERT INTO category (name, category_family_id) VALUES ('Transport', 2)"))
+
+    with SESSION_MAKER() as session:
+        classifier = CategoryFamilyClassifier.get(session)
+        assert classifier.classify("GROCERY", None) == 1
+        assert classifier.classify("UBER", "Transport") == 2
+
+        with database.begin() as connection:
+            connection.execute(text("UPDATE category_family SET regex_pattern = 'UBER' WHERE id = 2"))
+        # The rules are cached until invalidated
+        assert CategoryFamilyClassifier.get(session) is classifier
+
+        CategoryFamilyClassifier.invalidate()
+        rebuilt = CategoryFamilyClassifier.get(session)
+
+    assert rebuilt is not classifier
+    assert rebuilt.version > classifier.version
+    assert rebuilt.classify("UBER TRIP", None) == 2
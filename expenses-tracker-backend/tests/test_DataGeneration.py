@@ -0,0 +1,39 @@
+from sqlalchemy import func, select, text
+
+
+def source_count_at_bumps(monkeypatch) -> list[int]:
+    """Sources seen by a reader each time the data generation is bumped."""
+    from DatabaseSetup import READ_ENGINE
+    from database.DataGeneration import DataGeneration
+    from database.Source import Source
+
+    counts = []
+    bump = DataGeneration.bump
+
+    def counting_bump():
+        with READ_ENGINE.connect() as connection:
+            counts.append(connection.execute(select(func.count()).select_from(Source)).scalar_one())
+        bump()
+
+    monkeypatch.setattr(DataGeneration, "bump", counting_bump)
+    return counts
+
+
+def test_generation_is_bumped_after_a_session_commit_is_visible(database, monkeypatch):
+    from DatabaseSetup import SESSION_MAKER
+
+    counts = source_count_at_bumps(monkeypatch)
+    with SESSION_MAKER() as session:
+        session.execute(text("INSERT INTO source (name, type, card_number) VALUES ('BNC', 'BNC', '1111')"))
+        session.commit()
+
+    assert counts == [1]
+
+
+def test_generation_is_bumped_after_a_core_commit_is_visible(database, monkeypatch):
+    counts = source_count_at_bumps(monkeypatch)
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO source (name, type, card_number) VALUES ('BNC', 'BNC', '1111')"))
+        connection.execute(text("INSERT INTO source (name, type, card_number) VALUES ('Amex', 'AMEX', '2222')"))
+
+    assert counts == [2]
@@ -0,0 +1,65 @@
+import sqlite3
+from sqlalchemy import text
+
+
+def add_source(engine, name: str, card_number: str):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO source (name, type, card_number) VALUES (:name, 'BNC', :card_number)"), {"name": name, "card_number": card_number})
+
+
+def dumped_sources(dump: bytes) -> int:
+    return dump.count(b'INSERT INTO "source" VALUES(')
+
+
+def write_after_generation_read(monkeypatch, engine):
+    """Commits a source right after the next read of the data generation, before the export reads its snapshot."""
+    from database.DataGeneration import DataGeneration
+
+    current = DataGeneration.current
+
+    def current_then_write():
+        generation = current()
+        monkeypatch.setattr(DataGeneration, "current", current)
+        add_source(engine, "Amex", "2222")
+        return generation
+
+    monkeypatch.setattr(DataGeneration, "current", current_then_write)
+
+
+def test_write_during_a_dump_is_exported_next_time(database):
+    from database.DatabaseExport import cached_export, stream_sql_dump
+
+    add_source(database, "BNC", "1111")
+    chunks = stream_sql_dump("sql")
+    dump = next(chunks)
+    add_source(database, "Amex", "2222")
+    dump += b"".join(chunks)
+
+    assert dumped_sources(dump) == 1
+    assert cached_export("sql") is None
+    assert dumped_sources(b"".join(stream_sql_dump("sql"))) == 2
+    assert cached_export("sql") is not None
+
+
+def test_dump_with_a_write_before_its_snapshot_is_not_reused(database, monkeypatch):
+    from database.DatabaseExport import cached_export, stream_sql_dump
+
+    add_source(database, "BNC", "1111")
+    write_after_generation_read(monkeypatch, database)
+
+    assert dumped_sources(b"".join(stream_sql_dump("sql"))) == 2
+    assert cached_export("sql") is None
+
+
+def test_sqlite_copy_with_a_write_before_its_snapshot_is_not_reused(database, monkeypatch):
+    from database.DatabaseExport import cached_export, export_sqlite
+
+    add_source(database, "BNC", "1111")
+    write_after_generation_read(monkeypatch, database)
+
+    connection = sqlite3.connect(export_sqlite())
+    try:
+        assert connection.execute("SELECT count(*) FROM source").fetchone()[0] == 2
+    finally:
+        connection.close()
+    assert cached_export("sqlite") is None
@@ -0,0 +1,97 @@
+import shutil
+import threading
+import pytest
+from sqlalchemy import text
+
+
+def execute(engine, statement: str, **parameters):
+    with engine.begin() as connection:
+        connection.execute(text(statement), parameters)
+
+
+def seed_catalog(engine):
+    execute(engine, "INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111')")
+    execute(engine, "INSERT INTO category_family (id, name, regex_pattern) VALUES (1, 'Food', 'GROCERY')")
+
+
+def write_expenses_csv(tmp_path) -> str:
+    path = tmp_path / "expenses.csv"
+    path.write_text("description,amount,date,source_id,category_family_id\nGROCERY STORE,12.5,2024-01-05,1,1\nMARKET,3,2024-02-01,1,1\n")
+    return str(path)
+
+
+def expense_count(engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT count(*) FROM expense")).scalar_one()
+
+
+def test_restore_rebuilds_the_classification_rules(database, tmp_path):
+    from DatabaseSetup import SESSION_MAKER
+    from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+    from database.DatabaseExport import export_sqlite
+    from database.DatabaseRestore import restore_database
+
+    seed_catalog(database)
+    execute(database, "UPDATE category_family SET regex_pattern = 'MARKET'")
+    backup_path = str(tmp_path / "backup.db")
+    shutil.copy(export_sqlite(), backup_path)
+    execute(database, "UPDATE category_family SET regex_pattern = 'GROCERY'")
+    CategoryFamilyClassifier.invalidate()
+    with SESSION_MAKER() as session:
+        assert CategoryFamilyClassifier.get(session).match_regex("GROCERY STORE") == 1
+
+    restore_database(backup_path, "sqlite")
+
+    with SESSION_MAKER() as session:
+        classifier = CategoryFamilyClassifier.get(session)
+        assert classifier.match_regex("GROCERY STORE") is None
+        assert classifier.match_regex("MARKET") == 1
+
+
+def test_expenses_restore_holds_the_write_lock_until_the_swap(database, tmp_path, monkeypatch):
+    from DatabaseSetup import WRITE_LOCK
+    from database import DatabaseRestore, ExpenseFullText
+
+    seed_catalog(database)
+    rebuild = ExpenseFullText.rebuild
+    lock_free = []
+
+    def try_the_lock():
+        lock_free.append(WRITE_LOCK.acquire(blocking=False))
+        if lock_free[-1]:
+            WRITE_LOCK.release()
+
+    def try_the_lock_and_rebuild(connection):
+        # After the copy of the live database, an import runs in another thread
+        thread = threading.Thread(target=try_the_lock)
+        thread.start()
+        thread.join()
+        rebuild(connection)
+
+    monkeypatch.setattr(ExpenseFullText, "rebuild", try_the_lock_and_rebuild)
+    result = DatabaseRestore.restore_database(write_expenses_csv(tmp_path), "csv")
+
+    assert lock_free == [False]
+    assert result.expenses == 2
+    assert expense_count(database) == 2
+
+
+def test_expenses_restore_is_rejected_after_a_write_during_the_load(database, tmp_path, monkeypatch):
+    from database import DatabaseRestore, ExpenseFullText
+    from database.RestoreConflict import RestoreConflict
+
+    seed_catalog(database)
+    rebuild = ExpenseFullText.rebuild
+
+    def write_and_rebuild(connection):
+        # After the copy of the live database, a category family is created through the API, which does not take the write lock
+        execute(database, "INSERT INTO category_family (id, name) VALUES (2, 'Travel')")
+        rebuild(connection)
+
+    monkeypatch.setattr(ExpenseFullText, "rebuild", write_and_rebuild)
+    with pytest.raises(RestoreConflict):
+        DatabaseRestore.restore_database(write_expenses_csv(tmp_path), "csv")
+
+    with database.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM category_family")).scalar_one() == 2
+    assert expense_count(database) == 0
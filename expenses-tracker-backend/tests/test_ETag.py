@@ -0,0 +1,62 @@
+import anyio
+import httpx
+from sqlalchemy import event, text
+
+
+def get(path: str, headers: dict | None = None) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    return anyio.run(request)
+
+
+def add_source(engine, name: str, card_number: str):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO source (name, type, card_number) VALUES (:name, 'BNC', :card_number)"), {"name": name, "card_number": card_number})
+
+
+def test_unchanged_sources_are_not_modified(database):
+    add_source(database, "BNC", "1111")
+    etag = get("/api/source/").headers["ETag"]
+
+    assert get("/api/source/", {"If-None-Match": etag}).status_code == 304
+
+    add_source(database, "Amex", "2222")
+    response = get("/api/source/", {"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_sources_read_during_a_write_have_no_etag(database):
+    from DatabaseSetup import READ_ENGINE
+
+    add_source(database, "BNC", "1111")
+    writes = []
+
+    def write_once(*args):
+        if not writes:
+            writes.append(1)
+            add_source(database, "Amex", "2222")
+
+    # The write is committed once the sources are queried, after check_etag read the generation
+    event.listen(READ_ENGINE, "after_cursor_execute", write_once)
+    try:
+        response = get("/api/source/")
+    finally:
+        event.remove(READ_ENGINE, "after_cursor_execute", write_once)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+    response = get("/api/source/")
+    assert len(response.json()) == 2
+    assert "ETag" in response.headers
+
+
+def test_category_families_are_not_modified(database):
+    for path in ["/api/category-family/", "/api/category-family/mapping"]:
+        etag = get(path).headers["ETag"]
+        assert get(path, {"If-None-Match": etag}).status_code == 304
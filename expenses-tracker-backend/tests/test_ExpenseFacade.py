@@ -0,0 +1,60 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import Insert, func, select, text
+
+
+def add_source(engine) -> int:
+    with engine.begin() as connection:
+        return connection.execute(text("INSERT INTO source (name, type, card_number) VALUES ('BNC', 'BNC', '1111') RETURNING id")).scalar_one()
+
+
+def count(engine, table) -> int:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(table)).scalar_one()
+
+
+def test_category_families_are_created_once_in_the_batch_transaction(database):
+    from DatabaseSetup import SESSION_MAKER
+    from classifiers.CategoryFamilyClassifier import CategoryFamilyClassifier
+    from database.CategoryFamily import CategoryFamily
+    from database.Facades.ExpenseFacade import ExpenseFacade
+
+    source_id = add_source(database)
+    with SESSION_MAKER() as session:
+        facade = ExpenseFacade(session)
+        assert facade.create_expenses([
+            ("GROCERY", 10.0, datetime(2024, 1, 1), "Food", source_id),
+            ("BAKERY", 3.0, datetime(2024, 1, 2), "Food", source_id),
+        ]) == (2, 0)
+        session.commit()
+        CategoryFamilyClassifier.invalidate()
+        assert facade.create_expenses([("CAFE", 4.0, datetime(2024, 1, 3), "Food", source_id)]) == (1, 0)
+        session.commit()
+
+    assert count(database, CategoryFamily) == 1
+    with database.connect() as connection:
+        assert connection.execute(text("SELECT count(DISTINCT category_family_id) FROM expense")).scalar_one() == 1
+
+
+def test_failed_batch_leaves_no_category_family(database):
+    from DatabaseSetup import SESSION_MAKER
+    from database.Category import Category
+    from database.CategoryFamily import CategoryFamily
+    from database.Facades.ExpenseFacade import ExpenseFacade
+
+    source_id = add_source(database)
+    with SESSION_MAKER() as session:
+        execute = session.execute
+
+        def fail_expense_insert(statement, *args, **kwargs):
+            if isinstance(statement, Insert) and statement.table.name == "expense":
+                raise RuntimeError("insert failed")
+            return execute(statement, *args, **kwargs)
+
+        # The insert of the expenses runs after the category families are created
+        session.execute = fail_expense_insert
+        with pytest.raises(RuntimeError):
+            ExpenseFacade(session).create_expenses([("GROCERY", 10.0, datetime(2024, 1, 1), "Food", source_id)])
+
+    assert count(database, CategoryFamily) == 0
+    assert count(database, Category) == 0
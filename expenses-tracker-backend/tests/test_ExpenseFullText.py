@@ -0,0 +1,118 @@
+import anyio
+import httpx
+import pytest
+from sqlalchemy import text
+
+from database.ExpenseFullText import to_match_query
+
+
+def get(path: str, params: dict | None = None) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, params=params)
+
+    return anyio.run(request)
+
+
+@pytest.mark.parametrize("query, match_query", [
+    ("grocery", '"grocery"*'),
+    ('"grocery store"', '"grocery store"'),
+    ('"grocery st"*', '"grocery st"*'),
+    ("caf*", '"caf"*'),
+    # FTS5 operators and column filters are searched as plain words
+    ("NEAR", '"NEAR"*'),
+    ("NEAR(a b)", '"NEAR(a"* "b)"*'),
+    ("AND OR NOT", '"AND"* "OR"* "NOT"*'),
+    ("-uber", '"-uber"*'),
+    ("description:uber", '"description:uber"*'),
+    # Unbalanced quotes
+    ('"cafe', '"cafe"*'),
+    ('a"b', '"a"* "b"*'),
+    # Terms without a letter or a digit are dropped
+    ("uber -", '"uber"*'),
+    ('"', None),
+    ('""', None),
+    ("*", None),
+    ("-", None),
+    ('" - *', None),
+])
+def test_to_match_query(query, match_query):
+    assert to_match_query(query) == match_query
+
+
+@pytest.fixture
+def expenses(database):
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111')"))
+        connection.execute(text("INSERT INTO category_family (id, name) VALUES (1, 'Food')"))
+        connection.execute(text("""INSERT INTO expense (id, description, amount, date, original_category, lock_category, source_id, category_family_id) VALUES
+            (1, 'GROCERY STORE', 10, '2024-01-01 00:00:00.000000', 'Groceries', 0, 1, 1),
+            (2, 'Near East Bakery', 3, '2024-01-02 00:00:00.000000', NULL, 0, 1, 1),
+            (3, 'UBER *TRIP', 20, '2024-01-03 00:00:00.000000', 'Transport', 0, 1, 1),
+            (4, 'CAFE-BAR', 4, '2024-01-04 00:00:00.000000', NULL, 0, 1, 1),
+            (5, 'Café Rive', 5, '2024-01-05 00:00:00.000000', NULL, 0, 1, 1)"""))
+    return database
+
+
+def search(query: str, **params) -> list[str]:
+    response = get("/api/expenses/fulltext", {"q": query, **params})
+    assert response.status_code == 200, response.text
+    return sorted(expense["description"] for expense in response.json()["expenses"])
+
+
+@pytest.mark.parametrize("query, descriptions", [
+    ("grocery", ["GROCERY STORE"]),
+    ("NEAR", ["Near East Bakery"]),
+    ("NEAR(east", ["Near East Bakery"]),
+    ("uber *trip", ["UBER *TRIP"]),
+    ("-bar", ["CAFE-BAR"]),
+    ('"cafe', ["CAFE-BAR", "Café Rive"]),
+    ('"cafe bar"', ["CAFE-BAR"]),
+    ("transport", ["UBER *TRIP"]),
+    ("AND", []),
+])
+def test_search_treats_the_fts5_syntax_as_words(expenses, query, descriptions):
+    assert search(query) == descriptions
+
+
+@pytest.mark.parametrize("query", ['"', "*", "-", '" - *'])
+def test_search_without_a_searchable_word_is_rejected(expenses, query):
+    response = get("/api/expenses/fulltext", {"q": query})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The query has no searchable word"
+
+
+def assert_index_in_sync(engine):
+    with engine.begin() as connection:
+        # Raises when the index does not match the expense table
+        connection.execute(text("INSERT INTO expense_fts (expense_fts, rank) VALUES ('integrity-check', 1)"))
+
+
+def test_update_reindexes_the_expense(expenses):
+    with expenses.begin() as connection:
+        connection.execute(text("UPDATE expense SET description = 'BOOKSHOP' WHERE id = 1"))
+        connection.execute(text("UPDATE expense SET original_category = 'Leisure' WHERE id = 3"))
+        # Not an indexed column, the index is left as is
+        connection.execute(text("UPDATE expense SET amount = 99 WHERE id = 2"))
+
+    assert search("grocery") == []
+    assert search("bookshop") == ["BOOKSHOP"]
+    # The original category is indexed too
+    assert search("groceries") == ["BOOKSHOP"]
+    assert search("transport") == []
+    assert search("leisure") == ["UBER *TRIP"]
+    assert search("near") == ["Near East Bakery"]
+    assert_index_in_sync(expenses)
+
+
+def test_delete_unindexes_the_expense(expenses):
+    with expenses.begin() as connection:
+        connection.execute(text("DELETE FROM expense WHERE id IN (2, 4)"))
+
+    assert search("near") == []
+    assert search("cafe") == ["Café Rive"]
+    assert get("/api/expenses/fulltext", {"q": "cafe", "include_total": "true"}).json()["total"] == 1
+    assert_index_in_sync(expenses)
@@ -0,0 +1,98 @@
+import json
+import random
+from datetime import datetime, timedelta
+import anyio
+import httpx
+import orjson
+import pytest
+from sqlalchemy import insert, text
+
+
+def get(path: str, params: dict | None = None, headers: dict | None = None) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, params=params, headers=headers)
+
+    return anyio.run(request)
+
+
+@pytest.fixture
+def expenses(database):
+    """Expenses with and without a user, of category families with and without a regex pattern."""
+    from database.Expense import Expense
+
+    rng = random.Random(25)
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO user (id, username) VALUES (1, 'jane'), (2, 'john')"))
+        connection.execute(text("INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111'), (2, 'Amex', 'AMEX', '2222')"))
+        connection.execute(text("INSERT INTO category_family (id, name, regex_pattern) VALUES (1, 'Food', 'GROCERY|BAKERY'), (2, 'Travel', NULL)"))
+        connection.execute(text("INSERT INTO category (name, category_family_id) VALUES ('Groceries', 1)"))
+        connection.execute(insert(Expense.__table__), [{
+            "description": rng.choice(["GROCERY", "Bakery", "UBER", "Café 50%"]),
+            "amount": rng.choice([-5.0, 3.5, 10, 12.25]),
+            "date": datetime(2024, 1, 1, 12, 30) + timedelta(days=rng.randrange(20), seconds=index),
+            "original_category": rng.choice([None, "Groceries", "Transport"]),
+            "calculation_status": rng.choice([None, "SKIP", "INCLUDE"]),
+            "lock_category": rng.randint(0, 1),
+            "user_id": rng.choice([None, 1, 2]),
+            "source_id": rng.randint(1, 2),
+            "category_family_id": rng.randint(1, 2),
+        } for index in range(60)])
+    return database
+
+
+@pytest.mark.parametrize("sort_by", ["date", "amount", "description"])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_json_paginated_and_ndjson_listings_are_identical(expenses, sort_by, sort_order):
+    params = {"sort_by": sort_by, "sort_order": sort_order}
+    listing = get("/api/expenses/", params).json()["expenses"]
+
+    paginated = []
+    cursor = None
+    while True:
+        page = get("/api/expenses/", {**params, "limit": 9, **({"cursor": cursor} if cursor else {})}).json()
+        paginated.extend(page["expenses"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    streamed = get("/api/expenses/", {**params, "stream": "true"})
+    negotiated = get("/api/expenses/", params, headers={"Accept": "application/x-ndjson"})
+
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    assert negotiated.content == streamed.content
+    assert len(listing) == 60
+    assert paginated == listing
+    assert [json.loads(line) for line in streamed.text.splitlines()] == listing
+
+
+def test_listing_matches_the_serialized_orm_expenses(expenses):
+    from DatabaseSetup import READ_SESSION_MAKER
+    from app.routers.Expenses import serialize_expense
+    from database.Expense import Expense
+
+    listing = get("/api/expenses/", {"sort_by": "date"}).json()["expenses"]
+    with READ_SESSION_MAKER() as session:
+        serialized = {expense.id: serialize_expense(expense) for expense in session.query(Expense).all()}
+        expected = [json.loads(orjson.dumps(serialized[expense["id"]])) for expense in listing]
+
+    assert listing == expected
+
+
+def test_expense_object_shape(expenses):
+    listing = get("/api/expenses/", {"sort_by": "date"}).json()["expenses"]
+
+    expense = next(expense for expense in listing if expense["user"] is not None and expense["categoryFamily"]["id"] == 1)
+    assert list(expense) == [
+        "id", "date", "description", "amount", "original_category", "lock_category", "calculation_status",
+        "source", "user", "categoryFamily",
+    ]
+    assert expense["date"].startswith("2024-01-") and "T12:30:" in expense["date"]
+    assert isinstance(expense["amount"], float)
+    assert expense["user"] in [{"id": 1, "name": "jane"}, {"id": 2, "name": "john"}]
+    assert set(expense["source"]) == {"id", "name", "type", "card_number"}
+    # The listings do not load the categories of the category families
+    assert expense["categoryFamily"] == {"id": 1, "name": "Food", "regex_pattern": "GROCERY|BAKERY", "categories": None}
+    assert any(expense["user"] is None for expense in listing)
@@ -0,0 +1,99 @@
+import base64
+import json
+import random
+from datetime import datetime, timedelta
+import anyio
+import httpx
+import pytest
+from sqlalchemy import insert, text
+
+
+def get(path: str, params: dict | None = None, headers: dict | None = None) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, params=params, headers=headers)
+
+    return anyio.run(request)
+
+
+@pytest.fixture
+def expenses(database):
+    """Expenses of 2 sources with repeated dates, amounts and descriptions, so pages end on ties."""
+    from database.Expense import Expense
+
+    rng = random.Random(10)
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111'), (2, 'Amex', 'AMEX', '2222')"))
+        connection.execute(text("INSERT INTO category_family (id, name) VALUES (1, 'Food'), (2, 'Travel')"))
+        connection.execute(insert(Expense.__table__), [{
+            "description": rng.choice(["GROCERY", "Bakery", "UBER", "cafe 50%", "TRAIN_TICKET"]),
+            "amount": rng.choice([-5.0, 3.5, 10.0, 12.25, 80.0]),
+            "date": datetime(2024, 1, 1) + timedelta(days=rng.randrange(40)),
+            "calculation_status": rng.choice([None, "SKIP", "INCLUDE"]),
+            "lock_category": rng.randint(0, 1),
+            "source_id": rng.randint(1, 2),
+            "category_family_id": rng.randint(1, 2),
+        } for _ in range(90)])
+    return database
+
+
+FILTERS = [
+    {},
+    {"start_date": "2024-01-10", "end_date": "2024-01-31", "source_id": 2},
+    {"category_family_id": [1], "min_amount": 0, "max_amount": 15, "calculation_status": ["NONE", "INCLUDE"]},
+    {"lock_category": "true", "description": "a"},
+    {"description": "50%"},
+]
+
+
+@pytest.mark.parametrize("sort_by", ["date", "amount", "description"])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pages_walk_the_whole_listing(expenses, sort_by, sort_order, filters):
+    params = {**filters, "sort_by": sort_by, "sort_order": sort_order}
+    listing = get("/api/expenses/", params).json()["expenses"]
+
+    paginated = []
+    cursor = None
+    while True:
+        page = get("/api/expenses/", {**params, "limit": 7, "include_total": "true", **({"cursor": cursor} if cursor else {})}).json()
+        assert page["total"] == len(listing)
+        assert len(page["expenses"]) <= 7
+        paginated.extend(page["expenses"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert paginated == listing
+    # The filters keep at least one expense, otherwise the comparison proves nothing
+    assert listing
+
+
+def cursor_of(value, expense_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, expense_id]).encode()).decode()
+
+
+@pytest.mark.parametrize("params", [
+    {"limit": 5, "sort_by": "amount", "cursor": cursor_of("10.0", 3)},
+    {"limit": 5, "sort_by": "amount", "cursor": cursor_of(True, 3)},
+    {"limit": 5, "sort_by": "description", "cursor": cursor_of(12.5, 3)},
+    {"limit": 5, "sort_by": "date", "cursor": cursor_of("not a date", 3)},
+    {"limit": 5, "sort_by": "date", "cursor": cursor_of("2024-01-05T00:00:00", "3")},
+    {"limit": 5, "cursor": "not base64 !"},
+    {"limit": 5, "cursor": cursor_of("2024-01-05T00:00:00", 3)[:-4]},
+    {"cursor": cursor_of("2024-01-05T00:00:00", 3)},
+    {"stream": "true", "limit": 5},
+])
+def test_invalid_listing_requests_are_rejected(expenses, params):
+    assert get("/api/expenses/", params).status_code == 400
+
+
+def test_amount_cursor_accepts_integer_amounts(expenses):
+    first_page = get("/api/expenses/", {"limit": 3, "sort_by": "amount"}).json()
+    last = first_page["expenses"][-1]
+    # A client may round-trip 80.0 as 80
+    response = get("/api/expenses/", {"limit": 3, "sort_by": "amount", "cursor": cursor_of(int(last["amount"]) if last["amount"].is_integer() else last["amount"], last["id"])})
+    assert response.status_code == 200
+    assert response.json()["expenses"] == get("/api/expenses/", {"limit": 3, "sort_by": "amount", "cursor": first_page["next_cursor"]}).json()["expenses"]
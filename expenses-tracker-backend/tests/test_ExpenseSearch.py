@@ -0,0 +1,100 @@
+import random
+import re
+from datetime import datetime, timedelta
+import anyio
+import httpx
+import pytest
+from sqlalchemy import insert, text
+
+
+def get(path: str, params: dict | None = None) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, params=params)
+
+    return anyio.run(request)
+
+
+@pytest.fixture
+def expenses(database):
+    from database.Expense import Expense
+
+    rng = random.Random(16)
+    with database.begin() as connection:
+        connection.execute(text("INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111'), (2, 'Amex', 'AMEX', '2222')"))
+        connection.execute(text("INSERT INTO category_family (id, name) VALUES (1, 'Food'), (2, 'Travel')"))
+        connection.execute(insert(Expense.__table__), [{
+            "description": rng.choice(["GROCERY #12", "Bakery", "UBER TRIP", "uber eats", "cafe 50%", "TRAIN_TICKET"]),
+            "amount": rng.choice([-5.0, 3.5, 10.0, 12.25, 80.0]),
+            "date": datetime(2024, 1, 1) + timedelta(days=rng.randrange(40)),
+            "original_category": rng.choice([None, "Transport", "Food"]),
+            "calculation_status": rng.choice([None, "SKIP", "INCLUDE"]),
+            "lock_category": rng.randint(0, 1),
+            "source_id": rng.randint(1, 2),
+            "category_family_id": rng.randint(1, 2),
+        } for _ in range(80)])
+    return database
+
+
+@pytest.mark.parametrize("pattern", ["(", "[a-", "*uber", "a{2,1}"])
+def test_invalid_pattern_is_rejected(expenses, pattern):
+    response = get("/api/expenses/search", {"pattern": pattern})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid regex pattern")
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"start_date": "2024-01-10", "end_date": "2024-01-31", "source_id": 2},
+    {"category_family_id": [1], "min_amount": 0, "max_amount": 15, "calculation_status": ["NONE", "INCLUDE"]},
+    {"lock_category": "true", "description": "r"},
+])
+@pytest.mark.parametrize("pattern", ["^uber", r"#\d+", "50%|_ticket"])
+def test_search_is_the_listing_filtered_by_the_pattern(expenses, filters, pattern):
+    listing = get("/api/expenses/", filters).json()["expenses"]
+    expected = [expense for expense in listing if re.search(pattern, expense["description"], re.IGNORECASE)]
+
+    response = get("/api/expenses/search", {**filters, "pattern": pattern})
+
+    assert response.status_code == 200
+    assert response.json()["expenses"] == expected
+    # The filters keep at least one match, otherwise the comparison proves nothing
+    assert expected
+
+
+def test_search_pages_walk_every_match(expenses):
+    params = {"pattern": "uber", "sort_by": "amount", "sort_order": "desc"}
+    expected = get("/api/expenses/search", params).json()["expenses"]
+
+    paginated = []
+    cursor = None
+    while True:
+        page = get("/api/expenses/search", {**params, "limit": 4, "include_total": "true", **({"cursor": cursor} if cursor else {})}).json()
+        assert page["total"] == len(expected)
+        paginated.extend(page["expenses"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert paginated == expected
+    assert {expense["description"] for expense in expected} == {"UBER TRIP", "uber eats"}
+
+
+def test_regexp_of_null_is_null(expenses):
+    from DatabaseSetup import READ_ENGINE, regexp
+
+    assert regexp(None, "UBER") is None
+    assert regexp("uber", None) is None
+    assert regexp("uber", "UBER TRIP") is True
+    with READ_ENGINE.connect() as connection:
+        assert connection.execute(text("SELECT NULL REGEXP 'a', 'a' REGEXP NULL, 'A' REGEXP 'a'")).one() == (None, None, 1)
+        # NULL is neither a match nor a non match, the rows without a category are left out of both
+        matches = connection.execute(text("SELECT count(*) FROM expense WHERE original_category REGEXP '^trans'")).scalar_one()
+        non_matches = connection.execute(text("SELECT count(*) FROM expense WHERE NOT original_category REGEXP '^trans'")).scalar_one()
+        without_category = connection.execute(text("SELECT count(*) FROM expense WHERE original_category IS NULL")).scalar_one()
+
+    assert without_category > 0
+    assert matches + non_matches + without_category == 80
@@ -0,0 +1,25 @@
+import anyio
+import httpx
+
+
+def get(path: str) -> httpx.Response:
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+
+    return anyio.run(request)
+
+
+def test_requests_are_labelled_with_the_served_route(database):
+    get("/api/source/")
+    get("/api/budget/12345")
+    get("/not-a-route")
+
+    metrics = get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/source/",status="200"}' in metrics
+    assert 'route="/source/"' not in metrics
+    assert 'route="/api/budget/{budget_id}"' in metrics
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}' in metrics
@@ -0,0 +1,112 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert, select, text
+
+
+def seed_expenses(engine, count: int = 600):
+    """Expenses over 2023-2024 of 2 sources and 3 category families, with credits, SKIP and INCLUDE, some at the start of a month."""
+    from database.Expense import Expense
+
+    rng = random.Random(13)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111'), (2, 'Amex', 'AMEX', '2222')"))
+        connection.execute(text("INSERT INTO category_family (id, name) VALUES (1, 'Food'), (2, 'Travel'), (3, 'Misc')"))
+        expenses = []
+        for i in range(count):
+            if i % 10 == 0:
+                date = datetime(rng.choice([2023, 2024]), rng.randint(1, 12), 1)
+            else:
+                date = datetime(2023, 1, 1) + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600))
+            expenses.append({
+                "description": f"EXPENSE {i}", "amount": round(rng.uniform(-50, 200), 2), "date": date,
+                "calculation_status": rng.choice([None, None, None, "SKIP", "INCLUDE"]),
+                "source_id": rng.randint(1, 2), "category_family_id": rng.randint(1, 3), "lock_category": 0,
+            })
+        connection.execute(insert(Expense.__table__), expenses)
+
+
+RANGES = [
+    # Open ranges
+    (None, None),
+    (datetime(2023, 6, 1), None),
+    (datetime(2023, 6, 15, 12), None),
+    (None, datetime(2024, 3, 31, 23, 59, 59)),
+    (None, datetime(2024, 3, 10)),
+    # Closed ranges, starting on the 1st or mid-month, ending at the end, the start or the middle of a month
+    (datetime(2023, 2, 1), datetime(2024, 5, 31, 23, 59, 59)),
+    (datetime(2023, 2, 1), datetime(2024, 6, 1)),
+    (datetime(2023, 2, 14), datetime(2024, 5, 20)),
+    (datetime(2023, 11, 30, 18), datetime(2024, 1, 1)),
+    (datetime(2023, 12, 1), datetime(2024, 2, 1)),
+    # Single months
+    (datetime(2024, 3, 1), datetime(2024, 3, 31, 23, 59, 59)),
+    (datetime(2024, 3, 1), datetime(2024, 4, 1)),
+    (datetime(2023, 12, 1), datetime(2023, 12, 31)),
+    # Within a month
+    (datetime(2024, 3, 5), datetime(2024, 3, 20)),
+    (datetime(2024, 3, 1), datetime(2024, 3, 1)),
+    (datetime(2024, 3, 15), datetime(2024, 4, 1)),
+    # Across the start of a year without a full month
+    (datetime(2023, 12, 15), datetime(2024, 1, 15)),
+]
+
+
+@pytest.mark.parametrize("group_by", ["category_family_id", "source_id"])
+@pytest.mark.parametrize("start_date, end_date", RANGES)
+def test_included_totals_match_the_expense_sums(database, group_by, start_date, end_date):
+    from DatabaseSetup import READ_SESSION_MAKER
+    from analytics.MonthlyRollup import MonthlyRollup
+
+    seed_expenses(database)
+    with READ_SESSION_MAKER() as session:
+        rollup = MonthlyRollup(session)
+        expected = rollup._expense_totals(MonthlyRollup.GROUP_COLUMNS[group_by][1], start_date, end_date)
+        totals = rollup.included_totals(group_by, start_date, end_date)
+
+    assert expected
+    assert totals == pytest.approx(expected)
+
+
+def rollup_rows(connection) -> dict[tuple, tuple[float, int]]:
+    from database.ExpenseMonthlyRollup import ExpenseMonthlyRollup
+
+    rows = connection.execute(select(ExpenseMonthlyRollup)).mappings().all()
+    return {
+        (row["year"], row["month"], row["category_family_id"], row["source_id"], row["user_id"]): (round(row["total"], 6), row["expense_count"])
+        for row in rows
+    }
+
+
+def assert_rollup_is_rebuilt_the_same(engine):
+    from analytics import MonthlyRollup
+
+    with engine.connect() as connection:
+        maintained = rollup_rows(connection)
+        MonthlyRollup.rebuild(connection)
+        rebuilt = rollup_rows(connection)
+        connection.rollback()
+    assert maintained == rebuilt
+
+
+def test_triggers_keep_the_rollup_equal_to_a_rebuild(database):
+    seed_expenses(database, 200)
+    assert_rollup_is_rebuilt_the_same(database)
+
+    for statement in [
+        # Status flips to SKIP and back to INCLUDE for credits
+        "UPDATE expense SET calculation_status = 'SKIP' WHERE id % 7 = 0",
+        "UPDATE expense SET calculation_status = 'INCLUDE' WHERE amount < 0 AND id % 3 = 0",
+        # Moves to another category family, source or month, amount changes
+        "UPDATE expense SET category_family_id = 3 WHERE category_family_id = 1 AND id % 2 = 0",
+        "UPDATE expense SET source_id = 2 WHERE id % 5 = 0",
+        "UPDATE expense SET date = datetime(date, '+1 month') WHERE id % 4 = 0",
+        "UPDATE expense SET date = '2022-01-01 00:00:00.000000' WHERE id % 11 = 0",
+        "UPDATE expense SET amount = -amount WHERE id % 6 = 0",
+        # Deletes, emptying whole rollup rows
+        "DELETE FROM expense WHERE id % 9 = 0",
+        "DELETE FROM expense WHERE date < '2023-03-01'",
+    ]:
+        with database.begin() as connection:
+            connection.execute(text(statement))
+        assert_rollup_is_rebuilt_the_same(database)
@@ -0,0 +1,45 @@
+from datetime import datetime
+import pytest
+
+from analytics.PeriodCounter import count_months, count_years
+
+
+@pytest.mark.parametrize("start, end, months", [
+    # Start equal to end, the month in progress
+    (datetime(2024, 3, 3), datetime(2024, 3, 3), 1),
+    # One month
+    (datetime(2024, 1, 1), datetime(2024, 1, 31), 1),
+    (datetime(2024, 1, 1), datetime(2024, 2, 1), 2),
+    # Partial edge months
+    (datetime(2024, 1, 15), datetime(2024, 3, 10), 2),
+    (datetime(2024, 1, 15), datetime(2024, 3, 15), 3),
+    (datetime(2024, 1, 31), datetime(2024, 2, 29), 2),
+    # Across a year
+    (datetime(2023, 12, 1), datetime(2024, 1, 1), 2),
+    (datetime(2023, 12, 20), datetime(2024, 1, 10), 1),
+    (datetime(2023, 11, 15), datetime(2024, 2, 10), 3),
+    (datetime(2023, 7, 15), datetime(2024, 7, 14), 12),
+    (datetime(2022, 6, 1), datetime(2024, 6, 1), 25),
+])
+def test_count_months(start, end, months):
+    assert count_months(start, end) == months
+
+
+@pytest.mark.parametrize("start, end, years", [
+    # Start equal to end
+    (datetime(2024, 3, 3), datetime(2024, 3, 3), 0),
+    # Within one month
+    (datetime(2024, 1, 1), datetime(2024, 1, 31), 0),
+    (datetime(2024, 1, 1), datetime(2024, 2, 1), 1),
+    # Partial edge months
+    (datetime(2024, 1, 15), datetime(2024, 3, 10), 1),
+    (datetime(2023, 7, 15), datetime(2024, 7, 14), 1),
+    # Across a year
+    (datetime(2023, 12, 20), datetime(2024, 1, 10), 0),
+    (datetime(2023, 12, 15), datetime(2024, 1, 20), 1),
+    (datetime(2023, 1, 1), datetime(2024, 1, 1), 1),
+    (datetime(2023, 1, 1), datetime(2024, 2, 1), 2),
+    (datetime(2022, 6, 1), datetime(2024, 6, 1), 2),
+])
+def test_count_years(start, end, years):
+    assert count_years(start, end) == years
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import Update, text
+
+
+def seed(engine):
+    with engine.begin() as connection:
+        for statement in [
+            "INSERT INTO source (id, name, type, card_number) VALUES (1, 'BNC', 'BNC', '1111')",
+            "INSERT INTO category_family (id, name, regex_pattern) VALUES (1, 'Food', 'GROCERY|BAKERY'), (2, 'Misc', NULL), (3, 'Travel', NULL)",
+            "INSERT INTO category (name, category_family_id) VALUES ('Transport', 3)",
+            """INSERT INTO expense (id, description, amount, date, original_category, lock_category, source_id, category_family_id) VALUES
+                (1, 'GROCERY STORE', 10, '2024-01-01 00:00:00.000000', 'Other', 0, 1, 2),
+                (2, 'UBER', 20, '2024-01-02 00:00:00.000000', 'Transport', 0, 1, 2),
+                (3, 'BAKERY', 3, '2024-01-03 00:00:00.000000', 'Other', 0, 1, 1),
+                (4, 'CINEMA', 12, '2024-01-04 00:00:00.000000', 'Leisure', 0, 1, 2),
+                (5, 'CINEMA', 12, '2024-01-05 00:00:00.000000', 'Leisure', 1, 1, 2),
+                (6, 'THEATRE', 30, '2024-01-06 00:00:00.000000', 'Leisure', 0, 1, 2)""",
+        ]:
+            connection.execute(text(statement))
+
+
+def expense_families(engine) -> dict[int, str]:
+    with engine.connect() as connection:
+        return dict(connection.execute(text(
+            "SELECT expense.id, category_family.name FROM expense JOIN category_family ON category_family.id = expense.category_family_id"
+        )).all())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_recalculation_applies_regexes_then_category_names(database, workers):
+    from DatabaseSetup import SESSION_MAKER
+    from classifiers.RecalculationEngine import RecalculationEngine
+
+    seed(database)
+    with SESSION_MAKER() as session:
+        result = RecalculationEngine(session, chunk_size=2, workers=workers).run()
+
+    assert (result.scanned_expenses, result.updated_expenses, result.created_category_families) == (5, 4, 1)
+    # The regex first, then the category name, then a new category family named after the original category.
+    # The locked expense keeps its category family.
+    assert expense_families(database) == {1: "Food", 2: "Travel", 3: "Food", 4: "Leisure", 5: "Misc", 6: "Leisure"}
+
+
+def test_failed_recalculation_creates_no_category_family(database):
+    from DatabaseSetup import SESSION_MAKER
+    from classifiers.RecalculationEngine import RecalculationEngine
+
+    seed(database)
+    with SESSION_MAKER() as session:
+        execute = session.execute
+
+        def fail_updates(statement, *args, **kwargs):
+            if isinstance(statement, Update):
+                raise RuntimeError("update failed")
+            return execute(statement, *args, **kwargs)
+
+        session.execute = fail_updates
+        with pytest.raises(RuntimeError):
+            RecalculationEngine(session, workers=1).run()
+
+    with database.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM category_family")).scalar_one() == 3
+    assert expense_families(database)[4] == "Misc"
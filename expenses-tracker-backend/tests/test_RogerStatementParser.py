@@ -0,0 +1,66 @@
+from datetime import datetime
+import pytest
+
+from benchmarks.StatementGenerator import generate, synthetic_expenses
+from extractors.html.RogerStatementParser import parse_roger_statement
+
+TITLE_ROW = '<tr><th>Date</th><th>Posted date</th><th>Description</th><th>Category</th><th>Status</th><th>Amount</th><th>Rewards</th></tr>'
+
+
+def statement(*rows: str, card_number: str = "1234") -> bytes:
+    """A generated statement whose posted transactions are the given rows."""
+    document = generate("roger_html", 0, card_number=card_number).decode()
+    return document.replace(f"{TITLE_ROW}\n", TITLE_ROW + "".join(rows)).encode()
+
+
+def test_generated_statement_is_parsed():
+    rows, card_number = parse_roger_statement(generate("roger_html", 500, seed=3, card_number="9876"))
+
+    assert card_number == "9876"
+    # Escaped descriptions (MCDONALD'S), accented categories and refunds
+    assert rows == list(synthetic_expenses(500, seed=3))
+
+
+def test_comments_scripts_and_nested_tags_inside_cells_are_skipped():
+    rows, card_number = parse_roger_statement(statement(
+        '<tr class="transaction"><!-- <td>Jan 01, 2000</td> -->'
+        '<td><div><span><b>Apr 09, 2022</b></span></div></td>'
+        '<td>Apr 10, 2022<script>document.write("<td>hidden</td>")</script></td>'
+        '<td><div class="merchant"><a href="#">AIRBNB &amp; CO #6312</a><!-- merchant id --></div></td>'
+        '<td><style>td > span { color: red; }</style><span>Voyage</span></td>'
+        '<td><img alt="posted">Posted</td>'
+        '<td class="amount"><SCRIPT type="text/javascript">format("$1.00")</SCRIPT>-$1,071.07</td>'
+        '<td>0</td></tr>',
+        # A commented out tbody does not count as a table
+        '<!-- <tbody><tr><td>old</td></tr></tbody> -->'
+        '<tr><td>Oct 13, 2020</td><td>Oct 14, 2020</td><td>TIM HORTONS</td><td>Restaurants</td><td>Posted</td><td>$7.08</td><td>0</td></tr>',
+    ))
+
+    assert card_number == "1234"
+    assert rows == [
+        ("AIRBNB & CO #6312", -1071.07, datetime(2022, 4, 9), "Voyage"),
+        ("TIM HORTONS", 7.08, datetime(2020, 10, 13), "Restaurants"),
+    ]
+
+
+def test_single_table_statement_is_parsed():
+    document = f'<table><tbody>{TITLE_ROW}<tr><td>Oct 13, 2020</td><td>Oct 14, 2020</td><td>STM</td><td>Transport</td><td>Posted</td><td>$3.75</td><td>0</td></tr></tbody></table>'
+
+    assert parse_roger_statement(document.encode()) == ([("STM", 3.75, datetime(2020, 10, 13), "Transport")], None)
+
+
+def test_statement_without_table_is_not_parsed():
+    assert parse_roger_statement(b"<html><body><p>No statement</p></body></html>") == (None, None)
+
+
+@pytest.mark.parametrize("row", [
+    # A missing column
+    '<tr><td>Oct 13, 2020</td><td>Oct 14, 2020</td><td>STM</td><td>Posted</td><td>$3.75</td><td>0</td></tr>',
+    # An extra column
+    '<tr><td>Oct 13, 2020</td><td>Oct 14, 2020</td><td>STM</td><td>Transport</td><td>Posted</td><td>$3.75</td><td>0</td><td>1</td></tr>',
+    # An empty cell has no text
+    '<tr><td>Oct 13, 2020</td><td>Oct 14, 2020</td><td>STM</td><td></td><td>Posted</td><td>$3.75</td><td>0</td></tr>',
+])
+def test_invalid_number_of_columns_is_rejected(row):
+    with pytest.raises(ValueError, match="Invalid number of columns in HTML row"):
+        parse_roger_statement(statement(row))
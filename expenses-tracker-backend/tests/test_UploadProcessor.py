@@ -0,0 +1,123 @@
+import io
+import anyio
+from fastapi import UploadFile
+from sqlalchemy import func, select, text
+
+from benchmarks.StatementGenerator import generate
+
+
+def upload(*files: tuple[str, bytes]):
+    from extractors.UploadProcessor import UploadProcessor
+
+    upload_files = [UploadFile(io.BytesIO(content), filename=filename) for filename, content in files]
+    return anyio.run(UploadProcessor(None, concurrency=len(files)).process, upload_files)
+
+
+def upload_concurrently(*uploads: list[tuple[str, bytes]]):
+    """Processes each list of files as a separate upload request, all at the same time."""
+    from extractors.UploadProcessor import UploadProcessor
+
+    results = []
+
+    async def process(files: list[tuple[str, bytes]]):
+        upload_files = [UploadFile(io.BytesIO(content), filename=filename) for filename, content in files]
+        results.append(await UploadProcessor(None).process(upload_files))
+
+    async def process_all():
+        async with anyio.create_task_group() as task_group:
+            for files in uploads:
+                task_group.start_soon(process, files)
+
+    anyio.run(process_all)
+    return results
+
+
+def expense_count(engine) -> int:
+    from database.Expense import Expense
+
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Expense)).scalar_one()
+
+
+def add_bnc_source(engine, card_number: str = "1111"):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO source (name, type, card_number) VALUES ('BNC', 'BNC', :card_number)"), {"card_number": card_number})
+
+
+def test_identical_files_of_an_upload_are_inserted_once(database):
+    add_bnc_source(database)
+    content = generate("bnc", 2000, seed=1, card_number="1111")
+
+    result = upload(("a.csv", content), ("b.csv", content))
+
+    assert result.filesFailedToExtract == []
+    assert (result.created_expenses, result.existing_expenses) == (2000, 2000)
+    assert expense_count(database) == 2000
+
+
+def test_overlapping_files_of_an_upload_insert_the_union(database):
+    add_bnc_source(database)
+    # The expenses of a seed are the same whatever the count: the first file is the first 1200 rows of the second
+    result = upload(("a.csv", generate("bnc", 1200, seed=2, card_number="1111")), ("b.csv", generate("bnc", 3000, seed=2, card_number="1111")))
+
+    assert (result.created_expenses, result.existing_expenses) == (3000, 1200)
+    assert expense_count(database) == 3000
+
+
+def test_reupload_only_finds_existing_expenses(database):
+    add_bnc_source(database)
+    content = generate("bnc", 1500, seed=3, card_number="1111")
+    upload(("a.csv", content))
+
+    result = upload(("a.csv", content), ("b.csv", content))
+
+    assert (result.created_expenses, result.existing_expenses) == (0, 3000)
+    assert expense_count(database) == 1500
+
+
+def test_row_repeated_in_a_file_is_inserted_each_time(database):
+    add_bnc_source(database)
+    header, *lines = generate("bnc", 600, seed=4, card_number="1111").decode().splitlines()
+    # The repeated row is in another chunk of 500 rows than the first one
+    content = "\n".join([header, *lines, lines[0]]).encode() + b"\n"
+
+    result = upload(("a.csv", content), ("b.csv", content))
+
+    assert (result.created_expenses, result.existing_expenses) == (601, 601)
+    assert expense_count(database) == 601
+
+
+def test_concurrent_uploads_of_the_same_file_insert_it_once(database):
+    add_bnc_source(database)
+    content = generate("bnc", 3000, seed=5, card_number="1111")
+
+    results = upload_concurrently([("a.csv", content)], [("a.csv", content)])
+
+    assert sum(result.created_expenses for result in results) == 3000
+    assert sum(result.existing_expenses for result in results) == 3000
+    assert expense_count(database) == 3000
+
+
+def post_upload(params: dict, *files: tuple[str, bytes]):
+    import httpx
+    from app.main import app
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/api/expenses/upload/", params=params, files=[("files", file) for file in files])
+
+    return anyio.run(request)
+
+
+def test_upload_endpoint_reads_the_source_by_id(database):
+    add_bnc_source(database)
+    with database.connect() as connection:
+        source_id = connection.execute(text("SELECT id FROM source")).scalar_one()
+    content = generate("bnc", 700, seed=6, card_number="1111")
+
+    assert post_upload({"source_id": source_id + 1}, ("a.csv", content)).status_code == 404
+
+    response = post_upload({"source_id": source_id}, ("a.csv", content), ("b.csv", content))
+    assert response.status_code == 200
+    assert (response.json()["created_expenses"], response.json()["existing_expenses"]) == (700, 700)
+    assert expense_count(database) == 700